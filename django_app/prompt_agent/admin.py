@@ -1,11 +1,31 @@
 """Admin configuration for the prompt agent."""
+from django.conf import settings
 from django.contrib import admin
-from .models import AgentSession, PromptResponse
+from django.contrib.admin.options import ShowFacets
+
+from .bigtable import EstimatedCountPaginator, KeysetChangeList, cached_values_filter
+from .models import AgentSession, ChunkResult, ComparisonRun, PromptResponse, TextBlob
+from .routing import SAFE_METHODS, use_replica
+
+
+class ReplicaReadsMixin:
+    """Read the change list from the read replica; edits stay on the primary."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method not in SAFE_METHODS:
+            return super().changelist_view(request, extra_context)
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            # The result list is queried while the TemplateResponse renders
+            if hasattr(response, 'render'):
+                response.render()
+            return response
 
 
 @admin.register(AgentSession)
-class AgentSessionAdmin(admin.ModelAdmin):
-    list_display = ['name', 'model', 'is_active', 'created_at']
+class AgentSessionAdmin(ReplicaReadsMixin, admin.ModelAdmin):
+    list_display = ['name', 'model', 'is_active', 'weight', 'max_concurrency', 'created_at']
+    list_editable = ['weight', 'max_concurrency']
     list_filter = ['is_active', 'model', 'created_at']
     search_fields = ['name', 'system_prompt']
     readonly_fields = ['created_at', 'updated_at']
@@ -15,7 +35,10 @@ class AgentSessionAdmin(admin.ModelAdmin):
             'fields': ('name', 'model', 'is_active')
         }),
         ('Configuration', {
-            'fields': ('system_prompt',)
+            'fields': ('system_prompt', 'timeout')
+        }),
+        ('Scheduling', {
+            'fields': ('weight', 'max_concurrency')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -24,25 +47,45 @@ class AgentSessionAdmin(admin.ModelAdmin):
     )
 
 
+class ChunkResultInline(admin.TabularInline):
+    model = ChunkResult
+    fields = ['stage', 'index', 'status', 'processing_time', 'input_tokens', 'output_tokens', 'error_message']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(PromptResponse)
-class PromptResponseAdmin(admin.ModelAdmin):
-    list_display = ['id', 'get_prompt_preview', 'session', 'status', 'model_used', 'created_at', 'processing_time']
+class PromptResponseAdmin(ReplicaReadsMixin, admin.ModelAdmin):
+    list_display = ['id', 'get_prompt_preview', 'session', 'status', 'model_used', 'created_at', 'queue_time', 'processing_time']
     list_filter = ['status', 'model_used', 'created_at']
-    search_fields = ['prompt', 'response']
-    readonly_fields = ['created_at', 'updated_at', 'processing_time']
+    list_select_related = ['session']
+    # Compressed blobs are searched on their first PROMPT_BLOB_SEARCH_PREFIX characters
+    search_fields = ['prompt_blob__text', 'response_blob__text', '=trace_id']
+    readonly_fields = [
+        'prompt', 'response', 'created_at', 'updated_at', 'queue_time', 'processing_time',
+        'input_tokens', 'output_tokens', 'trace_id', 'comparison', 'instruction',
+    ]
+    inlines = [ChunkResultInline]
 
     fieldsets = (
         ('Session', {
             'fields': ('session',)
         }),
         ('Content', {
-            'fields': ('prompt', 'response')
+            'fields': ('prompt', 'instruction', 'response')
         }),
         ('Status', {
             'fields': ('status', 'error_message')
         }),
         ('Metadata', {
-            'fields': ('model_used', 'processing_time', 'created_at', 'updated_at'),
+            'fields': (
+                'model_used', 'queue_time', 'processing_time', 'input_tokens', 'output_tokens',
+                'trace_id', 'comparison', 'created_at', 'updated_at',
+            ),
             'classes': ('collapse',)
         }),
     )
@@ -50,3 +93,71 @@ class PromptResponseAdmin(admin.ModelAdmin):
     def get_prompt_preview(self, obj):
         return obj.prompt[:50] + '...' if len(obj.prompt) > 50 else obj.prompt
     get_prompt_preview.short_description = 'Prompt'
+
+    def has_add_permission(self, request):
+        # Prompts are created by the service, which stores their text blobs
+        return False
+
+    if settings.PROMPT_ADMIN_BIG_TABLE:
+        # Big-table mode: no exact COUNT(*)s, no DISTINCT scans, keyset paging
+        change_list_template = 'admin/prompt_agent/promptresponse/change_list.html'
+        list_filter = [
+            cached_values_filter('status', 'status'),
+            cached_values_filter('model_used', 'model used'),
+        ]
+        date_hierarchy = 'created_at'
+        paginator = EstimatedCountPaginator
+        show_full_result_count = False
+        show_facets = ShowFacets.NEVER
+
+        def get_changelist(self, request, **kwargs):
+            return KeysetChangeList
+
+
+class ComparisonResultInline(admin.TabularInline):
+    model = PromptResponse
+    fk_name = 'comparison'
+    fields = ['session', 'model_used', 'status', 'processing_time', 'input_tokens', 'output_tokens']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    show_change_link = True
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ComparisonRun)
+class ComparisonRunAdmin(ReplicaReadsMixin, admin.ModelAdmin):
+    list_display = ['id', 'get_prompt_preview', 'wall_time', 'created_at']
+    readonly_fields = ['prompt', 'wall_time', 'created_at']
+    fields = readonly_fields
+    inlines = [ComparisonResultInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('prompt_blob')
+
+    def get_prompt_preview(self, obj):
+        return obj.prompt[:50] + '...' if len(obj.prompt) > 50 else obj.prompt
+    get_prompt_preview.short_description = 'Prompt'
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(TextBlob)
+class TextBlobAdmin(admin.ModelAdmin):
+    list_display = ['digest', 'size', 'is_compressed', 'created_at']
+    readonly_fields = ['digest', 'content', 'size', 'created_at']
+    fields = readonly_fields
+
+    def is_compressed(self, obj):
+        return obj.data is not None
+    is_compressed.boolean = True
+    is_compressed.short_description = 'Compressed'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,8 +1,18 @@
 """App configuration for the prompt agent."""
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PromptAgentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'django_app.prompt_agent'
     verbose_name = 'Prompt Agent'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if settings.PROMPT_TRACE_SAMPLE_RATE > 0:
+            from django.db.backends.signals import connection_created
+
+            from .tracing import install_query_tracing
+            connection_created.connect(install_query_tracing)
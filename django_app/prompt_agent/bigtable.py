@@ -0,0 +1,260 @@
+"""Admin changelist helpers for very large tables."""
+import calendar
+import datetime
+import json
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.db.models import Q
+from django.utils import formats, timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+from .partitioning import newest
+
+
+def estimate_count(queryset):
+    """
+    Return the planner's row estimate for ``queryset``, or None.
+
+    Only PostgreSQL provides cheap estimates: ``pg_class.reltuples`` for an
+    unfiltered table (summed over the partitions of a partitioned one, which
+    has no statistics of its own) and the top plan node's row count otherwise.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT CASE WHEN c.relkind = 'p' THEN ("
+                "  SELECT coalesce(sum(greatest(p.reltuples, 0)), 0)::bigint FROM pg_inherits i"
+                "  JOIN pg_class p ON p.oid = i.inhrelid WHERE i.inhparent = c.oid"
+                ") ELSE c.reltuples::bigint END FROM pg_class c WHERE c.oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # reltuples is -1 (or 0) until the table has been analyzed
+            if row and row[0] > 0:
+                return int(row[0])
+            return None
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses planner estimates instead of ``COUNT(*)``.
+
+    Exact counts are still used below ``PROMPT_ADMIN_EXACT_COUNT_THRESHOLD``
+    rows, where they are cheap, and on databases without estimates.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate >= settings.PROMPT_ADMIN_EXACT_COUNT_THRESHOLD:
+            return estimate
+        return super().count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList that pages by ``(created_at, id)`` instead of OFFSET.
+
+    Pages are addressed by a ``cursor`` query parameter holding the last row
+    of the previous page, so each page is a range scan on the ``-created_at``
+    index no matter how deep it is; on a partitioned table the cursor also
+    prunes the newer partitions. Sorting by another column falls back to
+    regular (estimated-count) pagination.
+    """
+
+    CURSOR_VAR = 'cursor'
+    KEYSET_ORDERING = ['-created_at', '-pk']
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(self.CURSOR_VAR)
+        self.keyset = False
+        self.next_page_url = None
+        self.first_page_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(self.CURSOR_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        ordering = list(dict.fromkeys(self.get_ordering(request, self.queryset)))
+        if ordering != self.KEYSET_ORDERING or self.show_all:
+            return super().get_results(request)
+
+        queryset = self.queryset
+        if self.cursor:
+            created_at, pk = self._decode_cursor(self.cursor)
+            # The separate upper bound lets a partitioned table prune newer partitions
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(pk__lt=pk)
+            )
+        rows = list(newest(queryset, self.list_per_page + 1))
+        has_next = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+
+        self.keyset = True
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_next or bool(self.cursor)
+        if has_next:
+            last = rows[-1]
+            self.next_page_url = self.get_query_string(
+                {self.CURSOR_VAR: f'{last.created_at.isoformat()}_{last.pk}'}
+            )
+        if self.cursor:
+            self.first_page_url = self.get_query_string(remove=[self.CURSOR_VAR])
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        created_at, _, pk = cursor.rpartition('_')
+        try:
+            parsed = parse_datetime(created_at)
+            pk = int(pk)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise IncorrectLookupParameters(f'Invalid cursor: {cursor}')
+        return parsed, pk
+
+
+def cached_values_filter(field_name, title):
+    """
+    Build a list filter whose choices are cached distinct values with counts.
+
+    The grouped count runs at most once per ``PROMPT_ADMIN_FACET_CACHE_TIMEOUT``
+    instead of a ``SELECT DISTINCT`` scan on every changelist request.
+    """
+
+    class CachedValuesListFilter(admin.SimpleListFilter):
+        parameter_name = field_name
+
+        def lookups(self, request, model_admin):
+            model = model_admin.model
+            cache_key = f'prompt_agent:facets:{model._meta.label_lower}:{field_name}'
+            values = cache.get(cache_key)
+            if values is None:
+                values = list(
+                    model._default_manager.order_by()
+                    .values_list(field_name)
+                    .annotate(count=models.Count('pk'))
+                    .order_by(field_name)
+                )
+                cache.set(cache_key, values, settings.PROMPT_ADMIN_FACET_CACHE_TIMEOUT)
+            labels = dict(model._meta.get_field(field_name).flatchoices)
+            return [
+                (value, f'{labels.get(value, value)} (~{count})')
+                for value, count in values
+            ]
+
+        def queryset(self, request, queryset):
+            if self.value() is None:
+                return queryset
+            return queryset.filter(**{field_name: self.value()})
+
+    CachedValuesListFilter.title = title
+    CachedValuesListFilter.__name__ = f'Cached{field_name.title().replace("_", "")}Filter'
+    return CachedValuesListFilter
+
+
+def index_date_hierarchy(cl):
+    """
+    Date drill-down built from MIN/MAX only.
+
+    Django's ``date_hierarchy`` lists periods with ``SELECT DISTINCT``
+    truncations, a full scan on large tables. Here the periods are derived
+    from the first and last timestamp, both answered from the
+    ``-created_at`` index; periods without rows may be listed.
+    """
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup, month_field: month_lookup}),
+                'title': capfirst(formats.date_format(day, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT'))}],
+        }
+
+    date_range = cl.queryset.aggregate(
+        first=models.Min(field_name), last=models.Max(field_name)
+    )
+    if not (date_range['first'] and date_range['last']):
+        return {'show': False}
+    first = timezone.localtime(date_range['first'])
+    last = timezone.localtime(date_range['last'])
+
+    if year_lookup and month_lookup:
+        year, month = int(year_lookup), int(month_lookup)
+        if (first.year, first.month) == (last.year, last.month):
+            days = range(first.day, last.day + 1)
+        else:
+            days = range(1, calendar.monthrange(year, month)[1] + 1)
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year_lookup}), 'title': str(year_lookup)},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month_lookup, day_field: day}),
+                    'title': capfirst(formats.date_format(datetime.date(year, month, day), 'MONTH_DAY_FORMAT')),
+                }
+                for day in days
+            ],
+        }
+    if year_lookup:
+        year = int(year_lookup)
+        months = range(first.month, last.month + 1) if first.year == last.year else range(1, 13)
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month}),
+                    'title': capfirst(formats.date_format(datetime.date(year, month, 1), 'YEAR_MONTH_FORMAT')),
+                }
+                for month in months
+            ],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [
+            {'link': link({year_field: str(year)}), 'title': str(year)}
+            for year in range(first.year, last.year + 1)
+        ],
+    }
@@ -0,0 +1,30 @@
+"""Cache helpers for rendered prompt agent pages."""
+import time
+
+from django.core.cache import cache
+
+LISTINGS_VERSION_KEY = 'prompt_agent:listings_version'
+
+
+def get_listings_version():
+    """
+    Return the current version of the prompt/session listings.
+
+    Fragment caches vary on this value, so bumping it invalidates every
+    cached listing at once. A missing key is seeded with a timestamp rather
+    than a counter so stale fragments can never be matched again after the
+    key is evicted.
+    """
+    version = cache.get(LISTINGS_VERSION_KEY)
+    if version is None:
+        cache.add(LISTINGS_VERSION_KEY, time.time_ns())
+        version = cache.get(LISTINGS_VERSION_KEY)
+    return version
+
+
+def invalidate_listings():
+    """Invalidate all cached listing fragments."""
+    try:
+        cache.incr(LISTINGS_VERSION_KEY)
+    except ValueError:
+        cache.add(LISTINGS_VERSION_KEY, time.time_ns())
@@ -26,13 +26,50 @@ class PromptForm(forms.Form):
         help_text='Kies een specifieke agent sessie (optioneel)'
     )
 
+    instruction = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Bijvoorbeeld: Vat samen in vijf punten',
+        }),
+        label='Opdracht bij lange documenten',
+        help_text='Te lange prompts worden in delen verwerkt; deze opdracht geldt voor elk deel (standaard: samenvatten)'
+    )
+
+
+class ComparisonForm(forms.Form):
+    """Form for sending one prompt to several sessions at once."""
+
+    prompt = forms.CharField(
+        widget=forms.Textarea(attrs={
+            'class': 'form-control',
+            'rows': 3,
+            'placeholder': 'Typ hier je prompt...',
+        }),
+        label='Prompt',
+        help_text='Deze prompt wordt tegelijk naar alle gekozen sessies gestuurd'
+    )
+
+    sessions = forms.ModelMultipleChoiceField(
+        queryset=AgentSession.objects.filter(is_active=True),
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+        label='Sessies',
+        help_text='Kies minstens twee sessies om te vergelijken'
+    )
+
+    def clean_sessions(self):
+        sessions = self.cleaned_data['sessions']
+        if len(sessions) < 2:
+            raise forms.ValidationError('Kies minstens twee sessies om te vergelijken.')
+        return sessions
+
 
 class AgentSessionForm(forms.ModelForm):
     """Form for creating/editing agent sessions."""
 
     class Meta:
         model = AgentSession
-        fields = ['name', 'model', 'system_prompt', 'is_active']
+        fields = ['name', 'model', 'system_prompt', 'timeout', 'is_active']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'model': forms.TextInput(attrs={'class': 'form-control'}),
@@ -41,11 +78,13 @@ class AgentSessionForm(forms.ModelForm):
                 'rows': 5,
                 'placeholder': 'Optionele system prompt voor agent configuratie...'
             }),
+            'timeout': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.1', 'min': '0.1'}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
         labels = {
             'name': 'Naam',
             'model': 'Model',
             'system_prompt': 'System Prompt',
+            'timeout': 'Timeout (seconden)',
             'is_active': 'Actief',
         }
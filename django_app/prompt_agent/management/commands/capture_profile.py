@@ -0,0 +1,93 @@
+"""Capture a sampling profile from the running web processes."""
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from ...profiling import CONTINUOUS, WINDOW_KEY, format_collapsed, merge_collapsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile a fraction of live requests for a time window and write "
+        "collapsed stacks per view (flamegraph.pl/speedscope input)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=30.0,
+                            help='Length of the capture window (default: 30)')
+        parser.add_argument('--rate', type=float, default=1.0,
+                            help='Fraction of requests to profile (default: 1.0)')
+        parser.add_argument('--output', help='Output directory (default: PROMPT_PROFILE_DIR/<capture>)')
+        parser.add_argument('--continuous', action='store_true',
+                            help='Collect the samples of PROMPT_PROFILE_SAMPLE_RATE instead of opening a window')
+        parser.add_argument('--top', type=int, default=5,
+                            help='Hottest functions to list per view (default: 5)')
+
+    def handle(self, *args, **options):
+        if 'ProfilingMiddleware' not in ' '.join(settings.MIDDLEWARE):
+            raise CommandError("Profiling is disabled; set PROMPT_PROFILING=True and restart once.")
+        if not 0 < options['rate'] <= 1:
+            raise CommandError("--rate must be in (0, 1]")
+
+        profile_dir = Path(settings.PROMPT_PROFILE_DIR)
+        if options['continuous']:
+            capture = CONTINUOUS
+        else:
+            capture = self._capture_window(options['seconds'], options['rate'])
+
+        counts = merge_collapsed(profile_dir.glob(f'{capture}-*.collapsed'))
+        if not counts:
+            raise CommandError(
+                f"No samples were written to {profile_dir}. Profiling only reaches other "
+                "processes through a shared cache (see CACHE_BACKEND) and needs traffic."
+            )
+        output = Path(options['output'] or profile_dir / capture)
+        self._write(output, counts, options['top'])
+
+    def _capture_window(self, seconds, rate):
+        if 'locmem' in settings.CACHES['default']['BACKEND'].lower():
+            self.stderr.write(self.style.WARNING(
+                "The local-memory cache is not shared between processes; only this "
+                "process would see the capture window."
+            ))
+        capture = time.strftime('capture-%Y%m%d-%H%M%S')
+        cache.set(
+            WINDOW_KEY,
+            {'id': capture, 'until': time.time() + seconds, 'rate': rate},
+            timeout=int(seconds) + 60,
+        )
+        self.stdout.write(f"Profiling {rate:.0%} of requests for {seconds:g}s as {capture}...")
+        try:
+            time.sleep(seconds)
+        finally:
+            cache.delete(WINDOW_KEY)
+        # Workers write their samples when idle and every flush interval
+        time.sleep(2 * settings.PROMPT_PROFILE_FLUSH_INTERVAL + 1)
+        return capture
+
+    def _write(self, output, counts, top):
+        output.mkdir(parents=True, exist_ok=True)
+        by_view = {}
+        for stack, count in counts.items():
+            view = stack.split(';', 1)[0]
+            by_view.setdefault(view, Counter())[stack] += count
+
+        (output / 'all.collapsed').write_text(format_collapsed(counts), encoding='utf-8')
+        for view, stacks in sorted(by_view.items()):
+            filename = re.sub(r'[^\w.:-]', '_', view) + '.collapsed'
+            (output / filename).write_text(format_collapsed(stacks), encoding='utf-8')
+
+            total = sum(stacks.values())
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{view}: {total} samples"))
+            leaves = Counter()
+            for stack, count in stacks.items():
+                leaves[stack.rsplit(';', 1)[-1]] += count
+            for frame, count in leaves.most_common(top):
+                self.stdout.write(f"  {count / total:6.1%}  {frame}")
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(by_view)} views to {output}"))
@@ -0,0 +1,66 @@
+"""Create upcoming PromptResponse partitions and remove expired ones."""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from ... import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly PromptResponse partitions for the coming months and "
+        "detach and drop those past the retention period. Run it daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database to manage (default: "default")')
+        parser.add_argument('--convert', action='store_true',
+                            help='Partition the table first if it is not partitioned yet (copies every row)')
+        parser.add_argument('--months-ahead', type=int, default=settings.PROMPT_PARTITION_MONTHS_AHEAD,
+                            help='Create partitions up to this many months after the current one')
+        parser.add_argument('--retention-months', type=int, default=settings.PROMPT_PARTITION_RETENTION_MONTHS,
+                            help='Remove partitions older than this many full months (0 keeps all)')
+        parser.add_argument('--detach-only', action='store_true',
+                            help='Keep removed partitions as standalone tables instead of dropping them')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError("Partitioning requires PostgreSQL.")
+        if options['months_ahead'] < 0 or options['retention_months'] < 0:
+            raise CommandError("--months-ahead and --retention-months must not be negative.")
+
+        if not partitioning.is_partitioned(connection):
+            if not options['convert']:
+                raise CommandError(
+                    f"{partitioning.TABLE} is not partitioned; migrate with PROMPT_PARTITIONING=True "
+                    f"or run this command with --convert."
+                )
+            try:
+                partitioning.partition_table(connection, options['months_ahead'])
+            except partitioning.PartitioningError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f"Partitioned {partitioning.TABLE} by month")
+            if not settings.PROMPT_PARTITIONING:
+                self.stdout.write(
+                    "Set PROMPT_PARTITIONING=True so history and admin queries use partition pruning."
+                )
+
+        for name in partitioning.create_partitions(connection, options['months_ahead']):
+            self.stdout.write(f"Created {name}")
+
+        if options['retention_months']:
+            before = partitioning.add_months(
+                partitioning.month_start(timezone.now()), -options['retention_months']
+            )
+            removed = partitioning.drop_partitions(connection, before, options['detach_only'])
+            for name in removed:
+                self.stdout.write(f"{'Detached' if options['detach_only'] else 'Dropped'} {name}")
+
+        partitions = partitioning.list_partitions(connection)
+        if partitions:
+            self.stdout.write(
+                f"{len(partitions)} monthly partitions, {partitions[0][1]:%Y-%m} to {partitions[-1][1]:%Y-%m}"
+            )
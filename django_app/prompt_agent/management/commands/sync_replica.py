@@ -0,0 +1,42 @@
+"""Copy the primary SQLite database to the replica, standing in for replication."""
+import sqlite3
+import time
+from contextlib import closing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from ...routing import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the replica file, once or every "
+        "--interval seconds, to try replica routing and replication lag locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep copying every this many seconds (default: copy once)')
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No read replica is configured; set DB_REPLICA_NAME.")
+        for name in (DEFAULT_DB_ALIAS, alias):
+            if connections[name].vendor != 'sqlite':
+                raise CommandError(
+                    "sync_replica only copies SQLite databases; use the database's own replication."
+                )
+        source = str(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+        target = str(connections[alias].settings_dict['NAME'])
+        if source == target:
+            raise CommandError("The replica uses the primary's file; point DB_REPLICA_NAME at another file.")
+
+        while True:
+            with closing(sqlite3.connect(source)) as primary, closing(sqlite3.connect(target)) as replica:
+                primary.backup(replica)
+            self.stdout.write(f"{time.strftime('%H:%M:%S')} copied {source} to {target}")
+            if options['interval'] <= 0:
+                return
+            time.sleep(options['interval'])
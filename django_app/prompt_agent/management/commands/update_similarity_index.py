@@ -0,0 +1,25 @@
+"""Add completed prompts to the related-prompts index."""
+from django.core.management.base import BaseCommand, CommandError
+
+from ...similarity import get_index
+
+
+class Command(BaseCommand):
+    help = "Index completed prompts that are not in the related-prompts index yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Discard the index and index every completed prompt again')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        index = get_index()
+        if index is None:
+            raise CommandError("numpy is not installed (pip install -e .[similarity])")
+        if options['rebuild']:
+            added = index.rebuild(options['batch_size'])
+        else:
+            added = index.update(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {added} prompts; the index now holds {index.count} prompts."
+        ))
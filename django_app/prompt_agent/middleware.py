@@ -0,0 +1,157 @@
+"""Middleware for the prompt agent."""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .profiling import ProfileWindow, choose_capture, get_sampler
+from .routing import PIN_COOKIE, route_request
+from .tracing import get_tracer
+
+
+class TracingMiddleware:
+    """
+    Open a root span per request.
+
+    The span is renamed after the resolved view, records the response
+    status, and continues an incoming W3C ``traceparent`` header. Sampled
+    responses carry their trace id in ``X-Trace-Id``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.tracer = get_tracer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self._trace(request) as span:
+            request.trace_span = span
+            response = self.get_response(request)
+            self._finish(span, response)
+        return response
+
+    async def __acall__(self, request):
+        with self._trace(request) as span:
+            request.trace_span = span
+            response = await self.get_response(request)
+            self._finish(span, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        span = getattr(request, 'trace_span', None)
+        if span is not None and request.resolver_match is not None:
+            span.name = f'{request.method} {request.resolver_match.view_name}'
+            span.set_attribute('http.route', request.resolver_match.route)
+
+    def _trace(self, request):
+        return self.tracer.trace(
+            f'{request.method} {request.path}',
+            traceparent=request.headers.get('traceparent'),
+            **{'http.method': request.method, 'http.target': request.get_full_path()},
+        )
+
+    @staticmethod
+    def _finish(span, response):
+        if span is None:
+            return
+        span.set_attribute('http.status_code', response.status_code)
+        if response.status_code >= 500:
+            span.status = 'error'
+        response['X-Trace-Id'] = span.trace_id
+
+
+class ProfilingMiddleware:
+    """
+    Sample the stacks of a fraction of requests.
+
+    Requests are profiled with probability ``PROMPT_PROFILE_SAMPLE_RATE``,
+    or at the rate of a capture window started with the ``capture_profile``
+    management command. Samples are aggregated per view name and written to
+    ``PROMPT_PROFILE_DIR`` as collapsed stacks.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sampler = get_sampler()
+        self.window = ProfileWindow()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        capture = choose_capture(self.window)
+        if capture is None:
+            return self.get_response(request)
+        with self.sampler.profile(request.path, capture) as entry:
+            request.profile_entry = entry
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        capture = choose_capture(self.window)
+        if capture is None:
+            return await self.get_response(request)
+        with self.sampler.profile(request.path, capture) as entry:
+            request.profile_entry = entry
+            return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        entry = getattr(request, 'profile_entry', None)
+        if entry is not None and request.resolver_match is not None:
+            entry[1] = request.resolver_match.view_name
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes consistency for the read replica.
+
+    A request that writes to the app's tables sets a cookie, and the
+    client's requests read only from the primary until it expires
+    ``PROMPT_DB_PIN_SECONDS`` later, by which time the replica has caught up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with route_request(self._pinned(request)) as state:
+            response = self.get_response(request)
+        return self._finish(state, response)
+
+    async def __acall__(self, request):
+        with route_request(self._pinned(request)) as state:
+            response = await self.get_response(request)
+        return self._finish(state, response)
+
+    @staticmethod
+    def _pinned(request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _finish(state, response):
+        if state.wrote:
+            seconds = settings.PROMPT_DB_PIN_SECONDS
+            response.set_cookie(
+                PIN_COOKIE, f'{time.time() + seconds:.3f}',
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:59
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="agentsession",
+            name="timeout",
+            field=models.FloatField(
+                blank=True,
+                help_text="Default request deadline in seconds (falls back to settings)",
+                null=True,
+                validators=[django.core.validators.MinValueValidator(0.1)],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="promptresponse",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("processing", "Processing"),
+                    ("completed", "Completed"),
+                    ("failed", "Failed"),
+                    ("timeout", "Timeout"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+    ]
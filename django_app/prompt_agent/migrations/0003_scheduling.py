@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:06
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0002_session_timeout_and_statuses"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="agentsession",
+            name="max_concurrency",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Maximum simultaneous upstream calls for this session (empty = no cap)",
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1)],
+            ),
+        ),
+        migrations.AddField(
+            model_name="agentsession",
+            name="weight",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Relative share of upstream capacity when sessions compete",
+                validators=[django.core.validators.MinValueValidator(1)],
+            ),
+        ),
+        migrations.AddField(
+            model_name="promptresponse",
+            name="queue_time",
+            field=models.FloatField(
+                blank=True,
+                help_text="Time spent waiting for an upstream slot in seconds",
+                null=True,
+            ),
+        ),
+    ]
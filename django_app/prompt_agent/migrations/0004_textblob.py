@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0003_scheduling"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TextBlob",
+            fields=[
+                (
+                    "digest",
+                    models.CharField(
+                        help_text="SHA-256 of the UTF-8 encoded text",
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "text",
+                    models.TextField(blank=True, help_text="Uncompressed content"),
+                ),
+                (
+                    "data",
+                    models.BinaryField(
+                        blank=True, help_text="zlib-compressed content", null=True
+                    ),
+                ),
+                (
+                    "size",
+                    models.PositiveIntegerField(
+                        help_text="Size of the original text in bytes"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Text Blob",
+                "verbose_name_plural": "Text Blobs",
+            },
+        ),
+        migrations.AddField(
+            model_name="promptresponse",
+            name="prompt_blob",
+            field=models.ForeignKey(
+                help_text="User's input prompt",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="prompt_agent.textblob",
+            ),
+        ),
+        migrations.AddField(
+            model_name="promptresponse",
+            name="response_blob",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="AI generated response",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="prompt_agent.textblob",
+            ),
+        ),
+    ]
@@ -0,0 +1,142 @@
+"""Move inline prompt/response text into deduplicated TextBlob rows.
+
+Rows are processed in primary-key order in batches, each committed on its
+own, so the migration streams through large tables without holding them in
+memory or in one long transaction.
+"""
+
+import hashlib
+import logging
+import zlib
+
+from django.conf import settings
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def make_blob(TextBlob, text, threshold):
+    raw = text.encode("utf-8")
+    blob = TextBlob(digest=hashlib.sha256(raw).hexdigest(), text=text, size=len(raw))
+    if threshold and len(raw) >= threshold:
+        compressed = zlib.compress(raw)
+        if len(compressed) < len(raw):
+            blob.text = ""
+            blob.data = compressed
+    return blob
+
+
+def stored_size(blob):
+    return len(blob.data) if blob.data is not None else blob.size
+
+
+def dedup_text(apps, schema_editor):
+    PromptResponse = apps.get_model("prompt_agent", "PromptResponse")
+    TextBlob = apps.get_model("prompt_agent", "TextBlob")
+    threshold = getattr(settings, "PROMPT_BLOB_COMPRESS_THRESHOLD", 0)
+    db_alias = schema_editor.connection.alias
+
+    rows = original_bytes = stored_bytes = blob_count = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            PromptResponse.objects.using(db_alias)
+            .filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "prompt", "response")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        blobs = {}
+        updates = []
+        for pk, prompt, response in batch:
+            prompt_blob = make_blob(TextBlob, prompt, threshold)
+            blobs.setdefault(prompt_blob.digest, prompt_blob)
+            response_blob = None
+            if response:
+                response_blob = make_blob(TextBlob, response, threshold)
+                blobs.setdefault(response_blob.digest, response_blob)
+            updates.append(
+                PromptResponse(
+                    pk=pk,
+                    prompt_blob_id=prompt_blob.digest,
+                    response_blob_id=response_blob.digest if response_blob else None,
+                )
+            )
+            original_bytes += prompt_blob.size + (
+                response_blob.size if response_blob else 0
+            )
+
+        existing = set(
+            TextBlob.objects.using(db_alias)
+            .filter(digest__in=list(blobs))
+            .values_list("digest", flat=True)
+        )
+        new_blobs = [blob for digest, blob in blobs.items() if digest not in existing]
+        with transaction.atomic(using=db_alias):
+            TextBlob.objects.using(db_alias).bulk_create(new_blobs)
+            PromptResponse.objects.using(db_alias).bulk_update(
+                updates, ["prompt_blob", "response_blob"]
+            )
+
+        rows += len(batch)
+        blob_count += len(new_blobs)
+        stored_bytes += sum(stored_size(blob) for blob in new_blobs)
+        last_pk = batch[-1][0]
+
+    if rows:
+        saved = original_bytes - stored_bytes
+        logger.info(
+            "Deduplicated %d prompt responses: %d bytes of text now stored as %d bytes "
+            "in %d blobs (%d bytes, %.0f%% saved)",
+            rows, original_bytes, stored_bytes, blob_count, saved,
+            100 * saved / max(original_bytes, 1),
+        )
+
+
+def restore_text(apps, schema_editor):
+    PromptResponse = apps.get_model("prompt_agent", "PromptResponse")
+    db_alias = schema_editor.connection.alias
+
+    def content(blob):
+        if blob is None:
+            return ""
+        if blob.data is not None:
+            return zlib.decompress(bytes(blob.data)).decode("utf-8")
+        return blob.text
+
+    last_pk = 0
+    while True:
+        batch = list(
+            PromptResponse.objects.using(db_alias)
+            .filter(pk__gt=last_pk)
+            .order_by("pk")
+            .select_related("prompt_blob", "response_blob")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for row in batch:
+            row.prompt = content(row.prompt_blob)
+            row.response = content(row.response_blob)
+        with transaction.atomic(using=db_alias):
+            PromptResponse.objects.using(db_alias).bulk_update(
+                batch, ["prompt", "response"]
+            )
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits separately
+    atomic = False
+
+    dependencies = [
+        ("prompt_agent", "0004_textblob"),
+    ]
+
+    operations = [
+        migrations.RunPython(dedup_text, restore_text),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0005_dedup_prompt_text"),
+    ]
+
+    operations = [
+        # Gives the column a default when the removal is reversed on a
+        # populated table; 0005 then restores the text from the blobs.
+        migrations.AlterField(
+            model_name="promptresponse",
+            name="prompt",
+            field=models.TextField(default="", help_text="User's input prompt"),
+        ),
+        migrations.RemoveField(
+            model_name="promptresponse",
+            name="prompt",
+        ),
+        migrations.RemoveField(
+            model_name="promptresponse",
+            name="response",
+        ),
+        migrations.AlterField(
+            model_name="promptresponse",
+            name="prompt_blob",
+            field=models.ForeignKey(
+                help_text="User's input prompt",
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="prompt_agent.textblob",
+            ),
+        ),
+    ]
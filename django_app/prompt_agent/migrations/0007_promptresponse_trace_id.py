@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0006_remove_inline_text"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="promptresponse",
+            name="trace_id",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Id of the request trace, when it was sampled",
+                max_length=32,
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0007_promptresponse_trace_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="promptresponse",
+            name="input_tokens",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Prompt tokens reported by the API", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="promptresponse",
+            name="output_tokens",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Generated tokens reported by the API", null=True
+            ),
+        ),
+        migrations.CreateModel(
+            name="ComparisonRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "wall_time",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Time until the slowest session finished, in seconds",
+                        null=True,
+                    ),
+                ),
+                (
+                    "prompt_blob",
+                    models.ForeignKey(
+                        help_text="Prompt sent to every session",
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="prompt_agent.textblob",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Comparison Run",
+                "verbose_name_plural": "Comparison Runs",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="promptresponse",
+            name="comparison",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Comparison run this response belongs to",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="results",
+                to="prompt_agent.comparisonrun",
+            ),
+        ),
+    ]
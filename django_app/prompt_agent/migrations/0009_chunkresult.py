@@ -0,0 +1,104 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:32
+
+import django.db.models.deletion
+import django_app.prompt_agent.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0008_comparisonrun"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="promptresponse",
+            name="instruction",
+            field=models.TextField(
+                blank=True,
+                help_text="Instruction applied to every chunk when the prompt is processed with map-reduce",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ChunkResult",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "stage",
+                    models.PositiveSmallIntegerField(
+                        help_text="0 for document chunks, 1 and up for reduce steps"
+                    ),
+                ),
+                (
+                    "index",
+                    models.PositiveIntegerField(help_text="Position within the stage"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("error_message", models.TextField(blank=True)),
+                ("processing_time", models.FloatField(blank=True, null=True)),
+                ("input_tokens", models.PositiveIntegerField(blank=True, null=True)),
+                ("output_tokens", models.PositiveIntegerField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "input_blob",
+                    models.ForeignKey(
+                        help_text="Chunk text, or the results being combined",
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="prompt_agent.textblob",
+                    ),
+                ),
+                (
+                    "output_blob",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Result of this call",
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="prompt_agent.textblob",
+                    ),
+                ),
+                (
+                    "prompt_response",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="prompt_agent.promptresponse",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Chunk Result",
+                "verbose_name_plural": "Chunk Results",
+                "ordering": ["stage", "index"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("prompt_response", "stage", "index"),
+                        name="unique_chunk_position",
+                    )
+                ],
+            },
+            bases=(django_app.prompt_agent.models.BlobTextMixin, models.Model),
+        ),
+    ]
@@ -0,0 +1,174 @@
+"""Optionally partition the PromptResponse table by month on PostgreSQL.
+
+The table is only converted on PostgreSQL with ``PROMPT_PARTITIONING=True``;
+elsewhere this migration just drops the chunk results' foreign key
+constraint, which a partitioned table could not satisfy. A database migrated
+without the setting can be converted later with
+``manage.py manage_partitions --convert``.
+
+The DDL is inlined with literal names rather than imported from
+``prompt_agent.partitioning``, so later changes to that module or to the
+models cannot change what this migration does.
+"""
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+from django.utils import timezone
+
+TABLE = "prompt_agent_promptresponse"
+SEQUENCE = "prompt_agent_promptresponse_id_seq"
+DEFAULT_PARTITION = "prompt_agent_promptresponse_default"
+
+
+def month_start(value):
+    value = value.astimezone(datetime.timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(start, months):
+    month = start.month - 1 + months
+    return start.replace(year=start.year + month // 12, month=month % 12 + 1)
+
+
+def is_partitioned(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+    row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def saved_indexes(cursor):
+    """CREATE INDEX statements of the table's indexes, except the primary key."""
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p')",
+        [TABLE, TABLE],
+    )
+    # Indexes of a partitioned table are defined ON ONLY the parent
+    return [row[0].replace(" ON ONLY ", " ON ") for row in cursor.fetchall()]
+
+
+def saved_foreign_keys(cursor):
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [TABLE],
+    )
+    return cursor.fetchall()
+
+
+def restore(cursor, qn, indexes, foreign_keys):
+    for sql in indexes:
+        cursor.execute(sql)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(name)} {definition}")
+    cursor.execute(f"ANALYZE {qn(TABLE)}")
+
+
+def partition(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql" or not settings.PROMPT_PARTITIONING:
+        return
+    PromptResponse = apps.get_model("prompt_agent", "PromptResponse")
+    qn = connection.ops.quote_name
+    staging = f"{TABLE}_partitioned"
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            return
+        cursor.execute(
+            "SELECT conrelid::regclass::text FROM pg_constraint WHERE confrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            raise RuntimeError(
+                f"Foreign keys of {', '.join(referencing)} reference {TABLE}; a partitioned "
+                f"table can only be referenced including created_at, so drop them first."
+            )
+        indexes = saved_indexes(cursor)
+        foreign_keys = saved_foreign_keys(cursor)
+        bounds = PromptResponse.objects.using(connection.alias).aggregate(
+            max_id=Max("id"), oldest=Min("created_at")
+        )
+
+        cursor.execute(
+            f"CREATE TABLE {qn(staging)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+            f"INCLUDING STORAGE) PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(staging)} DEFAULT")
+        month = month_start(bounds["oldest"] or timezone.now())
+        last = add_months(month_start(timezone.now()), settings.PROMPT_PARTITION_MONTHS_AHEAD)
+        while month <= last:
+            end = add_months(month, 1)
+            cursor.execute(
+                f"CREATE TABLE {qn(f'{TABLE}_p{month:%Y_%m}')} PARTITION OF {qn(staging)} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            month = end
+        cursor.execute(f"INSERT INTO {qn(staging)} SELECT * FROM {qn(TABLE)}")
+
+        # Dropping the old table frees the names of its sequence, indexes and constraints
+        cursor.execute(f"DROP TABLE {qn(TABLE)}")
+        cursor.execute(f"ALTER TABLE {qn(staging)} RENAME TO {qn(TABLE)}")
+        cursor.execute(
+            f"CREATE SEQUENCE {qn(SEQUENCE)} START WITH {int(bounds['max_id'] or 0) + 1} OWNED BY {qn(TABLE)}.id"
+        )
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + '_pkey')} PRIMARY KEY (id, created_at)")
+        restore(cursor, qn, indexes, foreign_keys)
+
+
+def unpartition(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    PromptResponse = apps.get_model("prompt_agent", "PromptResponse")
+    qn = connection.ops.quote_name
+    staging = f"{TABLE}_unpartitioned"
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return
+        indexes = saved_indexes(cursor)
+        foreign_keys = saved_foreign_keys(cursor)
+        max_id = PromptResponse.objects.using(connection.alias).aggregate(max_id=Max("id"))["max_id"]
+
+        cursor.execute(
+            f"CREATE TABLE {qn(staging)} "
+            f"(LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)"
+        )
+        # The copied default points at the sequence that is dropped with the table
+        cursor.execute(f"ALTER TABLE {qn(staging)} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"INSERT INTO {qn(staging)} SELECT * FROM {qn(TABLE)}")
+
+        cursor.execute(f"DROP TABLE {qn(TABLE)}")
+        cursor.execute(f"ALTER TABLE {qn(staging)} RENAME TO {qn(TABLE)}")
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY "
+            f"(START WITH {int(max_id or 0) + 1})"
+        )
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + '_pkey')} PRIMARY KEY (id)")
+        restore(cursor, qn, indexes, foreign_keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0009_chunkresult"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chunkresult",
+            name="prompt_response",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="chunks",
+                to="prompt_agent.promptresponse",
+            ),
+        ),
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -0,0 +1,54 @@
+"""Keep the start of compressed texts uncompressed, so admin search finds them.
+
+Blobs compressed before this migration have an empty ``text``; it is filled
+with their first ``PROMPT_BLOB_SEARCH_PREFIX`` characters, in batches.
+"""
+
+import zlib
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def fill_search_prefix(apps, schema_editor):
+    TextBlob = apps.get_model("prompt_agent", "TextBlob")
+    prefix = getattr(settings, "PROMPT_BLOB_SEARCH_PREFIX", 0)
+    db_alias = schema_editor.connection.alias
+    if not prefix:
+        return
+
+    last_digest = ""
+    while True:
+        batch = list(
+            TextBlob.objects.using(db_alias)
+            .filter(digest__gt=last_digest, data__isnull=False, text="")
+            .order_by("digest")
+            .only("digest", "data")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for blob in batch:
+            blob.text = zlib.decompress(bytes(blob.data)).decode("utf-8")[:prefix]
+        TextBlob.objects.using(db_alias).bulk_update(batch, ["text"])
+        last_digest = batch[-1].digest
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0010_partition_promptresponse"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="textblob",
+            name="text",
+            field=models.TextField(
+                blank=True,
+                help_text="Uncompressed content, or the searchable start of compressed content",
+            ),
+        ),
+        migrations.RunPython(fill_search_prefix, migrations.RunPython.noop),
+    ]
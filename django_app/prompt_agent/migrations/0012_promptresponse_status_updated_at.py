@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prompt_agent", "0011_textblob_search_prefix"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="promptresponse",
+            index=models.Index(
+                fields=["status", "updated_at"], name="prompt_agen_status_7efd16_idx"
+            ),
+        ),
+    ]
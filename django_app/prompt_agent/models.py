@@ -1,4 +1,9 @@
 """Database models for the prompt agent application."""
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -17,6 +22,23 @@ class AgentSession(models.Model):
         blank=True,
         help_text="System prompt to configure agent behavior"
     )
+    timeout = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0.1)],
+        help_text="Default request deadline in seconds (falls back to settings)"
+    )
+    weight = models.PositiveIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text="Relative share of upstream capacity when sessions compete"
+    )
+    max_concurrency = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1)],
+        help_text="Maximum simultaneous upstream calls for this session (empty = no cap)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
@@ -30,7 +52,140 @@ class AgentSession(models.Model):
         return f"{self.name} ({self.model})"
 
 
-class PromptResponse(models.Model):
+class TextBlobManager(models.Manager):
+    """Manager that writes blobs idempotently."""
+
+    def store(self, blobs):
+        """Insert unsaved blobs, skipping digests that already exist."""
+        blobs = [blob for blob in blobs if blob._state.adding]
+        if blobs:
+            unique = {blob.digest: blob for blob in blobs}
+            self.bulk_create(unique.values(), ignore_conflicts=True)
+            for blob in blobs:
+                blob._state.adding = False
+
+    def store_for(self, prompt_responses):
+        """Insert the pending blobs of several PromptResponse instances in one query."""
+        self.store(
+            blob for prompt_response in prompt_responses
+            for blob in prompt_response.pending_blobs()
+        )
+
+
+class TextBlob(models.Model):
+    """Content-addressed text shared by every prompt/response with the same content."""
+
+    digest = models.CharField(
+        max_length=64,
+        primary_key=True,
+        help_text="SHA-256 of the UTF-8 encoded text"
+    )
+    text = models.TextField(
+        blank=True,
+        help_text="Uncompressed content, or the searchable start of compressed content"
+    )
+    data = models.BinaryField(null=True, blank=True, help_text="zlib-compressed content")
+    size = models.PositiveIntegerField(help_text="Size of the original text in bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TextBlobManager()
+
+    class Meta:
+        verbose_name = 'Text Blob'
+        verbose_name_plural = 'Text Blobs'
+
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.size} bytes)"
+
+    @classmethod
+    def build(cls, text):
+        """
+        Return an unsaved blob for ``text``.
+
+        Texts of at least ``PROMPT_BLOB_COMPRESS_THRESHOLD`` bytes are stored
+        zlib-compressed when that actually saves space; their first
+        ``PROMPT_BLOB_SEARCH_PREFIX`` characters stay in ``text`` so admin
+        search still finds them.
+        """
+        raw = text.encode('utf-8')
+        blob = cls(digest=hashlib.sha256(raw).hexdigest(), text=text, size=len(raw))
+        threshold = settings.PROMPT_BLOB_COMPRESS_THRESHOLD
+        if threshold and len(raw) >= threshold:
+            compressed = zlib.compress(raw)
+            if len(compressed) < len(raw):
+                blob.text = text[:settings.PROMPT_BLOB_SEARCH_PREFIX]
+                blob.data = compressed
+        return blob
+
+    @property
+    def content(self):
+        if self.data is not None:
+            return zlib.decompress(bytes(self.data)).decode('utf-8')
+        return self.text
+
+
+class BlobTextMixin:
+    """Store the unsaved TextBlobs assigned to ``blob_fields`` before saving the row."""
+
+    blob_fields = ()
+
+    def pending_blobs(self):
+        """Blobs assigned to this instance that are not in the database yet."""
+        for field_name in self.blob_fields:
+            field = self._meta.get_field(field_name)
+            if field.is_cached(self):
+                blob = field.get_cached_value(self)
+                if blob is not None and blob._state.adding:
+                    yield blob
+
+    def save(self, *args, **kwargs):
+        TextBlob.objects.store(self.pending_blobs())
+        super().save(*args, **kwargs)
+
+
+class ComparisonRun(BlobTextMixin, models.Model):
+    """One prompt sent to several sessions at once; the results are linked PromptResponses."""
+
+    prompt_blob = models.ForeignKey(
+        TextBlob,
+        on_delete=models.PROTECT,
+        related_name='+',
+        help_text="Prompt sent to every session"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    wall_time = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Time until the slowest session finished, in seconds"
+    )
+
+    blob_fields = ('prompt_blob',)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Comparison Run'
+        verbose_name_plural = 'Comparison Runs'
+
+    @property
+    def prompt(self):
+        return self.prompt_blob.content if self.prompt_blob_id else ''
+
+    @prompt.setter
+    def prompt(self, value):
+        self.prompt_blob = TextBlob.build(value)
+
+    def __str__(self):
+        return f"Comparison at {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class PromptResponseManager(models.Manager):
+    """Default manager that loads the text blobs with every row."""
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('prompt_blob', 'response_blob')
+
+
+class PromptResponse(BlobTextMixin, models.Model):
     """Stores user prompts and AI responses."""
 
     STATUS_CHOICES = [
@@ -38,7 +193,11 @@ class PromptResponse(models.Model):
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('timeout', 'Timeout'),
+        ('cancelled', 'Cancelled'),
     ]
+    # Statuses after which a record no longer changes
+    FINAL_STATUSES = ('completed', 'failed', 'timeout', 'cancelled')
 
     session = models.ForeignKey(
         AgentSession,
@@ -48,8 +207,20 @@ class PromptResponse(models.Model):
         blank=True,
         help_text="Associated agent session"
     )
-    prompt = models.TextField(help_text="User's input prompt")
-    response = models.TextField(blank=True, help_text="AI generated response")
+    prompt_blob = models.ForeignKey(
+        TextBlob,
+        on_delete=models.PROTECT,
+        related_name='+',
+        help_text="User's input prompt"
+    )
+    response_blob = models.ForeignKey(
+        TextBlob,
+        on_delete=models.PROTECT,
+        related_name='+',
+        null=True,
+        blank=True,
+        help_text="AI generated response"
+    )
     model_used = models.CharField(
         max_length=100,
         default='gpt-4o-mini',
@@ -71,6 +242,42 @@ class PromptResponse(models.Model):
         blank=True,
         help_text="Time taken to process in seconds"
     )
+    queue_time = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Time spent waiting for an upstream slot in seconds"
+    )
+    trace_id = models.CharField(
+        max_length=32,
+        blank=True,
+        db_index=True,
+        help_text="Id of the request trace, when it was sampled"
+    )
+    comparison = models.ForeignKey(
+        ComparisonRun,
+        on_delete=models.SET_NULL,
+        related_name='results',
+        null=True,
+        blank=True,
+        help_text="Comparison run this response belongs to"
+    )
+    input_tokens = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Prompt tokens reported by the API"
+    )
+    output_tokens = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Generated tokens reported by the API"
+    )
+    instruction = models.TextField(
+        blank=True,
+        help_text="Instruction applied to every chunk when the prompt is processed with map-reduce"
+    )
+
+    objects = PromptResponseManager()
+    blob_fields = ('prompt_blob', 'response_blob')
 
     class Meta:
         ordering = ['-created_at']
@@ -79,7 +286,107 @@ class PromptResponse(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['status']),
+            # Completion-time scans of the similarity index
+            models.Index(fields=['status', 'updated_at']),
         ]
 
+    @property
+    def is_finished(self):
+        return self.status in self.FINAL_STATUSES
+
+    # Prompt and response text live in deduplicated TextBlob rows; these
+    # accessors keep ``prompt``/``response`` usable as plain attributes.
+    @property
+    def prompt(self):
+        return self.prompt_blob.content if self.prompt_blob_id else ''
+
+    @prompt.setter
+    def prompt(self, value):
+        self.prompt_blob = TextBlob.build(value)
+
+    @property
+    def response(self):
+        return self.response_blob.content if self.response_blob_id else ''
+
+    @response.setter
+    def response(self, value):
+        self.response_blob = TextBlob.build(value) if value else None
+
     def __str__(self):
         return f"Prompt at {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class ChunkResult(BlobTextMixin, models.Model):
+    """
+    One call of a map-reduce run: a chunk of the document (stage 0) or a
+    group of earlier results being combined (stage 1 and up).
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    # No database constraint: a partitioned PromptResponse table (PostgreSQL,
+    # PROMPT_PARTITIONING) cannot be referenced by id alone. Deletes still
+    # cascade through the ORM.
+    prompt_response = models.ForeignKey(
+        PromptResponse,
+        on_delete=models.CASCADE,
+        related_name='chunks',
+        db_constraint=False,
+    )
+    stage = models.PositiveSmallIntegerField(help_text="0 for document chunks, 1 and up for reduce steps")
+    index = models.PositiveIntegerField(help_text="Position within the stage")
+    input_blob = models.ForeignKey(
+        TextBlob,
+        on_delete=models.PROTECT,
+        related_name='+',
+        help_text="Chunk text, or the results being combined"
+    )
+    output_blob = models.ForeignKey(
+        TextBlob,
+        on_delete=models.PROTECT,
+        related_name='+',
+        null=True,
+        blank=True,
+        help_text="Result of this call"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error_message = models.TextField(blank=True)
+    processing_time = models.FloatField(null=True, blank=True)
+    input_tokens = models.PositiveIntegerField(null=True, blank=True)
+    output_tokens = models.PositiveIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    blob_fields = ('input_blob', 'output_blob')
+
+    class Meta:
+        ordering = ['stage', 'index']
+        verbose_name = 'Chunk Result'
+        verbose_name_plural = 'Chunk Results'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['prompt_response', 'stage', 'index'], name='unique_chunk_position'
+            ),
+        ]
+
+    @property
+    def input(self):
+        return self.input_blob.content if self.input_blob_id else ''
+
+    @input.setter
+    def input(self, value):
+        self.input_blob = TextBlob.build(value)
+
+    @property
+    def output(self):
+        return self.output_blob.content if self.output_blob_id else ''
+
+    @output.setter
+    def output(self, value):
+        self.output_blob = TextBlob.build(value) if value else None
+
+    def __str__(self):
+        return f"Chunk {self.stage}.{self.index} of prompt {self.prompt_response_id}"
@@ -0,0 +1,275 @@
+"""Monthly range partitioning of the PromptResponse table on PostgreSQL."""
+import datetime
+import re
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from .models import ChunkResult, PromptResponse
+
+TABLE = PromptResponse._meta.db_table
+SEQUENCE = f'{TABLE}_id_seq'
+# Catches rows outside every monthly partition, so inserts never fail
+DEFAULT_PARTITION = f'{TABLE}_default'
+_PARTITION_RE = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+class PartitioningError(Exception):
+    """Raised when the table cannot be (un)partitioned."""
+
+
+def month_start(value):
+    """Return the first instant (UTC) of the month holding ``value``."""
+    value = value.astimezone(datetime.timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(start, months):
+    month = start.month - 1 + months
+    return start.replace(year=start.year + month // 12, month=month % 12 + 1)
+
+
+def partition_name(start):
+    return f'{TABLE}_p{start:%Y_%m}'
+
+
+def partitioning_enabled(alias):
+    """Whether queries on ``alias`` should be shaped for partition pruning."""
+    return settings.PROMPT_PARTITIONING and connections[alias].vendor == 'postgresql'
+
+
+def is_partitioned(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions(connection):
+    """Return ``(name, month start)`` of the attached monthly partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if match:
+            start = datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc)
+            partitions.append((name, start))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _bounds(start):
+    return f"FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')"
+
+
+def create_partitions(connection, months_ahead, start=None):
+    """
+    Create the missing partitions from ``start`` (default: this month) up to
+    ``months_ahead`` months after the current one.
+
+    Rows of a new month that already landed in the default partition are
+    moved into its partition. Returns the names of the partitions created.
+    """
+    qn = connection.ops.quote_name
+    existing = {name for name, _ in list_partitions(connection)}
+    last = add_months(month_start(timezone.now()), months_ahead)
+    month = month_start(start or timezone.now())
+    created = []
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            end = add_months(month, 1)
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT EXISTS (SELECT 1 FROM {qn(DEFAULT_PARTITION)} '
+                    f'WHERE created_at >= %s AND created_at < %s)',
+                    [month, end],
+                )
+                if cursor.fetchone()[0]:
+                    # Attaching checks the default partition holds no rows of the new range
+                    cursor.execute(
+                        f'CREATE TABLE {qn(name)} '
+                        f'(LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+                    )
+                    cursor.execute(
+                        f'WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} '
+                        f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+                        f'INSERT INTO {qn(name)} SELECT * FROM moved',
+                        [month, end],
+                    )
+                    cursor.execute(f'ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(name)} FOR VALUES {_bounds(month)}')
+                else:
+                    cursor.execute(f'CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} FOR VALUES {_bounds(month)}')
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def drop_partitions(connection, before, detach_only=False):
+    """
+    Remove the partitions whose month ends on or before ``before``.
+
+    Each partition is detached, a short metadata change instead of deleting
+    its rows one by one, and dropped unless ``detach_only`` keeps it as a
+    standalone table for archiving. Their chunk results are deleted first,
+    since nothing cascades from a detached partition; text blobs are shared
+    and stay. Returns the names of the partitions removed.
+    """
+    qn = connection.ops.quote_name
+    removed = []
+    for name, start in list_partitions(connection):
+        if add_months(start, 1) > before:
+            continue
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {qn(ChunkResult._meta.db_table)} '
+                f'WHERE prompt_response_id IN (SELECT id FROM {qn(name)})'
+            )
+            # Not CONCURRENTLY: PostgreSQL refuses that while a default partition exists
+            cursor.execute(f'ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}')
+            if not detach_only:
+                cursor.execute(f'DROP TABLE {qn(name)}')
+        removed.append(name)
+    return removed
+
+
+def _indexes(cursor):
+    """CREATE INDEX statements of the table's indexes, except the primary key."""
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p')",
+        [TABLE, TABLE],
+    )
+    # Indexes of a partitioned table are defined ON ONLY the parent
+    return [row[0].replace(' ON ONLY ', ' ON ') for row in cursor.fetchall()]
+
+
+def _foreign_keys(cursor):
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [TABLE],
+    )
+    return cursor.fetchall()
+
+
+def _restore(cursor, qn, indexes, foreign_keys):
+    for sql in indexes:
+        cursor.execute(sql)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(name)} {definition}')
+    cursor.execute(f'ANALYZE {qn(TABLE)}')
+
+
+def partition_table(connection, months_ahead):
+    """
+    Turn the PromptResponse table into one partitioned by month on ``created_at``.
+
+    The rows are copied into a new partitioned table, with partitions from
+    the oldest row's month to ``months_ahead`` months ahead plus a default
+    partition, which then takes the old table's name, indexes and foreign
+    keys, all in one transaction. PostgreSQL requires the partition key in
+    unique constraints, so the primary key becomes ``(id, created_at)``; ids
+    still come from a sequence, so ``id`` stays unique on its own.
+    """
+    qn = connection.ops.quote_name
+    staging = f'{TABLE}_partitioned'
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conrelid::regclass::text FROM pg_constraint WHERE confrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            raise PartitioningError(
+                f"Foreign keys of {', '.join(referencing)} reference {TABLE}; a partitioned "
+                f"table can only be referenced including created_at, so drop them first."
+            )
+        indexes = _indexes(cursor)
+        foreign_keys = _foreign_keys(cursor)
+        cursor.execute(f'SELECT max(id), min(created_at) FROM {qn(TABLE)}')
+        max_id, oldest = cursor.fetchone()
+
+        cursor.execute(
+            f'CREATE TABLE {qn(staging)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+            f'INCLUDING STORAGE) PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(staging)} DEFAULT')
+        month = month_start(oldest or timezone.now())
+        last = add_months(month_start(timezone.now()), months_ahead)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE {qn(partition_name(month))} PARTITION OF {qn(staging)} FOR VALUES {_bounds(month)}'
+            )
+            month = add_months(month, 1)
+        cursor.execute(f'INSERT INTO {qn(staging)} SELECT * FROM {qn(TABLE)}')
+
+        # Dropping the old table frees the names of its sequence, indexes and constraints
+        cursor.execute(f'DROP TABLE {qn(TABLE)}')
+        cursor.execute(f'ALTER TABLE {qn(staging)} RENAME TO {qn(TABLE)}')
+        cursor.execute(f'CREATE SEQUENCE {qn(SEQUENCE)} START WITH {int(max_id or 0) + 1} OWNED BY {qn(TABLE)}.id')
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + "_pkey")} PRIMARY KEY (id, created_at)')
+        _restore(cursor, qn, indexes, foreign_keys)
+
+
+def unpartition_table(connection):
+    """
+    Copy a partitioned PromptResponse table back into a regular table.
+
+    Detached partitions are left alone.
+    """
+    qn = connection.ops.quote_name
+    staging = f'{TABLE}_unpartitioned'
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        indexes = _indexes(cursor)
+        foreign_keys = _foreign_keys(cursor)
+        cursor.execute(f'SELECT max(id) FROM {qn(TABLE)}')
+        max_id = cursor.fetchone()[0]
+
+        cursor.execute(
+            f'CREATE TABLE {qn(staging)} '
+            f'(LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)'
+        )
+        # The copied default points at the sequence that is dropped with the table
+        cursor.execute(f'ALTER TABLE {qn(staging)} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'INSERT INTO {qn(staging)} SELECT * FROM {qn(TABLE)}')
+
+        cursor.execute(f'DROP TABLE {qn(TABLE)}')
+        cursor.execute(f'ALTER TABLE {qn(staging)} RENAME TO {qn(TABLE)}')
+        cursor.execute(
+            f'ALTER TABLE {qn(TABLE)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY '
+            f'(START WITH {int(max_id or 0) + 1})'
+        )
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + "_pkey")} PRIMARY KEY (id)')
+        _restore(cursor, qn, indexes, foreign_keys)
+
+
+def newest(queryset, limit):
+    """
+    Return the ``limit`` newest rows of a ``-created_at`` ordered queryset.
+
+    Without partitioning this is the sliced queryset. With it, the rows are
+    first looked up since the start of last month, a range the planner
+    prunes to two partitions; the whole table is only searched when that
+    holds fewer than ``limit`` rows. Evaluation stays lazy either way, so
+    cached template fragments still skip the query.
+    """
+    if not partitioning_enabled(queryset.db):
+        return queryset[:limit]
+
+    def load():
+        since = add_months(month_start(timezone.now()), -1)
+        rows = list(queryset.filter(created_at__gte=since)[:limit])
+        if len(rows) < limit:
+            rows = list(queryset[:limit])
+        return rows
+
+    return SimpleLazyObject(load)
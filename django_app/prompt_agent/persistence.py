@@ -0,0 +1,291 @@
+"""Write-behind buffering for PromptResponse persistence."""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .caching import invalidate_listings
+from .models import PromptResponse, TextBlob
+from .routing import note_write
+
+logger = logging.getLogger(__name__)
+
+# Columns touched when a prompt finishes; everything else is written once on insert
+RESULT_FIELDS = (
+    'response_blob', 'status', 'error_message', 'processing_time', 'queue_time',
+    'input_tokens', 'output_tokens', 'updated_at',
+)
+# Columns touched when a queued prompt is handed an upstream slot
+DISPATCH_FIELDS = ('status', 'queue_time', 'updated_at')
+# Upper bound of the delay between retries of a failed flush, in seconds
+MAX_RETRY_DELAY = 30.0
+# Flush attempts by close(), a second apart, before the remaining writes are given up
+CLOSE_ATTEMPTS = 3
+
+
+class WriteBehindBuffer:
+    """
+    Bounded in-process buffer that batches PromptResponse writes.
+
+    New rows are collected for ``bulk_create`` and status/result changes for
+    ``bulk_update`` restricted to the changed columns. A background thread
+    flushes when ``batch_size`` writes are pending or ``flush_interval``
+    seconds have passed. When ``max_pending`` writes are queued the caller
+    flushes inline, so memory stays bounded under load. Pending writes are
+    drained by ``close()``, which is registered with ``atexit``.
+
+    A failed flush puts its writes back in the queue, and the background
+    thread retries them with an exponential backoff. While the database
+    stays unavailable and the buffer is full, new writes are refused with
+    ``RuntimeError`` instead of being dropped.
+
+    Rows receive their primary key when their insert is flushed;
+    ``ensure_saved()`` flushes early for a row whose id is needed now.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0, max_pending: int = 1000):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if flush_interval <= 0:
+            raise ValueError("flush_interval must be greater than 0")
+        if max_pending < batch_size:
+            raise ValueError("max_pending must be at least batch_size")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._inserts = OrderedDict()   # id(obj) -> obj
+        self._updates = OrderedDict()   # id(obj) -> (obj, set of field names)
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+        self._failures = 0
+        self._retry_at = 0.0
+
+        self.stats = {'flushes': 0, 'inserted': 0, 'updated': 0, 'errors': 0}
+
+    @property
+    def pending(self) -> int:
+        """Number of queued writes."""
+        return len(self._inserts) + len(self._updates)
+
+    def add(self, obj: PromptResponse):
+        """Queue a new, unsaved PromptResponse for insertion."""
+        now = timezone.now()
+        obj.created_at = obj.created_at or now
+        obj.updated_at = now
+        # The row reaches the database later, on another thread
+        note_write()
+        self._make_room()
+        with self._cond:
+            self._check_open()
+            self._inserts[id(obj)] = obj
+        self._after_enqueue()
+
+    def update(self, obj: PromptResponse, fields=RESULT_FIELDS):
+        """
+        Queue changes to ``fields`` of ``obj``.
+
+        If the row's insert has not been flushed yet, the insert already
+        carries the new values and nothing else is queued.
+        """
+        obj.updated_at = timezone.now()
+        note_write()
+        self._make_room()
+        with self._cond:
+            self._check_open()
+            if id(obj) in self._inserts:
+                return
+            _, queued = self._updates.setdefault(id(obj), (obj, set()))
+            queued.update(fields)
+            queued.add('updated_at')
+        self._after_enqueue()
+
+    def ensure_saved(self, obj: PromptResponse):
+        """
+        Flush now if the insert of ``obj`` is still queued, so it has a primary key.
+
+        Raises ``RuntimeError`` when the insert could not be written; it
+        stays queued for a retry.
+        """
+        if obj.pk is None:
+            self.flush()
+        if obj.pk is None:
+            raise RuntimeError("The prompt could not be saved yet; the write will be retried")
+
+    def flush(self) -> bool:
+        """
+        Write all queued changes in a single transaction.
+
+        Returns False when the write failed; the changes are then queued
+        again and retried after a backoff.
+        """
+        with self._flush_lock:
+            with self._cond:
+                inserts = list(self._inserts.values())
+                updates = list(self._updates.values())
+                self._inserts.clear()
+                self._updates.clear()
+
+            # An update can overtake its own insert while that insert is being
+            # written by a concurrent flush; keep it for the next round.
+            deferred = [(obj, fields) for obj, fields in updates if obj.pk is None]
+            updates = [(obj, fields) for obj, fields in updates if obj.pk is not None]
+
+            written = True
+            if inserts or updates:
+                # Blob rows are stored in the same transaction and roll back with it
+                blobs = [
+                    blob for obj in [*inserts, *(obj for obj, _ in updates)]
+                    for blob in obj.pending_blobs()
+                ]
+                try:
+                    self._write(inserts, updates)
+                except Exception:
+                    written = False
+                    for obj in inserts:
+                        obj.pk = None
+                        obj._state.adding = True
+                    for blob in blobs:
+                        blob._state.adding = True
+                    self._requeue(inserts, updates)
+                    self.stats['errors'] += 1
+                    self._failures += 1
+                    delay = min(MAX_RETRY_DELAY, self.flush_interval * 2 ** self._failures)
+                    self._retry_at = time.monotonic() + delay
+                    logger.exception(
+                        "Write-behind flush failed; requeued %d inserts and %d updates, retrying in %.1fs",
+                        len(inserts), len(updates), delay,
+                    )
+                else:
+                    self._failures = 0
+                    self._retry_at = 0.0
+                    self.stats['flushes'] += 1
+                    self.stats['inserted'] += len(inserts)
+                    self.stats['updated'] += len(updates)
+
+            if deferred:
+                self._requeue([], deferred)
+            return written
+
+    def close(self):
+        """Stop the flusher thread and drain everything still queued."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        for attempt in range(CLOSE_ATTEMPTS):
+            while self.pending and self.flush():
+                pass
+            if not self.pending:
+                return
+            if attempt < CLOSE_ATTEMPTS - 1:
+                time.sleep(1.0)
+        logger.error(
+            "Write-behind buffer closed with %d writes that could not be saved", self.pending
+        )
+
+    def _write(self, inserts, updates):
+        close_old_connections()
+        with transaction.atomic():
+            # Text blobs first, so the rows below can reference them
+            TextBlob.objects.store_for(
+                [*inserts, *(obj for obj, _ in updates)]
+            )
+            if inserts:
+                PromptResponse.objects.bulk_create(inserts, batch_size=self.batch_size)
+            # bulk_update writes one column set per call, so group by field set
+            by_fields = {}
+            for obj, fields in updates:
+                by_fields.setdefault(tuple(sorted(fields)), []).append(obj)
+            for fields, objs in by_fields.items():
+                PromptResponse.objects.bulk_update(objs, fields, batch_size=self.batch_size)
+        # Bulk operations bypass post_save, so invalidate cached listings here
+        invalidate_listings()
+
+    def _requeue(self, inserts, updates):
+        """Queue writes again, ahead of the inserts that arrived in the meantime."""
+        with self._cond:
+            self._inserts = OrderedDict(
+                [*((id(obj), obj) for obj in inserts), *self._inserts.items()]
+            )
+            for obj, fields in updates:
+                if id(obj) in self._inserts:
+                    continue
+                _, queued = self._updates.setdefault(id(obj), (obj, set()))
+                queued.update(fields)
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("Write-behind buffer is closed")
+
+    def _make_room(self):
+        if self.pending < self.max_pending:
+            return
+        # Backpressure: the producer pays for the flush
+        if not self.flush() and self.pending >= self.max_pending:
+            raise RuntimeError("Write-behind buffer is full and the database is not accepting writes")
+
+    def _after_enqueue(self):
+        self._ensure_thread()
+        if self.pending >= self.batch_size:
+            with self._cond:
+                self._cond.notify()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='prompt-write-behind', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                wake = max(last_flush + self.flush_interval, self._retry_at)
+                self._cond.wait(max(0.0, wake - time.monotonic()))
+                if self._closed:
+                    return
+                if time.monotonic() < self._retry_at:
+                    continue
+                due = time.monotonic() - last_flush >= self.flush_interval
+                if not (self.pending and (due or self.pending >= self.batch_size)):
+                    if due:
+                        last_flush = time.monotonic()
+                    continue
+            self.flush()
+            last_flush = time.monotonic()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_buffer() -> WriteBehindBuffer:
+    """Return the process-wide write-behind buffer, creating it on first use."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBehindBuffer(
+                batch_size=settings.PROMPT_WRITE_BEHIND_BATCH_SIZE,
+                flush_interval=settings.PROMPT_WRITE_BEHIND_FLUSH_INTERVAL,
+                max_pending=settings.PROMPT_WRITE_BEHIND_MAX_PENDING,
+            )
+            atexit.register(_buffer.close)
+        return _buffer
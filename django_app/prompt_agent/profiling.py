@@ -0,0 +1,227 @@
+"""Sampling profiler for requests in a running process."""
+import atexit
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Cache key holding the active capture window, shared by all worker processes
+WINDOW_KEY = 'prompt_agent:profile_window'
+# Capture id used for samples taken because of PROMPT_PROFILE_SAMPLE_RATE
+CONTINUOUS = 'continuous'
+
+
+def frame_name(frame) -> str:
+    """Describe a frame as ``module:qualified.name``."""
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """
+    Statistical profiler that samples the stacks of selected threads.
+
+    Threads are registered with :meth:`profile` under a label (the view
+    name). A background thread wakes every ``interval`` seconds while any
+    thread is registered and counts their current stacks per label, so the
+    profiled code itself is never instrumented. When async views share an
+    event loop thread, samples go to the most recently entered label.
+
+    Counts are kept per capture and written as collapsed stacks
+    (``label;outer;...;inner count``) for flamegraph.pl or speedscope.
+    With an ``output_dir`` they are written every ``flush_interval``
+    seconds and when profiling goes idle.
+    """
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 128,
+                 output_dir=None, flush_interval: float = 2.0):
+        if interval <= 0:
+            raise ValueError("interval must be greater than 0")
+        self.interval = interval
+        self.max_depth = max_depth
+        self.output_dir = output_dir
+        self.flush_interval = flush_interval
+        self.samples = 0
+        self._active = {}           # thread id -> list of [capture, label]
+        self._counts = {}           # capture -> Counter of stacks
+        self._dirty = set()         # captures with samples not yet written
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @contextmanager
+    def profile(self, label: str, capture: str = CONTINUOUS):
+        """
+        Sample the calling thread while the block runs.
+
+        Yields a ``[capture, label]`` list; the label may be changed in place,
+        e.g. once the view has been resolved.
+        """
+        thread_id = threading.get_ident()
+        entry = [capture, label]
+        with self._lock:
+            self._active.setdefault(thread_id, []).append(entry)
+        self._ensure_thread()
+        self._wakeup.set()
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entries = self._active[thread_id]
+                entries.remove(entry)
+                if not entries:
+                    del self._active[thread_id]
+
+    def counts(self, capture: str = CONTINUOUS) -> Counter:
+        with self._lock:
+            return Counter(self._counts.get(capture, ()))
+
+    def collapsed(self, capture: str = CONTINUOUS) -> str:
+        """Return the samples of ``capture`` as collapsed stack lines."""
+        return format_collapsed(self.counts(capture))
+
+    def dump(self, directory=None, capture: str = None):
+        """
+        Write ``capture``, or every capture with new samples, to ``directory``.
+
+        Files are named ``<capture>-<pid>.collapsed`` so processes sharing the
+        directory do not overwrite each other.
+        """
+        directory = Path(directory or self.output_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            captures = [capture] if capture else list(self._dirty)
+            self._dirty.difference_update(captures)
+        for name in captures:
+            data = self.collapsed(name)
+            if data:
+                path = directory / f'{name}-{os.getpid()}.collapsed'
+                tmp = path.with_suffix('.tmp')
+                tmp.write_text(data, encoding='utf-8')
+                tmp.replace(path)
+
+    def discard(self, capture: str):
+        with self._lock:
+            self._counts.pop(capture, None)
+            self._dirty.discard(capture)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='prompt-profiler', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        last_dump = time.monotonic()
+        while True:
+            if not self._active:
+                if self.output_dir and self._dirty:
+                    self.dump()
+                self._wakeup.wait()
+                self._wakeup.clear()
+            time.sleep(self.interval)
+            self._sample()
+            if self.output_dir and time.monotonic() - last_dump >= self.flush_interval:
+                self.dump()
+                last_dump = time.monotonic()
+
+    def _sample(self):
+        with self._lock:
+            active = {thread_id: tuple(entries[-1]) for thread_id, entries in self._active.items()}
+        if not active:
+            return
+        frames = sys._current_frames()
+        stacks = []
+        for thread_id, (capture, label) in active.items():
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                names.append(frame_name(frame))
+                frame = frame.f_back
+            # Spaces and semicolons are separators in the collapsed format
+            names.append(label.replace(';', ':').replace(' ', '_'))
+            stacks.append((capture, ';'.join(reversed(names))))
+        with self._lock:
+            for capture, stack in stacks:
+                self._counts.setdefault(capture, Counter())[stack] += 1
+                self._dirty.add(capture)
+            self.samples += len(stacks)
+
+
+def format_collapsed(counts) -> str:
+    """Render stack counts as collapsed stack lines."""
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(counts.items()))
+
+
+def merge_collapsed(paths) -> Counter:
+    """Sum collapsed stack files into one Counter."""
+    total = Counter()
+    for path in paths:
+        for line in Path(path).read_text(encoding='utf-8').splitlines():
+            stack, _, count = line.rpartition(' ')
+            if stack:
+                total[stack] += int(count)
+    return total
+
+
+class ProfileWindow:
+    """Reads the capture window requested through the shared cache, at most once per poll interval."""
+
+    def __init__(self, poll_interval: float = 1.0):
+        self.poll_interval = poll_interval
+        self._window = None
+        self._checked = 0.0
+
+    def current(self):
+        """Return ``(capture, rate)`` for the active window, or None."""
+        now = time.monotonic()
+        if now - self._checked >= self.poll_interval:
+            self._checked = now
+            self._window = cache.get(WINDOW_KEY)
+        window = self._window
+        if window is None or window['until'] <= time.time():
+            return None
+        return window['id'], window['rate']
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> StackSampler:
+    """Return the process-wide sampler, creating it on first use."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = StackSampler(
+                settings.PROMPT_PROFILE_INTERVAL,
+                output_dir=settings.PROMPT_PROFILE_DIR,
+                flush_interval=settings.PROMPT_PROFILE_FLUSH_INTERVAL,
+            )
+            atexit.register(_sampler.dump)
+        return _sampler
+
+
+def choose_capture(window: ProfileWindow):
+    """Decide whether to profile a request; returns the capture id or None."""
+    active = window.current()
+    if active is not None and random.random() < active[1]:
+        return active[0]
+    rate = settings.PROMPT_PROFILE_SAMPLE_RATE
+    if rate > 0 and random.random() < rate:
+        return CONTINUOUS
+    return None
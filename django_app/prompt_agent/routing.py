@@ -0,0 +1,108 @@
+"""Database routing between the primary and an optional read replica."""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Cookie holding the time (epoch seconds) until which a client reads from the primary
+PIN_COOKIE = 'prompt_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = contextvars.ContextVar('prompt_agent_replica_reads', default=False)
+_request_state = contextvars.ContextVar('prompt_agent_routing_state', default=None)
+
+
+class RoutingState:
+    """Per-request routing flags; shared by reference with tasks and worker threads."""
+
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned: bool = False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_alias():
+    """Return the configured replica alias, or None when there is no replica."""
+    alias = settings.PROMPT_DB_REPLICA
+    return alias if alias and alias in settings.DATABASES else None
+
+
+@contextmanager
+def route_request(pinned: bool = False):
+    """Track the writes of one request; ``pinned`` keeps all its reads on the primary."""
+    state = RoutingState(pinned)
+    token = _request_state.set(state)
+    try:
+        yield state
+    finally:
+        _request_state.reset(token)
+
+
+@contextmanager
+def use_replica():
+    """Let reads inside the block go to the replica, unless the request is pinned."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(view):
+    """Serve the GET/HEAD/OPTIONS requests of a read-only view from the replica."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        with use_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def note_write():
+    """Record that the current request wrote data, which pins its client to the primary."""
+    state = _request_state.get()
+    if state is not None:
+        state.wrote = True
+
+
+class ReplicaRouter:
+    """
+    Send reads of this app's models to the replica inside ``use_replica()``.
+
+    Everything else uses the primary: writes, reads outside such blocks,
+    reads of a request that wrote or whose client is pinned, reads inside a
+    transaction on the primary, and reads that follow relations of an
+    instance loaded from the primary. Other apps (sessions, auth) always
+    stay on the primary so logins are never read back stale.
+    """
+
+    route_app_labels = {'prompt_agent'}
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or model._meta.app_label not in self.route_app_labels:
+            return None
+        state = _request_state.get()
+        if state is not None and (state.pinned or state.wrote):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in self.route_app_labels:
+            note_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data, so objects may be related across them
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,254 @@
+"""Priority scheduling with weighted fair sharing of upstream capacity."""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+INTERACTIVE = 0
+BATCH = 1
+
+# Public names accepted by the service and the AJAX endpoint
+PRIORITIES = {
+    'interactive': INTERACTIVE,
+    'batch': BATCH,
+}
+
+
+class OverloadedError(RuntimeError):
+    """Raised when a request is shed instead of queued."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request's place in the scheduler queue."""
+
+    def __init__(self, flow, priority, weight, max_concurrency):
+        self.flow = flow
+        self.priority = priority
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.start_tag = 0.0
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+        self.released = False
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def granted(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def wait_time(self) -> float:
+        """Seconds spent queued (so far, if not yet granted)."""
+        end = self.granted_at if self.granted_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until a slot is granted; returns False on timeout."""
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout: float = None) -> bool:
+        """Await a slot without blocking the event loop; False on timeout."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+
+        self._add_callback(wake)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return self.granted
+        return True
+
+    def _add_callback(self, callback):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def _grant(self):
+        with self._lock:
+            self.granted_at = time.monotonic()
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class FairScheduler:
+    """
+    Admit requests to the upstream API in priority and fair-share order.
+
+    At most ``max_concurrency`` requests run at once. Waiting requests are
+    served strictly by priority class (interactive before batch); within a
+    class, each flow (agent session) gets capacity in proportion to its
+    weight using start-time fair queuing, and a flow never holds more than
+    its own ``max_concurrency`` slots.
+
+    Admission control: a request that cannot start immediately is rejected
+    with :class:`OverloadedError` when ``max_queue`` requests are already
+    waiting, or when its estimated wait exceeds ``max_wait`` (or the
+    caller's own limit). The estimate uses a moving average of how long
+    granted requests hold their slot.
+    """
+
+    # Smoothing factor for the service time moving average
+    SERVICE_TIME_ALPHA = 0.2
+
+    def __init__(self, max_concurrency: int, max_queue: int = None, max_wait: float = None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.service_time = None
+        self._lock = threading.Lock()
+        self._queues = {}          # (priority, flow) -> deque of tickets
+        self._last_finish = {}     # (priority, flow) -> finish tag of last request
+        self._virtual_time = {}    # priority -> start tag of last dispatched request
+        self._in_flight = 0
+        self._flow_in_flight = {}
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def estimated_wait(self, priority: int = INTERACTIVE) -> float:
+        """Estimate how long a new request of ``priority`` would queue."""
+        with self._lock:
+            return self._estimate_wait(priority)
+
+    def submit(self, flow=None, priority: int = INTERACTIVE, weight: int = 1,
+               max_concurrency: int = None, max_wait: float = None) -> Ticket:
+        """
+        Queue a request; the returned ticket may already be granted.
+
+        Raises:
+            OverloadedError: If admission control sheds the request.
+        """
+        ticket = Ticket(flow, priority, max(weight, 1), max_concurrency)
+        key = (priority, flow)
+        with self._lock:
+            self._admit(priority, max_wait)
+            start = max(self._virtual_time.get(priority, 0.0), self._last_finish.get(key, 0.0))
+            ticket.start_tag = start
+            self._last_finish[key] = start + 1.0 / ticket.weight
+            self._queues.setdefault(key, deque()).append(ticket)
+            self._dispatch()
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Free the ticket's slot, or withdraw it from the queue if still waiting."""
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.granted:
+                held = time.monotonic() - ticket.granted_at
+                if self.service_time is None:
+                    self.service_time = held
+                else:
+                    self.service_time += self.SERVICE_TIME_ALPHA * (held - self.service_time)
+                self._in_flight -= 1
+                self._flow_in_flight[ticket.flow] -= 1
+                if not self._flow_in_flight[ticket.flow]:
+                    del self._flow_in_flight[ticket.flow]
+            else:
+                key = (ticket.priority, ticket.flow)
+                queue = self._queues.get(key)
+                if queue is not None:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[key]
+            self._dispatch()
+
+    def _admit(self, priority: int, max_wait: float = None):
+        """Raise OverloadedError if a new request should not be queued."""
+        if self._in_flight < self.max_concurrency and not self._queues:
+            return
+        if self.max_queue is not None and self.queued >= self.max_queue:
+            raise OverloadedError(
+                "Too many requests are waiting for the upstream API",
+                self._retry_after(self._estimate_wait(priority)),
+            )
+        limits = [limit for limit in (self.max_wait, max_wait) if limit is not None]
+        if limits:
+            estimate = self._estimate_wait(priority)
+            if estimate > min(limits):
+                raise OverloadedError(
+                    f"Estimated wait of {estimate:.1f}s exceeds the limit",
+                    self._retry_after(estimate),
+                )
+
+    def _estimate_wait(self, priority: int) -> float:
+        if self.service_time is None:
+            return 0.0
+        ahead = sum(
+            len(queue) for (queued_priority, _), queue in self._queues.items()
+            if queued_priority <= priority
+        )
+        if self._in_flight < self.max_concurrency and not ahead:
+            return 0.0
+        return (ahead + 1) * self.service_time / self.max_concurrency
+
+    @staticmethod
+    def _retry_after(estimate: float) -> int:
+        return max(1, math.ceil(estimate))
+
+    def _dispatch(self):
+        while self._in_flight < self.max_concurrency:
+            key = self._next_key()
+            if key is None:
+                return
+            queue = self._queues[key]
+            ticket = queue.popleft()
+            if not queue:
+                del self._queues[key]
+            self._in_flight += 1
+            self._flow_in_flight[ticket.flow] = self._flow_in_flight.get(ticket.flow, 0) + 1
+            self._virtual_time[ticket.priority] = ticket.start_tag
+            ticket._grant()
+
+    def _next_key(self):
+        best = None
+        for key, queue in self._queues.items():
+            head = queue[0]
+            cap = head.max_concurrency
+            if cap and self._flow_in_flight.get(head.flow, 0) >= cap:
+                continue
+            rank = (head.priority, head.start_tag, head.enqueued_at)
+            if best is None or rank < best[0]:
+                best = (rank, key)
+        return best[1] if best else None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FairScheduler:
+    """Return the process-wide scheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler(
+                settings.PROMPT_SCHEDULER_CONCURRENCY,
+                max_queue=settings.PROMPT_ADMISSION_MAX_QUEUE,
+                max_wait=settings.PROMPT_ADMISSION_MAX_WAIT,
+            )
+        return _scheduler
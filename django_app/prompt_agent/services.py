@@ -1,17 +1,81 @@
 """Service layer for interacting with the OpenAI agent."""
+import asyncio
 import sys
+import threading
 import time
 from pathlib import Path
 
+from asgiref.sync import async_to_sync, sync_to_async
 from django.conf import settings
+from django.db import transaction
 
 # Add the src directory to the path so we can import the OpenAI agent
 src_path = Path(__file__).resolve().parent.parent.parent / 'src'
 if str(src_path) not in sys.path:
     sys.path.insert(0, str(src_path))
 
-from openai_agent import OpenAIAgent
-from .models import PromptResponse, AgentSession
+from cassette import cassette_transports
+from key_pool import KeyPool
+from map_reduce import DEFAULT_INSTRUCTION, build_prompt, run_map_reduce, token_counter
+from openai_agent import DeadlineExceededError, OpenAIAgent
+from .models import AgentSession, ChunkResult, ComparisonRun, PromptResponse, TextBlob
+from .partitioning import newest
+from .persistence import DISPATCH_FIELDS, RESULT_FIELDS, get_write_buffer
+from .scheduling import PRIORITIES, OverloadedError, get_scheduler
+from .tracing import current_trace_id, get_tracer
+
+_key_pool = None
+_key_pool_lock = threading.Lock()
+_transports = None
+_transports_lock = threading.Lock()
+
+
+class MapReduceError(RuntimeError):
+    """Raised when chunks of a map-reduce run failed; retrying redoes only those."""
+
+
+def get_transports():
+    """
+    Return the process-wide (sync, async) cassette transports.
+
+    Both are None unless ``OPENAI_CASSETTE_MODE`` is ``record`` or ``replay``.
+    """
+    global _transports
+    if not settings.OPENAI_CASSETTE_MODE:
+        return None, None
+    with _transports_lock:
+        if _transports is None:
+            _transports = cassette_transports(
+                settings.OPENAI_CASSETTE_PATH,
+                settings.OPENAI_CASSETTE_MODE,
+                latency_scale=settings.OPENAI_CASSETTE_LATENCY_SCALE,
+                any_match=settings.OPENAI_CASSETTE_ANY_MATCH,
+            )
+        return _transports
+
+
+def get_key_pool():
+    """
+    Return the process-wide API key pool, or None without ``OPENAI_API_KEYS``.
+
+    The pool is shared so per-key load and ejection state survive across
+    requests.
+    """
+    global _key_pool
+    if not settings.OPENAI_API_KEYS:
+        return None
+    with _key_pool_lock:
+        if _key_pool is None:
+            transport, async_transport = get_transports()
+            _key_pool = KeyPool.from_config(
+                settings.OPENAI_API_KEYS,
+                transport=transport,
+                async_transport=async_transport,
+                eject_after=settings.OPENAI_KEY_EJECT_AFTER,
+                eject_seconds=settings.OPENAI_KEY_EJECT_SECONDS,
+                auth_eject_seconds=settings.OPENAI_KEY_AUTH_EJECT_SECONDS,
+            )
+        return _key_pool
 
 
 class PromptAgentService:
@@ -19,59 +83,526 @@ class PromptAgentService:
 
     def __init__(self):
         """Initialize the agent service."""
-        self.agent = OpenAIAgent(api_key=settings.OPENAI_API_KEY)
+        self.tracer = get_tracer()
+        with self.tracer.span('agent.init'):
+            key_pool = get_key_pool()
+            if key_pool is not None:
+                self.agent = OpenAIAgent(key_pool=key_pool, tracer=self.tracer)
+            else:
+                transport, async_transport = get_transports()
+                api_key = settings.OPENAI_API_KEY
+                if settings.OPENAI_CASSETTE_MODE == 'replay':
+                    # Replayed responses need no real key
+                    api_key = api_key or 'replay'
+                self.agent = OpenAIAgent(
+                    api_key=api_key,
+                    tracer=self.tracer,
+                    transport=transport,
+                    async_transport=async_transport,
+                )
+        self.write_buffer = get_write_buffer() if settings.PROMPT_WRITE_BEHIND else None
+        self.scheduler = get_scheduler()
+
+    def resolve_timeout(self, session: AgentSession = None, timeout: float = None) -> float:
+        """
+        Determine the deadline for a prompt.
+
+        An explicit per-request timeout wins, then the session default, then
+        ``settings.OPENAI_TIMEOUT``.
+        """
+        if timeout is not None:
+            return timeout
+        if session is not None and session.timeout:
+            return session.timeout
+        return settings.OPENAI_TIMEOUT
 
-    def process_prompt(self, prompt_text: str, session: AgentSession = None) -> PromptResponse:
+    def process_prompt(
+        self,
+        prompt_text: str,
+        session: AgentSession = None,
+        timeout: float = None,
+        priority: str = 'interactive',
+        instruction: str = '',
+    ) -> PromptResponse:
         """
         Process a user prompt and store the result.
 
+        Prompts longer than ``PROMPT_MAP_REDUCE_THRESHOLD`` tokens are
+        processed with :meth:`amap_reduce` instead.
+
         Args:
             prompt_text: The user's input prompt
             session: Optional agent session to use for configuration
+            timeout: Optional deadline in seconds (see ``resolve_timeout``),
+                covering both the queue wait and the upstream call
+            priority: Scheduling class, ``'interactive'`` or ``'batch'``
+            instruction: What to do with each chunk of a long prompt
 
         Returns:
             PromptResponse object with the result
         """
+        if self.needs_map_reduce(prompt_text, session):
+            return async_to_sync(self.amap_reduce)(
+                prompt_text, session=session, timeout=timeout, priority=priority, instruction=instruction
+            )
+        with self.tracer.span('service.process_prompt', priority=priority):
+            return self._process_prompt(prompt_text, session, timeout, priority)
+
+    def _process_prompt(self, prompt_text, session, timeout, priority):
         # Determine which model to use
         model = session.model if session else settings.OPENAI_MODEL
+        deadline = time.monotonic() + self.resolve_timeout(session, timeout)
 
-        # Create the prompt response record
-        prompt_response = PromptResponse.objects.create(
-            prompt=prompt_text,
-            session=session,
-            model_used=model,
-            status='processing'
-        )
-
+        ticket = self._submit(session, priority, deadline)
         start_time = time.time()
+        try:
+            # Create the prompt response record; it stays pending while queued
+            prompt_response = PromptResponse(
+                prompt=prompt_text,
+                session=session,
+                model_used=model,
+                status='processing' if ticket.granted else 'pending',
+                trace_id=current_trace_id(),
+            )
+            self._insert(prompt_response)
+
+            try:
+                if not ticket.granted:
+                    with self.tracer.span('scheduler.wait'):
+                        granted = ticket.wait(self._remaining(deadline))
+                    self._record_dispatch(prompt_response, ticket, granted)
+                    self._save_dispatch(prompt_response)
+
+                # Generate the response using the OpenAI agent
+                with self.tracer.span('agent.generate_response', model=model):
+                    generation = self.agent.generate(
+                        prompt_text, model=model, timeout=self._remaining(deadline)
+                    )
+            except DeadlineExceededError as exc:
+                self._record_failure(prompt_response, 'timeout', exc, start_time)
+                self._save_result(prompt_response)
+                raise
+            except Exception as exc:
+                self._record_failure(prompt_response, 'failed', exc, start_time)
+                self._save_result(prompt_response)
+                raise
+        finally:
+            self.scheduler.release(ticket)
 
+        self._record_success(prompt_response, generation, start_time)
+        self._save_result(prompt_response)
+        return prompt_response
+
+    async def aprocess_prompt(
+        self,
+        prompt_text: str,
+        session: AgentSession = None,
+        timeout: float = None,
+        priority: str = 'interactive',
+        comparison: ComparisonRun = None,
+        instruction: str = '',
+    ) -> PromptResponse:
+        """
+        Asynchronous variant of ``process_prompt`` for ASGI views.
+
+        When the calling task is cancelled (e.g. the client disconnected),
+        the upstream request is aborted and the record is marked
+        ``cancelled`` before the cancellation propagates. ``comparison``
+        links the record to a comparison run.
+        """
+        if self.needs_map_reduce(prompt_text, session):
+            return await self.amap_reduce(
+                prompt_text, session=session, timeout=timeout, priority=priority,
+                instruction=instruction, comparison=comparison,
+            )
+        with self.tracer.span('service.aprocess_prompt', priority=priority):
+            return await self._aprocess_prompt(prompt_text, session, timeout, priority, comparison)
+
+    async def _aprocess_prompt(self, prompt_text, session, timeout, priority, comparison=None):
+        model = session.model if session else settings.OPENAI_MODEL
+        deadline = time.monotonic() + self.resolve_timeout(session, timeout)
+
+        ticket = self._submit(session, priority, deadline)
+        start_time = time.time()
         try:
-            # Generate the response using the OpenAI agent
-            response_text = self.agent.generate_response(prompt_text, model=model)
+            prompt_response = PromptResponse(
+                prompt=prompt_text,
+                session=session,
+                model_used=model,
+                status='processing' if ticket.granted else 'pending',
+                trace_id=current_trace_id(),
+                comparison=comparison,
+            )
+            insert = asyncio.ensure_future(sync_to_async(self._insert)(prompt_response))
+            try:
+                # Shielded: the insert runs in a thread and finishes regardless
+                await asyncio.shield(insert)
+            except asyncio.CancelledError:
+                # Wait for the row, then mark it instead of leaving it pending
+                await asyncio.wait([insert])
+                if insert.exception() is None:
+                    await self._asave_cancelled(prompt_response, start_time)
+                raise
 
-            # Calculate processing time
-            processing_time = time.time() - start_time
+            try:
+                if not ticket.granted:
+                    with self.tracer.span('scheduler.wait'):
+                        granted = await ticket.wait_async(self._remaining(deadline))
+                    self._record_dispatch(prompt_response, ticket, granted)
+                    await sync_to_async(self._save_dispatch)(prompt_response)
 
-            # Update the record with success
-            prompt_response.response = response_text
-            prompt_response.status = 'completed'
-            prompt_response.processing_time = processing_time
-            prompt_response.save()
+                with self.tracer.span('agent.generate_response', model=model):
+                    generation = await self.agent.agenerate(
+                        prompt_text, model=model, timeout=self._remaining(deadline)
+                    )
+            except asyncio.CancelledError:
+                await self._asave_cancelled(prompt_response, start_time)
+                raise
+            except DeadlineExceededError as exc:
+                self._record_failure(prompt_response, 'timeout', exc, start_time)
+                await sync_to_async(self._save_result)(prompt_response)
+                raise
+            except Exception as exc:
+                self._record_failure(prompt_response, 'failed', exc, start_time)
+                await sync_to_async(self._save_result)(prompt_response)
+                raise
+        finally:
+            self.scheduler.release(ticket)
 
-        except Exception as exc:
-            # Calculate processing time even on error
-            processing_time = time.time() - start_time
+        self._record_success(prompt_response, generation, start_time)
+        await sync_to_async(self._save_result)(prompt_response)
+        return prompt_response
+
+    def needs_map_reduce(self, prompt_text: str, session: AgentSession = None) -> bool:
+        """Whether the prompt exceeds ``PROMPT_MAP_REDUCE_THRESHOLD`` tokens."""
+        threshold = settings.PROMPT_MAP_REDUCE_THRESHOLD
+        # A token spans at least one character, so short prompts need no counting
+        if not threshold or len(prompt_text) <= threshold:
+            return False
+        model = session.model if session else settings.OPENAI_MODEL
+        return token_counter(model)(prompt_text) > threshold
+
+    async def amap_reduce(
+        self,
+        prompt_text: str,
+        session: AgentSession = None,
+        timeout: float = None,
+        priority: str = 'interactive',
+        instruction: str = '',
+        comparison: ComparisonRun = None,
+    ) -> PromptResponse:
+        """
+        Process a document that is too long for one request with map-reduce.
 
-            # Update the record with error
-            prompt_response.status = 'failed'
-            prompt_response.error_message = str(exc)
-            prompt_response.processing_time = processing_time
-            prompt_response.save()
+        The document is split into chunks of ``PROMPT_MAP_REDUCE_CHUNK_TOKENS``
+        tokens and ``instruction`` is applied to each; the chunk results are
+        then combined, in as many reduce steps as needed, into the response.
+        Up to ``PROMPT_MAP_REDUCE_CONCURRENCY`` calls run at once, each going
+        through the scheduler with its own deadline (see ``resolve_timeout``).
+        Every call is stored as a ChunkResult, so :meth:`aretry_map_reduce`
+        can finish a failed run without repeating the chunks that completed.
 
+        Raises:
+            MapReduceError: If any chunk failed; the record is marked failed
+        """
+        model = session.model if session else settings.OPENAI_MODEL
+        with self.tracer.span('service.amap_reduce', priority=priority):
+            prompt_response = PromptResponse(
+                prompt=prompt_text,
+                session=session,
+                model_used=model,
+                status='processing',
+                trace_id=current_trace_id(),
+                comparison=comparison,
+                instruction=instruction,
+            )
+            # Not through the write-behind buffer: the chunks need the primary key
+            await sync_to_async(self._save_new)(prompt_response)
+            return await self._arun_map_reduce(prompt_response, timeout, priority)
+
+    async def aretry_map_reduce(
+        self,
+        prompt_response: PromptResponse,
+        timeout: float = None,
+        priority: str = 'interactive',
+    ) -> PromptResponse:
+        """
+        Finish a failed map-reduce run, reusing every chunk result that completed.
+
+        ``prompt_response.session`` must already be loaded.
+        """
+        with self.tracer.span('service.aretry_map_reduce', priority=priority):
+            prompt_response.status = 'processing'
+            prompt_response.error_message = ''
+            await sync_to_async(self._save_result)(prompt_response)
+            return await self._arun_map_reduce(prompt_response, timeout, priority)
+
+    async def _arun_map_reduce(self, prompt_response, timeout, priority):
+        session = prompt_response.session
+        model = prompt_response.model_used
+        instruction = prompt_response.instruction or DEFAULT_INSTRUCTION
+        existing = {
+            (chunk.stage, chunk.index): chunk
+            for chunk in await sync_to_async(list)(
+                prompt_response.chunks.select_related('input_blob', 'output_blob')
+            )
+        }
+        semaphore = asyncio.Semaphore(settings.PROMPT_MAP_REDUCE_CONCURRENCY)
+        used = []
+        start_time = time.time()
+
+        async def run_stage(stage, inputs):
+            chunks = []
+            for index, text in enumerate(inputs):
+                chunk = existing.get((stage, index))
+                if chunk is None:
+                    chunk = ChunkResult(prompt_response=prompt_response, stage=stage, index=index)
+                if chunk.input_blob_id != TextBlob.build(text).digest:
+                    # New, or its input changed because an earlier chunk was redone
+                    chunk.input = text
+                    chunk.output = ''
+                    chunk.status = 'pending'
+                chunks.append(chunk)
+            used.extend(chunks)
+            await sync_to_async(self._save_chunks)([chunk for chunk in chunks if chunk.status != 'completed'])
+
+            await asyncio.gather(*(
+                self._arun_chunk(
+                    chunk, build_prompt(instruction, stage, chunk.index, len(chunks), chunk.input),
+                    model, session, timeout, priority, semaphore,
+                )
+                for chunk in chunks if chunk.status != 'completed'
+            ))
+            failed = [chunk for chunk in chunks if chunk.status != 'completed']
+            if failed:
+                raise MapReduceError(
+                    f"{len(failed)} of {len(chunks)} chunks in stage {stage} failed, "
+                    f"retry to process them: {failed[0].error_message}"
+                )
+            return [chunk.output for chunk in chunks]
+
+        try:
+            response_text = await run_map_reduce(
+                prompt_response.prompt,
+                run_stage,
+                chunk_tokens=settings.PROMPT_MAP_REDUCE_CHUNK_TOKENS,
+                count=token_counter(model),
+            )
+        except asyncio.CancelledError:
+            await self._asave_cancelled(prompt_response, start_time)
+            raise
+        except Exception as exc:
+            self._record_failure(prompt_response, 'failed', exc, start_time)
+            await sync_to_async(self._save_result)(prompt_response)
             raise
 
+        prompt_response.response = response_text
+        prompt_response.status = 'completed'
+        # Usage of the whole run, including chunks kept from earlier attempts
+        prompt_response.input_tokens = sum(chunk.input_tokens or 0 for chunk in used)
+        prompt_response.output_tokens = sum(chunk.output_tokens or 0 for chunk in used)
+        self._record_processing_time(prompt_response, start_time)
+        await sync_to_async(self._finish_map_reduce)(prompt_response, used)
         return prompt_response
 
+    async def _arun_chunk(self, chunk, prompt, model, session, timeout, priority, semaphore):
+        """Run one map or reduce call and store its outcome on ``chunk``."""
+        async with semaphore:
+            with self.tracer.span('map_reduce.chunk', stage=chunk.stage, index=chunk.index):
+                start_time = time.time()
+                try:
+                    deadline = time.monotonic() + self.resolve_timeout(session, timeout)
+                    ticket = self._submit(session, priority, deadline)
+                    try:
+                        if not ticket.granted:
+                            with self.tracer.span('scheduler.wait'):
+                                granted = await ticket.wait_async(self._remaining(deadline))
+                            if not granted:
+                                raise DeadlineExceededError("Deadline exceeded while waiting for a free slot")
+                        generation = await self.agent.agenerate(
+                            prompt, model=model, timeout=self._remaining(deadline)
+                        )
+                    finally:
+                        self.scheduler.release(ticket)
+                except Exception as exc:
+                    chunk.status = 'failed'
+                    chunk.error_message = str(exc)
+                else:
+                    chunk.output = generation.text
+                    chunk.status = 'completed'
+                    chunk.error_message = ''
+                    chunk.input_tokens = generation.input_tokens
+                    chunk.output_tokens = generation.output_tokens
+                chunk.processing_time = time.time() - start_time
+                await sync_to_async(self._save_chunks)([chunk])
+
+    def _save_new(self, prompt_response: PromptResponse):
+        with self.tracer.span('db.insert', buffered=False):
+            prompt_response.save(force_insert=True)
+
+    def _save_chunks(self, chunks):
+        with self.tracer.span('db.save_chunks', count=len(chunks)), transaction.atomic():
+            for chunk in chunks:
+                chunk.save()
+
+    def _finish_map_reduce(self, prompt_response: PromptResponse, used):
+        """Store the result and drop chunks left over from an earlier, differently split attempt."""
+        self._save_result(prompt_response)
+        prompt_response.chunks.exclude(pk__in=[chunk.pk for chunk in used]).delete()
+
+    async def acompare(
+        self,
+        prompt_text: str,
+        sessions,
+        timeout: float = None,
+        priority: str = 'interactive',
+    ) -> ComparisonRun:
+        """
+        Send one prompt to several sessions concurrently.
+
+        Every session gets its own linked PromptResponse, including sessions
+        that fail or are rejected by admission control, so the run always
+        shows one result per session. The calls overlap, so the run's
+        ``wall_time`` is that of the slowest session rather than the sum.
+
+        Returns:
+            The saved ComparisonRun; its ``results`` are the responses
+        """
+        with self.tracer.span('service.acompare', sessions=len(sessions)):
+            comparison = ComparisonRun(prompt=prompt_text)
+            await sync_to_async(comparison.save)()
+
+            started = time.monotonic()
+            outcomes = await asyncio.gather(
+                *(
+                    self.aprocess_prompt(
+                        prompt_text, session=session, timeout=timeout,
+                        priority=priority, comparison=comparison,
+                    )
+                    for session in sessions
+                ),
+                return_exceptions=True,
+            )
+            comparison.wall_time = time.monotonic() - started
+
+            # Rejected requests never got a record; add a failed one
+            rejected = [
+                PromptResponse(
+                    prompt=prompt_text,
+                    session=session,
+                    model_used=session.model,
+                    status='failed',
+                    error_message=str(outcome),
+                    trace_id=current_trace_id(),
+                    comparison=comparison,
+                )
+                for session, outcome in zip(sessions, outcomes)
+                if isinstance(outcome, OverloadedError)
+            ]
+            await sync_to_async(self._save_comparison)(comparison, rejected)
+        return comparison
+
+    def _save_comparison(self, comparison: ComparisonRun, rejected):
+        with self.tracer.span('db.save_comparison'):
+            comparison.save(update_fields=['wall_time'])
+            for prompt_response in rejected:
+                self._insert(prompt_response)
+            if self.write_buffer is not None:
+                # The comparison page reads the results right away
+                self.write_buffer.flush()
+
+    def _submit(self, session: AgentSession, priority: str, deadline: float):
+        """
+        Queue the request with the scheduler under the session's fair share.
+
+        Admission control rejects the request up front (``OverloadedError``)
+        when it would not get a slot before its deadline.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        max_wait = self._remaining(deadline)
+        if session is None:
+            return self.scheduler.submit(priority=PRIORITIES[priority], max_wait=max_wait)
+        return self.scheduler.submit(
+            flow=session.pk,
+            priority=PRIORITIES[priority],
+            weight=session.weight,
+            max_concurrency=session.max_concurrency,
+            max_wait=max_wait,
+        )
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError("Deadline exceeded before the request was sent")
+        return remaining
+
+    @staticmethod
+    def _record_dispatch(prompt_response: PromptResponse, ticket, granted: bool):
+        """Record the queue wait once the scheduler hands out a slot."""
+        prompt_response.queue_time = ticket.wait_time
+        if not granted:
+            raise DeadlineExceededError("Deadline exceeded while waiting for a free slot")
+        prompt_response.status = 'processing'
+
+    def _insert(self, prompt_response: PromptResponse):
+        """Persist a new record, directly or through the write-behind buffer."""
+        with self.tracer.span('db.insert', buffered=self.write_buffer is not None):
+            if self.write_buffer is not None:
+                self.write_buffer.add(prompt_response)
+            else:
+                prompt_response.save(force_insert=True)
+
+    def ensure_saved(self, prompt_response: PromptResponse):
+        """Make sure a buffered record has been inserted, so its ``id`` can be handed out."""
+        if self.write_buffer is not None:
+            with self.tracer.span('db.ensure_saved'):
+                self.write_buffer.ensure_saved(prompt_response)
+
+    def _save_dispatch(self, prompt_response: PromptResponse):
+        """Persist the switch from pending to processing."""
+        with self.tracer.span('db.save_dispatch', buffered=self.write_buffer is not None):
+            if self.write_buffer is not None:
+                self.write_buffer.update(prompt_response, DISPATCH_FIELDS)
+            else:
+                prompt_response.save(update_fields=DISPATCH_FIELDS)
+
+    def _save_result(self, prompt_response: PromptResponse):
+        """Persist the outcome columns only, instead of rewriting the full row."""
+        with self.tracer.span('db.save_result', buffered=self.write_buffer is not None):
+            if self.write_buffer is not None:
+                self.write_buffer.update(prompt_response, RESULT_FIELDS)
+            else:
+                prompt_response.save(update_fields=RESULT_FIELDS)
+
+    async def _asave_cancelled(self, prompt_response: PromptResponse, start_time: float):
+        """Record that the client went away; the write survives repeated cancellation."""
+        prompt_response.status = 'cancelled'
+        prompt_response.error_message = 'Request cancelled: client disconnected'
+        self._record_processing_time(prompt_response, start_time)
+        await asyncio.shield(sync_to_async(self._save_result)(prompt_response))
+
+    @staticmethod
+    def _record_processing_time(prompt_response: PromptResponse, start_time: float):
+        """Store the time spent after leaving the queue."""
+        elapsed = time.time() - start_time
+        prompt_response.processing_time = max(0.0, elapsed - (prompt_response.queue_time or 0.0))
+
+    def _record_success(self, prompt_response: PromptResponse, generation, start_time: float):
+        """Update the record with a successful result and its token usage."""
+        prompt_response.response = generation.text
+        prompt_response.input_tokens = generation.input_tokens
+        prompt_response.output_tokens = generation.output_tokens
+        prompt_response.status = 'completed'
+        self._record_processing_time(prompt_response, start_time)
+
+    def _record_failure(self, prompt_response: PromptResponse, status: str, exc: Exception, start_time: float):
+        """Update the record with an error, including the time spent."""
+        prompt_response.status = status
+        prompt_response.error_message = str(exc)
+        self._record_processing_time(prompt_response, start_time)
+
     def get_recent_prompts(self, limit: int = 10):
         """
         Get recent prompts and responses.
@@ -80,9 +611,9 @@ class PromptAgentService:
             limit: Maximum number of records to return
 
         Returns:
-            QuerySet of PromptResponse objects
+            Lazily evaluated PromptResponse objects, newest first
         """
-        return PromptResponse.objects.all()[:limit]
+        return newest(PromptResponse.objects.all(), limit)
 
     def create_session(self, name: str, model: str = None, system_prompt: str = '') -> AgentSession:
         """
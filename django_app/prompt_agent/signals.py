@@ -0,0 +1,15 @@
+"""Signal handlers for the prompt agent application."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_listings
+from .models import AgentSession, PromptResponse
+
+
+@receiver(post_save, sender=PromptResponse)
+@receiver(post_delete, sender=PromptResponse)
+@receiver(post_save, sender=AgentSession)
+@receiver(post_delete, sender=AgentSession)
+def invalidate_cached_listings(sender, **kwargs):
+    """Drop cached history/index/session fragments when their data changes."""
+    invalidate_listings()
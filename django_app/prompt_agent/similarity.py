@@ -0,0 +1,288 @@
+"""Local "related prompts" index over hashed term vectors."""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Q
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .models import PromptResponse
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Lower-cased word unigrams and bigrams."""
+    words = TOKEN_RE.findall(text.lower())
+    return words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+
+
+class SimilarityIndex:
+    """
+    Memory-mapped matrix of hashed term-frequency vectors, one row per prompt.
+
+    Terms are hashed into ``dim`` signed buckets (the hashing trick), so the
+    vocabulary never has to be stored and rows can be appended without
+    touching existing ones. Rows hold L2-normalised log-scaled term
+    frequencies; inverse document frequencies are applied to the query only,
+    which keeps scores consistent as the corpus grows. Scoring a query is a
+    single matrix-vector product over the memmap.
+
+    Files in ``directory``: ``vectors.f32`` and ``ids.i64`` (row data, grown
+    by doubling), ``df.npy`` (document frequency per bucket) and
+    ``meta.json``, which is written last and holds the authoritative row
+    count and the completion-time watermark. Only one process should update
+    an index at a time, so web processes only read it; new prompts appear
+    once ``manage.py update_similarity_index`` runs (e.g. from cron).
+    """
+
+    def __init__(self, directory, dim: int = 512):
+        if np is None:
+            raise RuntimeError("The similarity index requires numpy (pip install -e .[similarity])")
+        self.directory = Path(directory)
+        self.dim = dim
+        self.count = 0
+        self.watermark = 0.0        # updated_at (epoch seconds) of the last indexed prompt
+        self.capacity = 0
+        self.df = np.zeros(dim, dtype=np.float64)
+        self._vectors = None
+        self._ids = None
+        self._writable = False
+        self._meta_mtime = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self._load()
+
+    @property
+    def meta_path(self):
+        return self.directory / 'meta.json'
+
+    @property
+    def version(self) -> str:
+        """Changes whenever rows are added; used in cache validators."""
+        return f'{self.count}-{self.watermark}'
+
+    def vectorize(self, text):
+        """Return the normalised hashed term vector of ``text``."""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        counts = {}
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dim] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self, items, watermark: float = None):
+        """
+        Append the ``(id, text)`` pairs that are not indexed yet and persist
+        the index, advancing the watermark to ``watermark`` if given.
+
+        Returns the number of rows added.
+        """
+        items = list(items)
+        with self._lock:
+            if items and self.count:
+                indexed = np.isin([pk for pk, _ in items], self._ids[:self.count])
+                items = [item for item, seen in zip(items, indexed) if not seen]
+            advanced = watermark is not None and watermark > self.watermark
+            if not items and not advanced:
+                return 0
+            self._reserve(self.count + len(items))
+            if items:
+                rows = np.stack([self.vectorize(text) for _, text in items])
+                self._vectors[self.count:self.count + len(rows)] = rows
+                self._ids[self.count:self.count + len(rows)] = [pk for pk, _ in items]
+                # A new array, so queries holding the previous one stay consistent
+                self.df = self.df + (rows != 0).sum(axis=0)
+                self.count += len(rows)
+            if advanced:
+                self.watermark = watermark
+            self._save()
+        return len(items)
+
+    def update(self, batch_size: int = 1000):
+        """
+        Index the prompts completed since the last update.
+
+        Prompts are taken in order of completion (``updated_at``), not id,
+        because a prompt can finish long after newer ones. Timestamps are
+        taken before the row is committed, so the scan starts
+        ``PROMPT_SIMILARITY_OVERLAP`` seconds before the watermark; prompts
+        that are already indexed are skipped.
+        """
+        start = max(self.watermark - settings.PROMPT_SIMILARITY_OVERLAP, 0)
+        cursor = (datetime.fromtimestamp(start, timezone.utc), 0)
+        completed = PromptResponse.objects.filter(status='completed').order_by('updated_at', 'pk')
+        added = 0
+        while True:
+            updated_at, pk = cursor
+            batch = list(
+                completed.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+                [:batch_size]
+            )
+            if not batch:
+                return added
+            cursor = (batch[-1].updated_at, batch[-1].pk)
+            added += self.add(
+                ((prompt.pk, prompt.prompt) for prompt in batch), watermark=cursor[0].timestamp()
+            )
+
+    def rebuild(self, batch_size: int = 1000):
+        """Discard the index and index every completed prompt again."""
+        with self._lock:
+            self._close()
+            for name in ('vectors.f32', 'ids.i64', 'df.npy', 'meta.json'):
+                (self.directory / name).unlink(missing_ok=True)
+            self.count = self.capacity = 0
+            self.watermark = 0.0
+            self.df = np.zeros(self.dim, dtype=np.float64)
+        return self.update(batch_size)
+
+    def query(self, text, k: int = 5, exclude=()):
+        """Return up to ``k`` ``(id, score)`` pairs, most similar first."""
+        self.refresh()
+        # One consistent snapshot; a reload swaps in new arrays instead of changing these
+        with self._lock:
+            vectors, ids, count, df = self._vectors, self._ids, self.count, self.df
+        if not count:
+            return []
+        idf = np.log((1.0 + count) / (1.0 + df)).astype(np.float32) + 1.0
+        query = self.vectorize(text) * idf
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        scores = vectors[:count] @ (query / norm)
+        ids = ids[:count]
+        if exclude:
+            scores[np.isin(ids, list(exclude))] = -np.inf
+        k = min(k, count)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def refresh(self):
+        """Pick up rows added by another process since the index was opened."""
+        try:
+            mtime = self.meta_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._meta_mtime:
+            with self._lock:
+                if mtime != self._meta_mtime:
+                    self._load()
+
+    def _load(self):
+        """Reload from disk; the caller holds ``_lock``."""
+        try:
+            # Stat first: a meta.json replaced while reading has a newer mtime
+            mtime = self.meta_path.stat().st_mtime_ns
+            meta = json.loads(self.meta_path.read_text())
+        except FileNotFoundError:
+            return
+        if meta['dim'] != self.dim:
+            raise ValueError(
+                f"Index in {self.directory} has {meta['dim']} dimensions, expected {self.dim}; rebuild it"
+            )
+        df = np.load(self.directory / 'df.npy')
+        self._open(meta['capacity'])
+        self.count = meta['count']
+        # Indexes written before the watermark existed are rescanned in full
+        self.watermark = meta.get('watermark', 0.0)
+        self.df = df
+        # Last, so refresh() without the lock never skips a half-done reload
+        self._meta_mtime = mtime
+
+    def _save(self):
+        self._vectors.flush()
+        self._ids.flush()
+        with open(self.directory / 'df.tmp', 'wb') as handle:
+            np.save(handle, self.df)
+        os.replace(self.directory / 'df.tmp', self.directory / 'df.npy')
+        meta = {
+            'dim': self.dim, 'count': self.count, 'watermark': self.watermark, 'capacity': self.capacity,
+        }
+        tmp = self.meta_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.meta_path)
+        self._meta_mtime = self.meta_path.stat().st_mtime_ns
+
+    def _reserve(self, rows):
+        if rows <= self.capacity and self._writable:
+            return
+        capacity = max(1024, self.capacity)
+        while capacity < rows:
+            capacity *= 2
+        self._open(capacity, grow=True)
+
+    def _open(self, capacity, grow=False):
+        """Map the row files and swap the new maps in at once."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = (
+            # float32 so queries multiply the memmap in place, without a converted copy
+            (self.directory / 'vectors.f32', np.float32, (capacity, self.dim)),
+            (self.directory / 'ids.i64', np.int64, (capacity,)),
+        )
+        maps = []
+        for path, dtype, shape in files:
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            if grow:
+                with open(path, 'ab') as handle:
+                    handle.truncate(max(size, handle.tell()))
+            maps.append(np.memmap(path, dtype=dtype, mode='r+' if grow else 'r', shape=shape))
+        self._vectors, self._ids = maps
+        self._writable = grow
+        self.capacity = capacity
+
+    def _close(self):
+        self._vectors = self._ids = None
+        self._writable = False
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the process-wide index, or None when numpy is not installed."""
+    global _index
+    if np is None:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex(settings.PROMPT_SIMILARITY_DIR, settings.PROMPT_SIMILARITY_DIM)
+        return _index
+
+
+def related_prompts(prompt, k=None):
+    """Return up to ``k`` completed prompts similar to ``prompt``, with a ``similarity`` attribute."""
+    index = get_index()
+    if index is None:
+        return []
+    matches = index.query(prompt.prompt, k or settings.PROMPT_SIMILARITY_TOP_K, exclude=[prompt.pk])
+    return similar_to_matches(matches)
+
+
+def similar_to_matches(matches):
+    """Load the PromptResponse rows for ``(id, score)`` pairs, keeping their order."""
+    prompts = PromptResponse.objects.in_bulk([pk for pk, _ in matches])
+    results = []
+    for pk, score in matches:
+        prompt = prompts.get(pk)
+        if prompt is not None:
+            prompt.similarity = score
+            results.append(prompt)
+    return results
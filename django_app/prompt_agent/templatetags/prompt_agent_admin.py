@@ -0,0 +1,12 @@
+"""Template tags for the prompt agent admin."""
+from django import template
+
+from ..bigtable import index_date_hierarchy
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def indexed_date_hierarchy(cl):
+    """Render the date drill-down without DISTINCT date scans."""
+    return index_date_hierarchy(cl)
@@ -0,0 +1,377 @@
+"""Lightweight request tracing for the prompt agent."""
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Marks code running inside a trace that was not sampled, so nested spans
+# stay no-ops instead of starting traces of their own
+_UNSAMPLED = object()
+
+_current_span = contextvars.ContextVar('prompt_agent_span', default=None)
+
+# version-trace_id-parent_id-flags, lowercase hex; later versions may append fields
+_TRACEPARENT_RE = re.compile(r'([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?\Z')
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = (
+        'trace', 'trace_id', 'span_id', 'parent_id', 'name', 'attributes',
+        'start_ns', 'end_ns', 'status', '_started',
+    )
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.trace_id = trace.trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = 'ok'
+        self._started = time.perf_counter_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns else 0.0
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException):
+        self.status = 'error'
+        self.attributes['error.type'] = type(exc).__name__
+        self.attributes['error.message'] = str(exc)[:500]
+
+    def end(self):
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._started
+        self.trace.finish(self)
+
+    def to_dict(self) -> dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round(self.duration_ms, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+class Trace:
+    """Collects the finished spans of one trace until its root span ends."""
+
+    def __init__(self, tracer, trace_id, remote_parent_id=None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.remote_parent_id = remote_parent_id
+        self.root = None
+        self.dropped = 0
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def finish(self, span: Span):
+        with self._lock:
+            if len(self._spans) < self.tracer.max_spans:
+                self._spans.append(span)
+            else:
+                self.dropped += 1
+            if span is not self.root:
+                return
+            spans, self._spans = self._spans, []
+        if self.dropped:
+            span.attributes['trace.dropped_spans'] = self.dropped
+        self.tracer.export(spans)
+
+
+class Tracer:
+    """
+    Head-sampled tracer with pluggable exporters.
+
+    Whether a trace is recorded is decided once, when its root span starts,
+    with probability ``sample_rate``. Spans of unsampled traces cost a
+    context variable lookup. Finished traces are handed to a background
+    thread that passes them to every exporter; when ``max_queue`` traces are
+    already waiting, new ones are dropped rather than slowing requests down.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, exporters=(), max_spans: int = 1000,
+                 max_queue: int = 1000):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.sample_rate = sample_rate
+        self.exporters = list(exporters)
+        self.max_spans = max_spans
+        self.stats = {'exported': 0, 'dropped': 0, 'errors': 0}
+        self._queue = queue.Queue(max_queue)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and bool(self.exporters)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Time the enclosed block as a child of the current span.
+
+        Without a current span this starts a new, possibly unsampled, trace.
+        Yields the span, or None when the trace is not recorded.
+        """
+        parent = _current_span.get()
+        if parent is _UNSAMPLED or (parent is None and not self.enabled):
+            yield None
+            return
+        if parent is None:
+            with self.trace(name, **attributes) as span:
+                yield span
+            return
+        span = Span(parent.trace, name, parent.span_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_error(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    @contextmanager
+    def trace(self, name: str, traceparent: str = None, **attributes):
+        """
+        Start a root span, continuing a W3C ``traceparent`` when given.
+
+        An incoming sampled ``traceparent`` is always recorded, so traces
+        started upstream are not cut in half.
+        """
+        remote = parse_traceparent(traceparent) if traceparent else None
+        if remote is not None:
+            sampled = remote[2] and self.enabled
+        else:
+            sampled = self.enabled and random.random() < self.sample_rate
+        if not sampled:
+            token = _current_span.set(_UNSAMPLED)
+            try:
+                yield None
+            finally:
+                _current_span.reset(token)
+            return
+
+        trace_id, parent_id = (remote[0], remote[1]) if remote else (secrets.token_hex(16), None)
+        trace = Trace(self, trace_id, parent_id)
+        span = trace.root = Span(trace, name, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_error(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def export(self, spans):
+        """Queue a finished trace for the exporters."""
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return
+        self._ensure_thread()
+
+    def flush(self):
+        """Block until every queued trace has been exported."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='prompt-trace-export', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                for exporter in self.exporters:
+                    exporter.export(spans)
+                self.stats['exported'] += 1
+            except Exception:
+                self.stats['errors'] += 1
+                logger.exception("Exporting a trace failed")
+            finally:
+                self._queue.task_done()
+
+
+class JsonlExporter:
+    """Append one JSON object per span to a local file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = ''.join(json.dumps(span.to_dict(), default=str) + '\n' for span in spans)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(lines)
+
+
+class OtlpHttpExporter:
+    """Send spans to an OpenTelemetry collector using OTLP/HTTP with JSON encoding."""
+
+    def __init__(self, endpoint, service_name='prompt-agent', headers=None, timeout=5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.timeout = timeout
+
+    def export(self, spans):
+        body = json.dumps(otlp_payload(spans, self.service_name)).encode('utf-8')
+        request = urllib.request.Request(self.endpoint, data=body, headers=self.headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def otlp_payload(spans, service_name):
+    """Encode spans as an OTLP ``ExportTraceServiceRequest`` in its JSON mapping."""
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', service_name)]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [
+                    {
+                        'traceId': span.trace_id,
+                        'spanId': span.span_id,
+                        'parentSpanId': span.parent_id or '',
+                        'name': span.name,
+                        # SPAN_KIND_SERVER for roots, SPAN_KIND_INTERNAL otherwise
+                        'kind': 2 if span is span.trace.root else 1,
+                        'startTimeUnixNano': str(span.start_ns),
+                        'endTimeUnixNano': str(span.end_ns),
+                        'attributes': [
+                            _otlp_attribute(key, value) for key, value in span.attributes.items()
+                        ],
+                        # STATUS_CODE_ERROR / STATUS_CODE_UNSET
+                        'status': {'code': 2} if span.status == 'error' else {},
+                    }
+                    for span in spans
+                ],
+            }],
+        }],
+    }
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+def parse_traceparent(header):
+    """Return ``(trace_id, parent_id, sampled)`` from a W3C traceparent, or None."""
+    match = _TRACEPARENT_RE.match(header.strip())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags, rest = match.groups()
+    # Version ff is invalid; version 00 has exactly four fields
+    if version == 'ff' or (version == '00' and rest):
+        return None
+    if trace_id == '0' * 32 or parent_id == '0' * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def current_span():
+    """Return the active recorded span, or None."""
+    span = _current_span.get()
+    return None if span is _UNSAMPLED else span
+
+
+def current_trace_id() -> str:
+    """Return the id of the active recorded trace, or an empty string."""
+    span = current_span()
+    return span.trace_id if span is not None else ''
+
+
+def trace_queries(execute, sql, params, many, context):
+    """Database execute wrapper that records each query as a span."""
+    if current_span() is None:
+        return execute(sql, params, many, context)
+    connection = context['connection']
+    with get_tracer().span(
+        'db.query',
+        **{
+            'db.system': connection.vendor,
+            'db.alias': connection.alias,
+            'db.statement': sql[:1000],
+            'db.executemany': many,
+        },
+    ):
+        return execute(sql, params, many, context)
+
+
+def install_query_tracing(sender, connection, **kwargs):
+    """``connection_created`` receiver that adds :func:`trace_queries`."""
+    if trace_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_queries)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def build_exporters():
+    exporters = []
+    for name in settings.PROMPT_TRACE_EXPORTERS:
+        if name == 'jsonl':
+            exporters.append(JsonlExporter(settings.PROMPT_TRACE_JSONL_PATH))
+        elif name == 'otlp':
+            exporters.append(OtlpHttpExporter(
+                settings.PROMPT_TRACE_OTLP_ENDPOINT,
+                service_name=settings.PROMPT_TRACE_SERVICE_NAME,
+            ))
+        else:
+            raise ValueError(f"Unknown trace exporter: {name}")
+    return exporters
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, creating it on first use."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(settings.PROMPT_TRACE_SAMPLE_RATE, build_exporters())
+            atexit.register(_tracer.flush)
+        return _tracer
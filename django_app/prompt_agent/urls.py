@@ -5,9 +5,15 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('api/submit/', views.submit_prompt_ajax, name='submit_prompt_ajax'),
+    path('api/key-pool/', views.key_pool_status, name='key_pool_status'),
     path('sessions/', views.session_list, name='session_list'),
     path('sessions/create/', views.session_create, name='session_create'),
     path('sessions/<int:pk>/edit/', views.session_edit, name='session_edit'),
     path('history/', views.history, name='history'),
     path('prompt/<int:pk>/', views.prompt_detail, name='prompt_detail'),
+    path('prompt/<int:pk>/retry/', views.retry_prompt, name='retry_prompt'),
+    path('compare/', views.comparison_create, name='comparison_create'),
+    path('compare/<int:pk>/', views.comparison_detail, name='comparison_detail'),
+    path('api/prompt/<int:pk>/similar/', views.similar_prompts, name='similar_prompts'),
+    path('api/similar/', views.similar_prompts, name='similar_prompts_search'),
 ]
@@ -1,19 +1,34 @@
 """Views for the prompt agent application."""
+from functools import wraps
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Max
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 import json
 
-from .forms import PromptForm, AgentSessionForm
-from .services import PromptAgentService
-from .models import PromptResponse, AgentSession
+from .caching import get_listings_version
+from .forms import AgentSessionForm, ComparisonForm, PromptForm
+from .services import DeadlineExceededError, OverloadedError, PromptAgentService, get_key_pool
+from .models import AgentSession, ComparisonRun, PromptResponse
+from .partitioning import newest
+from .routing import replica_reads
+from .scheduling import PRIORITIES
+from .similarity import get_index, related_prompts, similar_to_matches
 
 
+# Primary only: a listing fragment cached from a lagging replica stays stale
 def index(request):
     """Main page with prompt interface."""
     service = PromptAgentService()
+    retry_after = None
 
     if request.method == 'POST':
         form = PromptForm(request.POST)
@@ -23,7 +38,9 @@ def index(request):
 
             try:
                 # Process the prompt
-                prompt_response = service.process_prompt(prompt_text, session=session)
+                prompt_response = service.process_prompt(
+                    prompt_text, session=session, instruction=form.cleaned_data['instruction']
+                )
 
                 messages.success(
                     request,
@@ -33,6 +50,18 @@ def index(request):
                 # Redirect to avoid form resubmission
                 return redirect('index')
 
+            except OverloadedError as exc:
+                # Shed load fast: no DB write, tell the client when to come back
+                retry_after = exc.retry_after
+                messages.error(
+                    request,
+                    f'Het is op dit moment te druk, probeer het over {retry_after} seconden opnieuw.'
+                )
+            except DeadlineExceededError as exc:
+                messages.error(
+                    request,
+                    f'De prompt duurde te lang en is afgebroken: {str(exc)}'
+                )
             except Exception as exc:
                 messages.error(
                     request,
@@ -44,18 +73,34 @@ def index(request):
     # Get recent prompts
     recent_prompts = service.get_recent_prompts(limit=20)
 
+    # Querysets stay lazy; cached fragments skip evaluating them entirely
     context = {
         'form': form,
         'recent_prompts': recent_prompts,
         'active_sessions': service.get_active_sessions(),
+        'listings_version': get_listings_version(),
+        'fragment_cache_timeout': settings.PROMPT_AGENT_FRAGMENT_CACHE_TIMEOUT,
     }
 
+    if retry_after is not None:
+        response = render(request, 'prompt_agent/index.html', context, status=503)
+        response['Retry-After'] = str(retry_after)
+        return response
+
     return render(request, 'prompt_agent/index.html', context)
 
 
 @require_http_methods(["POST"])
-def submit_prompt_ajax(request):
-    """AJAX endpoint for submitting prompts."""
+async def submit_prompt_ajax(request):
+    """
+    AJAX endpoint for submitting prompts.
+
+    Accepts an optional ``timeout`` (seconds) that overrides the session
+    default, a ``priority`` of ``interactive`` (default) or ``batch`` and an
+    ``instruction`` for prompts long enough to be processed with map-reduce.
+    Under ASGI a client disconnect cancels the upstream call, and when the
+    service is overloaded the request is rejected with 503 and Retry-After.
+    """
     try:
         data = json.loads(request.body)
         prompt_text = data.get('prompt', '').strip()
@@ -66,16 +111,40 @@ def submit_prompt_ajax(request):
                 'error': 'Prompt mag niet leeg zijn'
             }, status=400)
 
+        priority = data.get('priority', 'interactive')
+        if priority not in PRIORITIES:
+            return JsonResponse({
+                'success': False,
+                'error': 'Onbekende prioriteit'
+            }, status=400)
+
+        timeout = data.get('timeout')
+        if timeout is not None:
+            try:
+                timeout = float(timeout)
+            except (TypeError, ValueError):
+                timeout = 0
+            if timeout <= 0:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Timeout moet een positief getal zijn'
+                }, status=400)
+
         session_id = data.get('session_id')
         session = None
         if session_id:
             try:
-                session = AgentSession.objects.get(id=session_id, is_active=True)
+                session = await AgentSession.objects.aget(id=session_id, is_active=True)
             except AgentSession.DoesNotExist:
                 pass
 
         service = PromptAgentService()
-        prompt_response = service.process_prompt(prompt_text, session=session)
+        prompt_response = await service.aprocess_prompt(
+            prompt_text, session=session, timeout=timeout, priority=priority,
+            instruction=str(data.get('instruction') or '').strip(),
+        )
+        # With write-behind the insert may still be queued; clients need the id
+        await sync_to_async(service.ensure_saved)(prompt_response)
 
         return JsonResponse({
             'success': True,
@@ -85,10 +154,24 @@ def submit_prompt_ajax(request):
                 'response': prompt_response.response,
                 'model_used': prompt_response.model_used,
                 'processing_time': prompt_response.processing_time,
+                'queue_time': prompt_response.queue_time,
                 'created_at': prompt_response.created_at.isoformat(),
             }
         })
 
+    except OverloadedError as exc:
+        response = JsonResponse({
+            'success': False,
+            'error': str(exc),
+            'retry_after': exc.retry_after,
+        }, status=503)
+        response['Retry-After'] = str(exc.retry_after)
+        return response
+    except DeadlineExceededError as exc:
+        return JsonResponse({
+            'success': False,
+            'error': str(exc)
+        }, status=504)
     except Exception as exc:
         return JsonResponse({
             'success': False,
@@ -96,11 +179,77 @@ def submit_prompt_ajax(request):
         }, status=500)
 
 
+@staff_member_required
+def key_pool_status(request):
+    """Report per-key utilization of the API key pool (staff only)."""
+    key_pool = get_key_pool()
+    return JsonResponse({
+        'enabled': key_pool is not None,
+        'keys': key_pool.utilization() if key_pool is not None else [],
+    })
+
+
+@replica_reads
+def comparison_create(request):
+    """Send one prompt to several sessions concurrently and compare the answers."""
+    if request.method == 'POST':
+        form = ComparisonForm(request.POST)
+        if form.is_valid():
+            service = PromptAgentService()
+            try:
+                comparison = async_to_sync(service.acompare)(
+                    form.cleaned_data['prompt'], list(form.cleaned_data['sessions'])
+                )
+            except Exception as exc:
+                messages.error(request, f'Fout bij het vergelijken: {str(exc)}')
+            else:
+                return redirect('comparison_detail', pk=comparison.pk)
+    else:
+        form = ComparisonForm()
+
+    return render(request, 'prompt_agent/comparison_form.html', {
+        'form': form,
+        'recent_comparisons': ComparisonRun.objects.select_related('prompt_blob')[:10],
+    })
+
+
+@replica_reads
+def comparison_detail(request, pk):
+    """Show the results of a comparison run side by side."""
+    comparison = get_object_or_404(ComparisonRun.objects.select_related('prompt_blob'), pk=pk)
+    results = comparison.results.select_related('session').order_by('session__name', 'pk')
+    return render(request, 'prompt_agent/comparison_detail.html', {
+        'comparison': comparison,
+        'results': results,
+    })
+
+
+@require_http_methods(["POST"])
+def retry_prompt(request, pk):
+    """Retry a failed map-reduce prompt, redoing only the chunks that did not complete."""
+    prompt = get_object_or_404(PromptResponse.objects.select_related('session'), pk=pk)
+    if prompt.status in ('completed', 'processing', 'pending') or not prompt.chunks.exists():
+        messages.error(request, 'Deze prompt kan niet opnieuw worden geprobeerd.')
+        return redirect('prompt_detail', pk=pk)
+
+    service = PromptAgentService()
+    try:
+        async_to_sync(service.aretry_map_reduce)(prompt)
+    except Exception as exc:
+        messages.error(request, f'Opnieuw proberen mislukt: {str(exc)}')
+    else:
+        messages.success(request, f'Prompt verwerkt in {prompt.processing_time:.2f} seconden!')
+    return redirect('prompt_detail', pk=pk)
+
+
+# Primary only: a listing fragment cached from a lagging replica stays stale
 def session_list(request):
     """List all agent sessions."""
     sessions = AgentSession.objects.all()
     return render(request, 'prompt_agent/session_list.html', {
-        'sessions': sessions
+        'sessions': sessions,
+        'listings_version': get_listings_version(),
+        'fragment_cache_timeout': settings.PROMPT_AGENT_FRAGMENT_CACHE_TIMEOUT,
     })
 
 
@@ -141,17 +290,133 @@ def session_edit(request, pk):
     })
 
 
+# Primary only: a listing fragment cached from a lagging replica stays stale
 def history(request):
     """View prompt history."""
-    prompts = PromptResponse.objects.all()[:50]
+    prompts = newest(PromptResponse.objects.all(), 50)
     return render(request, 'prompt_agent/history.html', {
-        'prompts': prompts
+        'prompts': prompts,
+        'listings_version': get_listings_version(),
+        'fragment_cache_timeout': settings.PROMPT_AGENT_FRAGMENT_CACHE_TIMEOUT,
     })
 
 
+def _prompt_cache_state(request, pk):
+    """Fetch the fields that determine a prompt page's validators, once per request."""
+    if not hasattr(request, '_prompt_cache_state'):
+        # Chunk progress is shown on the page but saving a chunk leaves its prompt alone
+        request._prompt_cache_state = PromptResponse.objects.filter(pk=pk).values(
+            'status', 'updated_at', 'session__updated_at'
+        ).annotate(chunks_updated_at=Max('chunks__updated_at')).order_by('pk').first()
+    return request._prompt_cache_state
+
+
+def _prompt_last_modified(request, pk):
+    state = _prompt_cache_state(request, pk)
+    if state is None:
+        return None
+    return max(filter(None, [
+        state['updated_at'], state['session__updated_at'], state['chunks_updated_at'],
+    ]))
+
+
+def _prompt_etag(request, pk):
+    state = _prompt_cache_state(request, pk)
+    if state is None:
+        return None
+    session_updated = state['session__updated_at']
+    chunks_updated = state['chunks_updated_at']
+    return '{}-{}-{}-{}-{}'.format(
+        pk,
+        state['updated_at'].timestamp(),
+        session_updated.timestamp() if session_updated else 0,
+        chunks_updated.timestamp() if chunks_updated else 0,
+        _similarity_version(),
+    )
+
+
+def _similarity_version():
+    """Version of the related-prompts index, so pages showing it revalidate."""
+    index = get_index()
+    if index is None:
+        return 0
+    index.refresh()
+    return index.version
+
+
+def _cache_finished_prompts(view):
+    """
+    Set Cache-Control on prompt pages, including 304 responses.
+
+    Completed prompts never change, so clients may keep them for
+    ``PROMPT_DETAIL_MAX_AGE`` seconds, or ``PROMPT_SIMILARITY_MAX_AGE`` when
+    the page lists related prompts that the index can update. Other prompts
+    must revalidate: they are still running, or a retry can bring a failed
+    one back to life.
+    """
+    @wraps(view)
+    def wrapper(request, pk, *args, **kwargs):
+        response = view(request, pk, *args, **kwargs)
+        state = _prompt_cache_state(request, pk)
+        if state is not None and response.status_code in (200, 304):
+            if state['status'] == 'completed':
+                max_age = settings.PROMPT_DETAIL_MAX_AGE
+                if get_index() is not None:
+                    max_age = min(max_age, settings.PROMPT_SIMILARITY_MAX_AGE)
+                patch_cache_control(response, private=True, max_age=max_age)
+            else:
+                patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
+
+
+@replica_reads
+@_cache_finished_prompts
+@condition(etag_func=_prompt_etag, last_modified_func=_prompt_last_modified)
 def prompt_detail(request, pk):
     """View details of a specific prompt/response."""
-    prompt = get_object_or_404(PromptResponse, pk=pk)
+    prompt = get_object_or_404(PromptResponse.objects.select_related('session'), pk=pk)
     return render(request, 'prompt_agent/prompt_detail.html', {
-        'prompt': prompt
+        'prompt': prompt,
+        'chunks': prompt.chunks.all(),
+        'related_prompts': related_prompts(prompt),
+    })
+
+
+@require_http_methods(["GET"])
+@replica_reads
+def similar_prompts(request, pk=None):
+    """
+    Return the completed prompts most similar to prompt ``pk`` or to ``?q=``.
+
+    ``?k=`` sets the number of results (at most 50).
+    """
+    index = get_index()
+    if index is None:
+        return JsonResponse({'success': False, 'error': 'Similarity index is not available'}, status=503)
+    try:
+        k = min(max(int(request.GET.get('k', settings.PROMPT_SIMILARITY_TOP_K)), 1), 50)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'k must be an integer'}, status=400)
+
+    if pk is not None:
+        prompt = get_object_or_404(PromptResponse, pk=pk)
+        matches = index.query(prompt.prompt, k, exclude=[prompt.pk])
+    else:
+        text = request.GET.get('q', '').strip()
+        if not text:
+            return JsonResponse({'success': False, 'error': 'q is required'}, status=400)
+        matches = index.query(text, k)
+
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {
+                'id': match.id,
+                'prompt': match.prompt[:200],
+                'similarity': round(match.similarity, 4),
+                'url': reverse('prompt_detail', args=[match.id]),
+            }
+            for match in similar_to_matches(matches)
+        ],
     })
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_app.prompt_agent.middleware.TracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -108,3 +109,132 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+# Default end-to-end deadline (seconds) for a prompt; sessions may override it
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+
+# Optional pool of API keys/projects, comma separated as "key" or "key|project".
+# When set, requests are spread over the pool instead of using OPENAI_API_KEY.
+OPENAI_API_KEYS = [
+    dict(zip(('api_key', 'project'), entry.strip().split('|', 1)))
+    for entry in os.getenv('OPENAI_API_KEYS', '').split(',')
+    if entry.strip()
+]
+# Consecutive 429/401 responses before a key is ejected, and for how long
+OPENAI_KEY_EJECT_AFTER = int(os.getenv('OPENAI_KEY_EJECT_AFTER', '3'))
+OPENAI_KEY_EJECT_SECONDS = float(os.getenv('OPENAI_KEY_EJECT_SECONDS', '30'))
+OPENAI_KEY_AUTH_EJECT_SECONDS = float(os.getenv('OPENAI_KEY_AUTH_EJECT_SECONDS', '300'))
+
+# Write-behind persistence for PromptResponse (opt-in). Writes are batched in
+# memory and flushed with bulk_create/bulk_update on a size or time trigger.
+PROMPT_WRITE_BEHIND = os.getenv('PROMPT_WRITE_BEHIND', 'False') == 'True'
+PROMPT_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('PROMPT_WRITE_BEHIND_BATCH_SIZE', '100'))
+PROMPT_WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('PROMPT_WRITE_BEHIND_FLUSH_INTERVAL', '1.0'))
+PROMPT_WRITE_BEHIND_MAX_PENDING = int(os.getenv('PROMPT_WRITE_BEHIND_MAX_PENDING', '1000'))
+
+# Cache used for rendered page fragments. The default local-memory cache is
+# per process; point CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g.
+# django.core.cache.backends.redis.RedisCache) when running several workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'prompt-agent'),
+    }
+}
+PROMPT_AGENT_FRAGMENT_CACHE_TIMEOUT = int(os.getenv('PROMPT_AGENT_FRAGMENT_CACHE_TIMEOUT', '600'))
+# Browser cache lifetime (seconds) for detail pages of finished prompts
+PROMPT_DETAIL_MAX_AGE = int(os.getenv('PROMPT_DETAIL_MAX_AGE', '86400'))
+
+# Maximum simultaneous upstream calls per process; waiting prompts are served
+# interactive-first and shared between sessions according to their weight
+PROMPT_SCHEDULER_CONCURRENCY = int(os.getenv('PROMPT_SCHEDULER_CONCURRENCY', '8'))
+# Admission control: shed prompts (503 + Retry-After) once this many are queued
+# or their estimated queue wait exceeds PROMPT_ADMISSION_MAX_WAIT seconds. Keep
+# concurrency + queue below the worker thread count so read-only pages stay fast.
+PROMPT_ADMISSION_MAX_QUEUE = int(os.getenv('PROMPT_ADMISSION_MAX_QUEUE', '16'))
+PROMPT_ADMISSION_MAX_WAIT = float(os.getenv('PROMPT_ADMISSION_MAX_WAIT', '10'))
+
+# Big-table admin mode for PromptResponse: estimated counts, keyset paging,
+# index-backed date navigation and cached filter facets
+PROMPT_ADMIN_BIG_TABLE = os.getenv('PROMPT_ADMIN_BIG_TABLE', 'False') == 'True'
+# Below this many (estimated) rows an exact COUNT(*) is used
+PROMPT_ADMIN_EXACT_COUNT_THRESHOLD = int(os.getenv('PROMPT_ADMIN_EXACT_COUNT_THRESHOLD', '10000'))
+PROMPT_ADMIN_FACET_CACHE_TIMEOUT = int(os.getenv('PROMPT_ADMIN_FACET_CACHE_TIMEOUT', '900'))
+
+# Prompt/response text is stored deduplicated by content hash; texts of at
+# least this many bytes are zlib-compressed (0 disables compression)
+PROMPT_BLOB_COMPRESS_THRESHOLD = int(os.getenv('PROMPT_BLOB_COMPRESS_THRESHOLD', '4096'))
+# Characters of a compressed text kept uncompressed for admin search
+PROMPT_BLOB_SEARCH_PREFIX = int(os.getenv('PROMPT_BLOB_SEARCH_PREFIX', '1000'))
+
+# Request tracing: fraction of requests to trace (0 disables tracing) and
+# where finished traces go ("jsonl" and/or "otlp", comma separated)
+PROMPT_TRACE_SAMPLE_RATE = float(os.getenv('PROMPT_TRACE_SAMPLE_RATE', '0'))
+PROMPT_TRACE_EXPORTERS = [
+    name.strip() for name in os.getenv('PROMPT_TRACE_EXPORTERS', 'jsonl').split(',') if name.strip()
+]
+PROMPT_TRACE_JSONL_PATH = os.getenv('PROMPT_TRACE_JSONL_PATH', str(BASE_DIR / 'traces.jsonl'))
+PROMPT_TRACE_OTLP_ENDPOINT = os.getenv('PROMPT_TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+PROMPT_TRACE_SERVICE_NAME = os.getenv('PROMPT_TRACE_SERVICE_NAME', 'prompt-agent')
+
+# Sampling profiler (opt-in, adds ProfilingMiddleware): profile this fraction
+# of requests continuously; "manage.py capture_profile" opens extra windows
+PROMPT_PROFILING = os.getenv('PROMPT_PROFILING', 'False') == 'True'
+PROMPT_PROFILE_SAMPLE_RATE = float(os.getenv('PROMPT_PROFILE_SAMPLE_RATE', '0'))
+PROMPT_PROFILE_INTERVAL = float(os.getenv('PROMPT_PROFILE_INTERVAL', '0.01'))
+PROMPT_PROFILE_FLUSH_INTERVAL = float(os.getenv('PROMPT_PROFILE_FLUSH_INTERVAL', '2'))
+PROMPT_PROFILE_DIR = os.getenv('PROMPT_PROFILE_DIR', str(BASE_DIR / 'profiles'))
+if PROMPT_PROFILING:
+    MIDDLEWARE.insert(1, 'django_app.prompt_agent.middleware.ProfilingMiddleware')
+
+# Record/replay of OpenAI traffic ("record", "replay" or empty to disable).
+# Replay serves recorded responses with their latencies times the scale;
+# with ANY_MATCH unrecorded prompts get other recordings of the same endpoint.
+OPENAI_CASSETTE_MODE = os.getenv('OPENAI_CASSETTE_MODE', '')
+OPENAI_CASSETTE_PATH = os.getenv('OPENAI_CASSETTE_PATH', str(BASE_DIR / 'cassettes' / 'openai.jsonl.gz'))
+OPENAI_CASSETTE_LATENCY_SCALE = float(os.getenv('OPENAI_CASSETTE_LATENCY_SCALE', '1.0'))
+OPENAI_CASSETTE_ANY_MATCH = os.getenv('OPENAI_CASSETTE_ANY_MATCH', 'False') == 'True'
+
+# Related prompts index (requires numpy); it is only refreshed by
+# "manage.py update_similarity_index", so run that from cron
+PROMPT_SIMILARITY_DIR = os.getenv('PROMPT_SIMILARITY_DIR', str(BASE_DIR / 'similarity'))
+PROMPT_SIMILARITY_DIM = int(os.getenv('PROMPT_SIMILARITY_DIM', '512'))
+PROMPT_SIMILARITY_TOP_K = int(os.getenv('PROMPT_SIMILARITY_TOP_K', '5'))
+# Seconds before the last indexed completion time that each update rescans,
+# for rows committed after their timestamp was set (write-behind, retries)
+PROMPT_SIMILARITY_OVERLAP = int(os.getenv('PROMPT_SIMILARITY_OVERLAP', '300'))
+# Browser cache lifetime (seconds) for detail pages while the index is
+# available, so updated related prompts show up; at most PROMPT_DETAIL_MAX_AGE
+PROMPT_SIMILARITY_MAX_AGE = int(os.getenv('PROMPT_SIMILARITY_MAX_AGE', '300'))
+
+# Read replica (optional): DB_REPLICA_HOST (PostgreSQL) or DB_REPLICA_NAME
+# (SQLite file) adds a replica database. Read-only views and admin change
+# lists read from it (not the cached listings, which would cache its lag); a client that wrote reads from the primary for the next
+# PROMPT_DB_PIN_SECONDS (read-your-writes), which should exceed the replica lag.
+PROMPT_DB_REPLICA = os.getenv('PROMPT_DB_REPLICA', 'replica')
+PROMPT_DB_PIN_SECONDS = int(os.getenv('PROMPT_DB_PIN_SECONDS', '5'))
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    # Tests run against the primary only; the replica mirrors it
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    replica['NAME'] = os.getenv('DB_REPLICA_NAME', replica['NAME'])
+    if os.getenv('DB_REPLICA_HOST'):
+        replica['HOST'] = os.getenv('DB_REPLICA_HOST')
+        replica['PORT'] = os.getenv('DB_REPLICA_PORT', replica['PORT'])
+    DATABASES[PROMPT_DB_REPLICA] = replica
+    DATABASE_ROUTERS = ['django_app.prompt_agent.routing.ReplicaRouter']
+    MIDDLEWARE.insert(1, 'django_app.prompt_agent.middleware.ReplicaPinMiddleware')
+
+# Prompts longer than this many tokens are processed with map-reduce: split
+# into chunks of CHUNK_TOKENS, at most CONCURRENCY calls at a time, and
+# combined in reduce steps. Off by default (0); pick a value below the context
+# window of the configured models. Install tiktoken for exact counts.
+PROMPT_MAP_REDUCE_THRESHOLD = int(os.getenv('PROMPT_MAP_REDUCE_THRESHOLD', '0'))
+PROMPT_MAP_REDUCE_CHUNK_TOKENS = int(os.getenv('PROMPT_MAP_REDUCE_CHUNK_TOKENS', '2000'))
+PROMPT_MAP_REDUCE_CONCURRENCY = int(os.getenv('PROMPT_MAP_REDUCE_CONCURRENCY', '4'))
+
+# Monthly partitioning of PromptResponse on created_at (PostgreSQL only),
+# applied by migration 0010 or "manage.py manage_partitions --convert". Run
+# "manage.py manage_partitions" daily: it creates partitions MONTHS_AHEAD
+# months ahead and drops those older than RETENTION_MONTHS (0 keeps all).
+PROMPT_PARTITIONING = os.getenv('PROMPT_PARTITIONING', 'False') == 'True'
+PROMPT_PARTITION_MONTHS_AHEAD = int(os.getenv('PROMPT_PARTITION_MONTHS_AHEAD', '3'))
+PROMPT_PARTITION_RETENTION_MONTHS = int(os.getenv('PROMPT_PARTITION_RETENTION_MONTHS', '0'))
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Benchmark direct vs. write-behind persistence of PromptResponse rows.
+
+Runs ``PromptAgentService.process_prompt`` against a stub agent so only the
+database write path is measured, and reports prompts and commits per second.
+Commits are counted as they happen, on every connection the run opens.
+
+    python scripts/bench_persistence.py --prompts 2000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+class StubAgent:
+    """Returns a canned response without network access."""
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+
+    def generate(self, prompt: str, model: str, timeout=None):
+        # Imported here: src/ is only on sys.path once the service module is loaded
+        from openai_agent import Generation
+
+        return Generation(self._text, model, input_tokens=len(prompt.split()), output_tokens=1)
+
+
+class CommitCounter:
+    """Count committed transactions on every connection, in every thread.
+
+    A write outside an atomic block commits on its own (autocommit); an
+    atomic block commits once when the outermost block exits.
+    """
+
+    WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+    def __init__(self) -> None:
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def install(self, connection) -> None:
+        if getattr(connection, "_bench_commit_counter", None) is self:
+            return
+        connection._bench_commit_counter = self
+        connection.execute_wrappers.append(self)
+        commit = connection.commit
+
+        def counted_commit():
+            commit()
+            self._add()
+
+        connection.commit = counted_commit
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if not context["connection"].in_atomic_block and sql.lstrip().upper().startswith(self.WRITES):
+            self._add()
+        return result
+
+    def _add(self) -> None:
+        with self._lock:
+            self.commits += 1
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=1000, help="Prompts per mode")
+    parser.add_argument("--batch-size", type=int, default=100, help="Write-behind batch size")
+    parser.add_argument(
+        "--configured-db",
+        action="store_true",
+        help="Use the database from settings instead of a temporary SQLite file",
+    )
+    return parser.parse_args(argv)
+
+
+def setup_django(args: argparse.Namespace) -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_app.settings")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+    import django
+    from django.conf import settings
+
+    if not args.configured_db:
+        tmp = tempfile.NamedTemporaryFile(suffix=".sqlite3", delete=False)
+        settings.DATABASES["default"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": tmp.name,
+        }
+    settings.PROMPT_WRITE_BEHIND_BATCH_SIZE = args.batch_size
+    settings.PROMPT_WRITE_BEHIND_MAX_PENDING = max(args.batch_size * 10, args.prompts)
+    django.setup()
+
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+
+
+def run(mode: str, prompts: int) -> dict[str, float]:
+    from django.conf import settings
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+
+    from django_app.prompt_agent.services import PromptAgentService
+
+    settings.PROMPT_WRITE_BEHIND = mode == "write-behind"
+    service = PromptAgentService()
+    service.agent = StubAgent("x" * 500)
+
+    # The write-behind flusher runs in its own thread, with its own connection
+    counter = CommitCounter()
+    counter.install(connection)
+
+    def install(sender, connection, **kwargs):
+        counter.install(connection)
+
+    connection_created.connect(install)
+    try:
+        start = time.perf_counter()
+        for i in range(prompts):
+            service.process_prompt(f"benchmark prompt {i}")
+        if service.write_buffer is not None:
+            service.write_buffer.close()
+        elapsed = time.perf_counter() - start
+    finally:
+        connection_created.disconnect(install)
+        connection.execute_wrappers.remove(counter)
+        del connection.commit, connection._bench_commit_counter
+    commits = counter.commits
+
+    return {
+        "elapsed": elapsed,
+        "prompts_per_s": prompts / elapsed,
+        "commits": commits,
+        "commits_per_s": commits / elapsed,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv or sys.argv[1:])
+    setup_django(args)
+
+    print(f"{'mode':<14}{'elapsed s':>10}{'prompts/s':>12}{'commits':>10}{'commits/s':>12}")
+    for mode in ("direct", "write-behind"):
+        result = run(mode, args.prompts)
+        print(
+            f"{mode:<14}{result['elapsed']:>10.3f}{result['prompts_per_s']:>12.1f}"
+            f"{result['commits']:>10}{result['commits_per_s']:>12.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -2,19 +2,63 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import sys
 
+from cassette import cassette_transports
+from map_reduce import DEFAULT_INSTRUCTION, amap_reduce
 from openai_agent import OpenAIAgent
 
 
 def parse_args(argv: list[str]) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Generate text using OpenAI")
-    parser.add_argument("prompt", help="The prompt to send to the OpenAI model")
+    parser.add_argument(
+        "prompt", help="The prompt to send to the OpenAI model ('-' reads it from stdin)"
+    )
     parser.add_argument(
         "--model",
         default="gpt-4o-mini",
         help="Model identifier to use (default: gpt-4o-mini)",
     )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record",
+        metavar="CASSETTE",
+        help="Record the API traffic to this cassette file",
+    )
+    cassette.add_argument(
+        "--replay",
+        metavar="CASSETTE",
+        help="Replay the API traffic from this cassette file instead of calling the API",
+    )
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="Multiply recorded latencies when replaying (default: 1.0)",
+    )
+    parser.add_argument(
+        "--map-reduce",
+        action="store_true",
+        help="Split a long prompt into chunks, process them concurrently and combine the results",
+    )
+    parser.add_argument(
+        "--instruction",
+        default=DEFAULT_INSTRUCTION,
+        help="Instruction applied to every chunk with --map-reduce",
+    )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=2000,
+        help="Maximum tokens per chunk with --map-reduce (default: 2000)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Chunks processed at once with --map-reduce (default: 4)",
+    )
     return parser.parse_args(argv)
 
 
@@ -22,8 +66,34 @@ def main(argv: list[str] | None = None) -> int:
     args = parse_args(argv or sys.argv[1:])
 
     try:
-        agent = OpenAIAgent()
-        response = agent.generate_response(args.prompt, model=args.model)
+        if args.record or args.replay:
+            transport, async_transport = cassette_transports(
+                args.record or args.replay,
+                "record" if args.record else "replay",
+                latency_scale=args.latency_scale,
+            )
+            agent = OpenAIAgent(
+                # Replaying needs no real key
+                api_key=None if args.record else "replay",
+                transport=transport,
+                async_transport=async_transport,
+            )
+        else:
+            agent = OpenAIAgent()
+        prompt = sys.stdin.read() if args.prompt == "-" else args.prompt
+        if args.map_reduce:
+            response = asyncio.run(
+                amap_reduce(
+                    agent,
+                    prompt,
+                    args.instruction,
+                    args.model,
+                    chunk_tokens=args.chunk_tokens,
+                    max_concurrency=args.concurrency,
+                )
+            ).text
+        else:
+            response = agent.generate_response(prompt, model=args.model)
     except Exception as exc:  # pragma: no cover - CLI error propagation
         print(f"Error: {exc}", file=sys.stderr)
         return 1
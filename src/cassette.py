@@ -0,0 +1,350 @@
+"""Record and replay OpenAI HTTP traffic with its original timing."""
+from __future__ import annotations
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+import httpx
+
+# Response headers that are not worth keeping in a cassette
+_SKIPPED_HEADERS = {"set-cookie", "date", "cf-ray", "x-request-id", "openai-organization"}
+
+
+class CassetteMissError(RuntimeError):
+    """Raised when replaying a request that was never recorded."""
+
+
+def request_key(method: str, path: str, body: bytes, match_body: bool = True) -> str:
+    """Identify a request by method, path and (canonicalised JSON) body."""
+
+    digest = hashlib.sha256(f"{method.upper()} {path}\n".encode())
+    if match_body and body:
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+        except ValueError:
+            pass
+        digest.update(body)
+    return digest.hexdigest()[:32]
+
+
+class CassetteStore:
+    """Append-only, gzip-compressed JSON lines file of recorded interactions.
+
+    Each interaction holds the request key, the response status and headers,
+    the raw (still content-encoded) body chunks and their offsets in seconds
+    from the start of the request. Repeated recordings of the same request
+    are replayed in recording order, wrapping around.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._by_key: dict[str, list[dict[str, Any]]] = {}
+        self._by_route: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self._cursors: dict[Any, int] = {}
+        if self.path.exists():
+            with gzip.open(self.path, "rt", encoding="utf-8") as handle:
+                for line in handle:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._by_key.values())
+
+    def append(self, interaction: dict[str, Any]) -> None:
+        """Persist ``interaction`` and make it available for replay."""
+
+        line = json.dumps(interaction, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Concatenated gzip members form a valid gzip file
+            with gzip.open(self.path, "at", encoding="utf-8") as handle:
+                handle.write(line)
+            self._index(interaction)
+
+    def next_for(self, key: str, method: str, path: str, any_match: bool = False) -> dict[str, Any]:
+        """Return the next recording for ``key``.
+
+        With ``any_match`` a request without an exact recording gets the
+        recordings of the same method and path in turn, which is enough to
+        load-test with realistic sizes and timings using fresh prompts.
+        """
+
+        with self._lock:
+            items = self._by_key.get(key)
+            cursor_key: Any = key
+            if not items and any_match:
+                items = self._by_route.get((method, path))
+                cursor_key = (method, path)
+            if not items:
+                raise CassetteMissError(f"No recorded interaction for {method} {path} ({key})")
+            cursor = self._cursors.get(cursor_key, 0)
+            self._cursors[cursor_key] = cursor + 1
+            return items[cursor % len(items)]
+
+    def _index(self, interaction: dict[str, Any]) -> None:
+        self._by_key.setdefault(interaction["key"], []).append(interaction)
+        route = (interaction["method"], interaction["path"])
+        self._by_route.setdefault(route, []).append(interaction)
+
+
+class _Recorder:
+    """Collects one response's chunks and timing, then stores the interaction."""
+
+    def __init__(self, store: CassetteStore, request: httpx.Request, key: str, started: float) -> None:
+        self.store = store
+        self.started = started
+        self.interaction: dict[str, Any] = {
+            "key": key,
+            "method": request.method,
+            "path": request.url.path,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "chunks": [],
+        }
+
+    def headers(self, response: httpx.Response) -> None:
+        self.interaction["status"] = response.status_code
+        self.interaction["headers"] = [
+            [name, value]
+            for name, value in response.headers.multi_items()
+            if name.lower() not in _SKIPPED_HEADERS
+        ]
+        self.interaction["headers_at"] = round(time.monotonic() - self.started, 4)
+
+    def chunk(self, data: bytes) -> None:
+        self.interaction["chunks"].append(
+            [round(time.monotonic() - self.started, 4), base64.b64encode(data).decode("ascii")]
+        )
+
+    def finish(self) -> None:
+        self.store.append(self.interaction)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, response: httpx.Response, recorder: _Recorder) -> None:
+        self._response = response
+        self._recorder = recorder
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._response.stream:
+            self._recorder.chunk(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        self._response.close()
+        self._recorder.finish()
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, response: httpx.Response, recorder: _Recorder) -> None:
+        self._response = response
+        self._recorder = recorder
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._response.stream:
+            self._recorder.chunk(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._response.aclose()
+        self._recorder.finish()
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Forward requests to ``inner`` and record every response as it is read."""
+
+    def __init__(
+        self,
+        store: CassetteStore,
+        inner: Optional[httpx.BaseTransport] = None,
+        *,
+        match_body: bool = True,
+    ) -> None:
+        self.store = store
+        self.inner = inner or httpx.HTTPTransport()
+        self.match_body = match_body
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        body = request.read()
+        key = request_key(request.method, request.url.path, body, self.match_body)
+        response = self.inner.handle_request(request)
+        recorder = _Recorder(self.store, request, key, started)
+        recorder.headers(response)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response, recorder),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Asynchronous variant of :class:`RecordingTransport`."""
+
+    def __init__(
+        self,
+        store: CassetteStore,
+        inner: Optional[httpx.AsyncBaseTransport] = None,
+        *,
+        match_body: bool = True,
+    ) -> None:
+        self.store = store
+        self.inner = inner or httpx.AsyncHTTPTransport()
+        self.match_body = match_body
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        body = await request.aread()
+        key = request_key(request.method, request.url.path, body, self.match_body)
+        response = await self.inner.handle_async_request(request)
+        recorder = _Recorder(self.store, request, key, started)
+        recorder.headers(response)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_AsyncRecordingStream(response, recorder),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, chunks: list[tuple[float, bytes]], sleep_until: Callable[[float], None]) -> None:
+        self._chunks = chunks
+        self._sleep_until = sleep_until
+
+    def __iter__(self) -> Iterator[bytes]:
+        for offset, data in self._chunks:
+            self._sleep_until(offset)
+            yield data
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[tuple[float, bytes]], sleep_until: Callable[[float], Any]) -> None:
+        self._chunks = chunks
+        self._sleep_until = sleep_until
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for offset, data in self._chunks:
+            await self._sleep_until(offset)
+            yield data
+
+
+class _ReplayBase:
+    def __init__(
+        self,
+        store: CassetteStore,
+        *,
+        latency_scale: float = 1.0,
+        match_body: bool = True,
+        any_match: bool = False,
+    ) -> None:
+        if latency_scale < 0:
+            raise ValueError("latency_scale must not be negative")
+        self.store = store
+        self.latency_scale = latency_scale
+        self.match_body = match_body
+        self.any_match = any_match
+
+    def _lookup(self, request: httpx.Request, body: bytes) -> tuple[dict[str, Any], list[tuple[float, bytes]]]:
+        key = request_key(request.method, request.url.path, body, self.match_body)
+        interaction = self.store.next_for(key, request.method, request.url.path, self.any_match)
+        chunks = [(offset, base64.b64decode(data)) for offset, data in interaction["chunks"]]
+        return interaction, chunks
+
+    def _delay(self, started: float, offset: float) -> float:
+        return started + offset * self.latency_scale - time.monotonic()
+
+    @staticmethod
+    def _response(interaction: dict[str, Any], stream: Any, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            interaction["status"],
+            headers=interaction["headers"],
+            stream=stream,
+            request=request,
+        )
+
+
+class ReplayTransport(_ReplayBase, httpx.BaseTransport):
+    """Serve recorded responses without network access.
+
+    Headers and body chunks are released at their recorded offsets
+    multiplied by ``latency_scale`` (``0`` replays instantly).
+
+    Raises:
+        CassetteMissError: For a request that has no recording.
+    """
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        interaction, chunks = self._lookup(request, request.read())
+
+        def sleep_until(offset: float) -> None:
+            delay = self._delay(started, offset)
+            if delay > 0:
+                time.sleep(delay)
+
+        sleep_until(interaction["headers_at"])
+        return self._response(interaction, _ReplayStream(chunks, sleep_until), request)
+
+
+class AsyncReplayTransport(_ReplayBase, httpx.AsyncBaseTransport):
+    """Asynchronous variant of :class:`ReplayTransport`."""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        interaction, chunks = self._lookup(request, await request.aread())
+
+        async def sleep_until(offset: float) -> None:
+            delay = self._delay(started, offset)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        await sleep_until(interaction["headers_at"])
+        return self._response(interaction, _AsyncReplayStream(chunks, sleep_until), request)
+
+
+def cassette_transports(
+    path: str | Path,
+    mode: str,
+    *,
+    latency_scale: float = 1.0,
+    any_match: bool = False,
+) -> tuple[httpx.BaseTransport, httpx.AsyncBaseTransport]:
+    """Build the sync and async transports for ``mode`` (``"record"`` or ``"replay"``)."""
+
+    store = CassetteStore(path)
+    if mode == "record":
+        return RecordingTransport(store), AsyncRecordingTransport(store)
+    if mode == "replay":
+        return (
+            ReplayTransport(store, latency_scale=latency_scale, any_match=any_match),
+            AsyncReplayTransport(store, latency_scale=latency_scale, any_match=any_match),
+        )
+    raise ValueError(f"Unknown cassette mode: {mode}")
+
+
+__all__ = [
+    "AsyncRecordingTransport",
+    "AsyncReplayTransport",
+    "CassetteMissError",
+    "CassetteStore",
+    "RecordingTransport",
+    "ReplayTransport",
+    "cassette_transports",
+    "request_key",
+]
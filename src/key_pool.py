@@ -0,0 +1,202 @@
+"""A pool of OpenAI API keys with least-loaded selection."""
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional
+
+import httpx
+from openai import (
+    AsyncOpenAI,
+    AuthenticationError,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+    RateLimitError,
+)
+
+
+class NoHealthyKeyError(RuntimeError):
+    """Raised when every key in the pool is currently ejected."""
+
+
+class PooledKey:
+    """A single API key with its own clients and rate-limit state."""
+
+    def __init__(self, name: str, client: Any, async_client: Any = None) -> None:
+        self.name = name
+        self.client = client
+        self.async_client = async_client
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.auth_failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.last_used = 0.0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class KeyPool:
+    """Distribute requests over several API keys or projects.
+
+    Each request goes to the healthy key with the fewest requests in flight.
+    A key that fails ``eject_after`` times in a row with a 429 or 401 is
+    ejected for ``eject_seconds`` (rate limits) or ``auth_eject_seconds``
+    (authentication failures). :meth:`utilization` reports per-key counters.
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[PooledKey],
+        *,
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        auth_eject_seconds: float = 300.0,
+    ) -> None:
+        self._keys = list(keys)
+        if not self._keys:
+            raise ValueError("A key pool needs at least one key")
+        if eject_after < 1:
+            raise ValueError("eject_after must be at least 1")
+
+        self._eject_after = eject_after
+        self._eject_seconds = eject_seconds
+        self._auth_eject_seconds = auth_eject_seconds
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls,
+        entries: Iterable[dict[str, Any]],
+        *,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+        **kwargs: Any,
+    ) -> "KeyPool":
+        """Build a pool from ``{"api_key": ..., "project": ..., "name": ...}`` entries.
+
+        ``transport`` and ``async_transport`` are shared by the clients of
+        every key (see :class:`~openai_agent.OpenAIAgent`).
+        """
+
+        keys = []
+        for entry in entries:
+            api_key = entry["api_key"]
+            project = entry.get("project")
+            name = entry.get("name") or project or f"...{api_key[-4:]}"
+            keys.append(
+                PooledKey(
+                    name,
+                    OpenAI(
+                        api_key=api_key,
+                        project=project,
+                        max_retries=0,
+                        http_client=DefaultHttpxClient(transport=transport) if transport else None,
+                    ),
+                    AsyncOpenAI(
+                        api_key=api_key,
+                        project=project,
+                        max_retries=0,
+                        http_client=(
+                            DefaultAsyncHttpxClient(transport=async_transport)
+                            if async_transport
+                            else None
+                        ),
+                    ),
+                )
+            )
+        return cls(keys, **kwargs)
+
+    @property
+    def keys(self) -> list[PooledKey]:
+        return list(self._keys)
+
+    @property
+    def supports_async(self) -> bool:
+        return all(key.async_client is not None for key in self._keys)
+
+    def acquire(self) -> PooledKey:
+        """Reserve the least-loaded healthy key."""
+
+        now = time.monotonic()
+        with self._lock:
+            healthy = [key for key in self._keys if key.is_healthy(now)]
+            if not healthy:
+                retry_in = min(key.ejected_until for key in self._keys) - now
+                raise NoHealthyKeyError(
+                    f"All API keys are temporarily ejected; retry in {retry_in:.1f}s"
+                )
+            key = min(
+                healthy,
+                key=lambda k: (k.in_flight, k.consecutive_failures, k.last_used),
+            )
+            key.in_flight += 1
+            key.requests += 1
+            key.last_used = now
+            return key
+
+    def release(self, key: PooledKey, error: Optional[BaseException] = None) -> None:
+        """Return ``key`` to the pool and record the outcome of its request."""
+
+        with self._lock:
+            key.in_flight -= 1
+            if error is None:
+                key.consecutive_failures = 0
+                return
+
+            key.errors += 1
+            if isinstance(error, RateLimitError):
+                key.rate_limited += 1
+                eject_for = self._eject_seconds
+            elif isinstance(error, AuthenticationError):
+                key.auth_failures += 1
+                eject_for = self._auth_eject_seconds
+            else:
+                return
+
+            key.consecutive_failures += 1
+            if key.consecutive_failures >= self._eject_after:
+                key.ejected_until = time.monotonic() + eject_for
+                key.consecutive_failures = 0
+
+    @contextmanager
+    def lease(self) -> Iterator[PooledKey]:
+        """Context manager around :meth:`acquire` and :meth:`release`."""
+
+        key = self.acquire()
+        try:
+            yield key
+        except BaseException as exc:
+            self.release(key, exc)
+            raise
+        else:
+            self.release(key)
+
+    def utilization(self) -> list[dict[str, Any]]:
+        """Per-key load and health counters."""
+
+        now = time.monotonic()
+        with self._lock:
+            total = sum(key.requests for key in self._keys) or 1
+            return [
+                {
+                    "name": key.name,
+                    "healthy": key.is_healthy(now),
+                    "ejected_for": max(0.0, key.ejected_until - now),
+                    "in_flight": key.in_flight,
+                    "requests": key.requests,
+                    "share": key.requests / total,
+                    "errors": key.errors,
+                    "rate_limited": key.rate_limited,
+                    "auth_failures": key.auth_failures,
+                }
+                for key in self._keys
+            ]
+
+
+__all__ = ["KeyPool", "NoHealthyKeyError", "PooledKey"]
@@ -0,0 +1,229 @@
+"""Map-reduce processing of documents larger than a model's context window."""
+from __future__ import annotations
+
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+DEFAULT_INSTRUCTION = "Summarize the text, keeping every key fact."
+# Joins the results of one stage into the input of the next
+PARTIAL_SEPARATOR = "\n\n---\n\n"
+# Preferred split points, coarsest first
+_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+MAP_TEMPLATE = (
+    "{instruction}\n\n"
+    "This is part {number} of {total} of a longer document. Work only with "
+    "this part; the results of all parts are combined afterwards.\n\n"
+    "{text}"
+)
+REDUCE_TEMPLATE = (
+    "{instruction}\n\n"
+    "The document was too long to handle at once, so it was split into "
+    "parts. Below are the results for consecutive parts, separated by "
+    "---. Combine them into a single result for the whole document.\n\n"
+    "{text}"
+)
+
+TokenCounter = Callable[[str], int]
+
+
+def token_counter(model: Optional[str] = None) -> TokenCounter:
+    """Return a function that counts the tokens of a text for ``model``.
+
+    Uses tiktoken when it is installed and otherwise estimates four
+    characters per token, which is close for English prose.
+    """
+
+    if tiktoken is None:
+        return lambda text: math.ceil(len(text) / 4)
+    try:
+        encoding = tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def split_text(text: str, max_tokens: int, count: Optional[TokenCounter] = None) -> list[str]:
+    """Split ``text`` into chunks of about ``max_tokens`` tokens at most.
+
+    Chunks end at paragraph breaks where possible, then at line breaks,
+    sentences and words; only a single word longer than the budget is cut
+    mid-word. Token counts of joined pieces are summed rather than
+    recounted, so a chunk may be off by a few tokens.
+    """
+
+    if max_tokens < 1:
+        raise ValueError("max_tokens must be at least 1")
+    count = count or token_counter()
+    return [chunk for chunk in _split(text, max_tokens, count, 0) if chunk.strip()]
+
+
+def _split(text: str, max_tokens: int, count: TokenCounter, level: int) -> list[str]:
+    size = count(text)
+    if size <= max_tokens:
+        return [text]
+    if level == len(_SEPARATORS):
+        step = max(1, len(text) * max_tokens // size)
+        return [text[start:start + step] for start in range(0, len(text), step)]
+
+    separator = _SEPARATORS[level]
+    separator_size = count(separator)
+    chunks: list[str] = []
+    current: list[str] = []
+    current_size = 0
+    for piece in text.split(separator):
+        piece_size = count(piece)
+        if piece_size > max_tokens:
+            if current:
+                chunks.append(separator.join(current))
+                current, current_size = [], 0
+            chunks.extend(_split(piece, max_tokens, count, level + 1))
+            continue
+        added = piece_size + (separator_size if current else 0)
+        if current and current_size + added > max_tokens:
+            chunks.append(separator.join(current))
+            current, current_size, added = [], 0, piece_size
+        current.append(piece)
+        current_size += added
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def group_partials(partials: list[str], max_tokens: int, count: Optional[TokenCounter] = None) -> list[str]:
+    """Join consecutive results into reduce inputs of at most ``max_tokens``.
+
+    Every group takes at least two results, even when that exceeds the
+    budget, so each reduce stage at least halves the number of results.
+    """
+
+    count = count or token_counter()
+    separator_size = count(PARTIAL_SEPARATOR)
+    groups: list[list[str]] = []
+    size = 0
+    for partial in partials:
+        partial_size = count(partial)
+        if groups and (len(groups[-1]) < 2 or size + separator_size + partial_size <= max_tokens):
+            groups[-1].append(partial)
+            size += separator_size + partial_size
+        else:
+            groups.append([partial])
+            size = partial_size
+    if len(groups) > 1 and len(groups[-1]) == 1:
+        # A lone trailing result would be carried to the next stage unchanged
+        groups[-2].extend(groups.pop())
+    return [PARTIAL_SEPARATOR.join(group) for group in groups]
+
+
+def build_prompt(instruction: str, stage: int, index: int, total: int, text: str) -> str:
+    """Return the prompt for input ``index`` of ``total`` in ``stage`` (0 = map)."""
+
+    template = MAP_TEMPLATE if stage == 0 else REDUCE_TEMPLATE
+    return template.format(instruction=instruction, number=index + 1, total=total, text=text)
+
+
+async def run_map_reduce(
+    document: str,
+    run_stage: Callable[[int, list[str]], Awaitable[list[str]]],
+    *,
+    chunk_tokens: int,
+    count: Optional[TokenCounter] = None,
+) -> str:
+    """Map ``document`` chunk by chunk and reduce the results to one text.
+
+    ``run_stage(stage, inputs)`` handles every input of a stage, ideally
+    concurrently, and returns the results in order. Stage 0 holds the
+    document chunks; each later stage holds the grouped results of the one
+    before, until a single result remains.
+    """
+
+    count = count or token_counter()
+    inputs = split_text(document, chunk_tokens, count)
+    if not inputs:
+        raise ValueError("Document must contain text")
+    stage = 0
+    while True:
+        outputs = await run_stage(stage, inputs)
+        if len(outputs) == 1:
+            return outputs[0]
+        inputs = group_partials(outputs, chunk_tokens, count)
+        stage += 1
+
+
+@dataclass
+class MapReduceResult:
+    """The combined text and the usage summed over every call."""
+
+    text: str = ""
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+async def amap_reduce(
+    agent: Any,
+    document: str,
+    instruction: str = DEFAULT_INSTRUCTION,
+    model: str = "gpt-4o-mini",
+    *,
+    chunk_tokens: int = 2000,
+    max_concurrency: int = 4,
+    timeout: Optional[float] = None,
+    count: Optional[TokenCounter] = None,
+) -> MapReduceResult:
+    """Apply ``instruction`` to a long ``document`` with an ``OpenAIAgent``.
+
+    Up to ``max_concurrency`` chunks are sent at once; the agent's retries
+    absorb rate limiting. ``timeout`` applies to each call; ``count``
+    defaults to :func:`token_counter` for ``model``. Nothing is stored, so a
+    failed call fails the whole run.
+    """
+
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    result = MapReduceResult()
+
+    async def call(prompt: str) -> str:
+        async with semaphore:
+            generation = await agent.agenerate(prompt, model, timeout=timeout)
+        result.calls += 1
+        result.input_tokens += generation.input_tokens or 0
+        result.output_tokens += generation.output_tokens or 0
+        return generation.text
+
+    async def run_stage(stage: int, inputs: list[str]) -> list[str]:
+        tasks = [
+            asyncio.ensure_future(call(build_prompt(instruction, stage, index, len(inputs), text)))
+            for index, text in enumerate(inputs)
+        ]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    result.text = await run_map_reduce(
+        document, run_stage, chunk_tokens=chunk_tokens, count=count or token_counter(model)
+    )
+    return result
+
+
+__all__ = [
+    "DEFAULT_INSTRUCTION",
+    "MapReduceResult",
+    "amap_reduce",
+    "build_prompt",
+    "group_partials",
+    "run_map_reduce",
+    "split_text",
+    "token_counter",
+]
@@ -1,11 +1,42 @@
 """Utilities for interacting with the OpenAI Responses API."""
 from __future__ import annotations
 
+import asyncio
 import os
 import time
-from typing import Optional
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterator, Optional
 
-from openai import APIError, OpenAI, OpenAIError, RateLimitError
+import httpx
+from openai import (
+    APIError,
+    APITimeoutError,
+    AsyncOpenAI,
+    AuthenticationError,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+    OpenAIError,
+    RateLimitError,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from key_pool import KeyPool
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised when a request cannot complete before its deadline."""
+
+
+@dataclass(frozen=True)
+class Generation:
+    """A generated text together with the token usage reported for it."""
+
+    text: str
+    model: Optional[str] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
 
 
 class OpenAIAgent:
@@ -16,8 +47,13 @@ class OpenAIAgent:
         api_key: Optional[str] = None,
         *,
         client: Optional[OpenAI] = None,
+        async_client: Optional[AsyncOpenAI] = None,
+        key_pool: Optional["KeyPool"] = None,
         max_retries: int = 3,
         retry_backoff: float = 1.5,
+        tracer: Any = None,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
     ) -> None:
         """Initialise the agent.
 
@@ -26,20 +62,50 @@ class OpenAIAgent:
                 environment variable when omitted.
             client: Pre-configured :class:`~openai.OpenAI` client. When
                 provided, ``api_key`` is ignored and no new client is created.
+                Build it with ``max_retries=0`` so the deadline and retry
+                budget below are not multiplied by the SDK's own retries.
+            async_client: Pre-configured :class:`~openai.AsyncOpenAI` client
+                used by :meth:`agenerate_response`. Created from the API key
+                when neither client is supplied.
+            key_pool: A :class:`~key_pool.KeyPool` to spread requests over
+                several API keys. Each attempt leases the least-loaded healthy
+                key; ``api_key`` and the client arguments are ignored.
             max_retries: Maximum number of attempts when hitting rate limits.
             retry_backoff: Multiplicative factor for exponential backoff between
                 retries.
+            tracer: Optional tracer whose ``span(name, **attributes)`` context
+                manager wraps every attempt and backoff sleep.
+            transport: Optional ``httpx`` transport for the client created
+                from the API key, e.g. a :mod:`cassette` recorder or replayer.
+            async_transport: Asynchronous counterpart of ``transport``.
         """
 
-        if client is not None:
+        self._key_pool = key_pool
+        if key_pool is not None:
+            self._client = None
+            self._async_client = None
+        elif client is not None:
             self._client = client
+            self._async_client = async_client
         else:
             key = api_key or os.getenv("OPENAI_API_KEY")
             if not key:
                 raise ValueError(
                     "OPENAI_API_KEY environment variable is not set and no API key was provided."
                 )
-            self._client = OpenAI(api_key=key)
+            # The agent owns retries, so every attempt fits in the deadline
+            self._client = OpenAI(
+                api_key=key,
+                max_retries=0,
+                http_client=DefaultHttpxClient(transport=transport) if transport else None,
+            )
+            self._async_client = async_client or AsyncOpenAI(
+                api_key=key,
+                max_retries=0,
+                http_client=(
+                    DefaultAsyncHttpxClient(transport=async_transport) if async_transport else None
+                ),
+            )
 
         if max_retries < 1:
             raise ValueError("max_retries must be at least 1")
@@ -48,50 +114,218 @@ class OpenAIAgent:
 
         self._max_retries = max_retries
         self._retry_backoff = retry_backoff
+        self._tracer = tracer
 
     @property
     def client(self) -> OpenAI:
         """Expose the underlying OpenAI client for advanced usage."""
 
+        if self._key_pool is not None:
+            return self._key_pool.keys[0].client
         return self._client
 
-    def generate_response(self, prompt: str, model: str = "gpt-4o-mini") -> str:
+    @property
+    def key_pool(self) -> Optional["KeyPool"]:
+        return self._key_pool
+
+    def generate_response(
+        self,
+        prompt: str,
+        model: str = "gpt-4o-mini",
+        *,
+        timeout: Optional[float] = None,
+    ) -> str:
         """Generate a response for the supplied prompt.
 
         Args:
             prompt: The user prompt to send to the model.
             model: The model identifier to call. Defaults to ``"gpt-4o-mini"``.
+            timeout: Overall deadline in seconds, covering every attempt and
+                the backoff sleeps between them. ``None`` disables the deadline.
 
         Returns:
             The assistant's text response.
 
         Raises:
+            DeadlineExceededError: If the deadline passes before a response
+                is received.
             RuntimeError: If the OpenAI API returns an unexpected error or no
                 textual output is produced.
         """
 
+        return self.generate(prompt, model, timeout=timeout).text
+
+    def generate(
+        self,
+        prompt: str,
+        model: str = "gpt-4o-mini",
+        *,
+        timeout: Optional[float] = None,
+    ) -> Generation:
+        """Like :meth:`generate_response`, but also report token usage."""
+
         if not prompt:
             raise ValueError("Prompt must be a non-empty string")
 
+        deadline = self._deadline(timeout)
         attempt = 0
         delay = 1.0
         while True:
             attempt += 1
             try:
-                response = self._client.responses.create(model=model, input=prompt)
-                text = self._extract_text(response)
-                if text is None:
-                    raise RuntimeError("No textual content returned by the OpenAI API")
-                return text
-            except RateLimitError as exc:  # pragma: no cover - triggered via mock
-                if attempt >= self._max_retries:
-                    raise RuntimeError("OpenAI API rate limit exceeded") from exc
-                time.sleep(delay)
-                delay *= self._retry_backoff
-            except APIError as exc:  # pragma: no cover - triggered via mock
-                raise RuntimeError(f"OpenAI API error: {exc}") from exc
-            except OpenAIError as exc:  # pragma: no cover - triggered via mock
-                raise RuntimeError(f"Unexpected OpenAI client error: {exc}") from exc
+                with self._span("openai.attempt", attempt=attempt, model=model):
+                    with self._lease() as (client, _):
+                        response = client.responses.create(
+                            **self._request_kwargs(prompt, model, deadline)
+                        )
+                    return self._generation(response, model)
+            except OpenAIError as exc:
+                if self._handle_error(exc, attempt, delay, deadline):
+                    with self._span("openai.backoff", attempt=attempt, delay=delay):
+                        time.sleep(delay)
+                    delay *= self._retry_backoff
+
+    async def agenerate_response(
+        self,
+        prompt: str,
+        model: str = "gpt-4o-mini",
+        *,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Asynchronous variant of :meth:`generate_response`.
+
+        Cancelling the awaiting task aborts the in-flight HTTP request, so an
+        abandoned caller does not keep the upstream call alive. Without an
+        async client the synchronous path runs in a worker thread instead.
+        """
+
+        return (await self.agenerate(prompt, model, timeout=timeout)).text
+
+    async def agenerate(
+        self,
+        prompt: str,
+        model: str = "gpt-4o-mini",
+        *,
+        timeout: Optional[float] = None,
+    ) -> Generation:
+        """Asynchronous variant of :meth:`generate`."""
+
+        if self._async_client is None and not (
+            self._key_pool is not None and self._key_pool.supports_async
+        ):
+            return await asyncio.to_thread(self.generate, prompt, model, timeout=timeout)
+
+        if not prompt:
+            raise ValueError("Prompt must be a non-empty string")
+
+        deadline = self._deadline(timeout)
+        attempt = 0
+        delay = 1.0
+        while True:
+            attempt += 1
+            try:
+                with self._span("openai.attempt", attempt=attempt, model=model):
+                    with self._lease() as (_, async_client):
+                        response = await async_client.responses.create(
+                            **self._request_kwargs(prompt, model, deadline)
+                        )
+                    return self._generation(response, model)
+            except OpenAIError as exc:
+                if self._handle_error(exc, attempt, delay, deadline):
+                    with self._span("openai.backoff", attempt=attempt, delay=delay):
+                        await asyncio.sleep(delay)
+                    delay *= self._retry_backoff
+
+    def _span(self, name: str, **attributes: Any) -> Any:
+        """Open a tracing span, or do nothing without a tracer."""
+
+        if self._tracer is None:
+            return nullcontext()
+        return self._tracer.span(name, **attributes)
+
+    @contextmanager
+    def _lease(self) -> Iterator[tuple[Any, Any]]:
+        """Yield the sync and async clients to use for one attempt."""
+
+        if self._key_pool is None:
+            yield self._client, self._async_client
+            return
+        with self._key_pool.lease() as key:
+            yield key.client, key.async_client
+
+    @staticmethod
+    def _deadline(timeout: Optional[float]) -> Optional[float]:
+        """Convert a relative timeout into an absolute monotonic deadline."""
+
+        if timeout is None:
+            return None
+        if timeout <= 0:
+            raise ValueError("timeout must be greater than 0")
+        return time.monotonic() + timeout
+
+    @staticmethod
+    def _request_kwargs(
+        prompt: str, model: str, deadline: Optional[float]
+    ) -> dict[str, Any]:
+        """Build the ``responses.create`` arguments for one attempt."""
+
+        kwargs: dict[str, Any] = {"model": model, "input": prompt}
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError("Deadline exceeded before the request was sent")
+            kwargs["timeout"] = remaining
+        return kwargs
+
+    def _require_text(self, response: object) -> str:
+        text = self._extract_text(response)
+        if text is None:
+            raise RuntimeError("No textual content returned by the OpenAI API")
+        return text
+
+    def _generation(self, response: object, model: str) -> Generation:
+        usage = getattr(response, "usage", None)
+        return Generation(
+            text=self._require_text(response),
+            model=getattr(response, "model", None) or model,
+            input_tokens=getattr(usage, "input_tokens", None),
+            output_tokens=getattr(usage, "output_tokens", None),
+        )
+
+    def _handle_error(
+        self,
+        exc: OpenAIError,
+        attempt: int,
+        delay: float,
+        deadline: Optional[float],
+    ) -> bool:
+        """Translate ``exc`` into the agent's errors, or allow a retry.
+
+        Returns whether the retry should back off first. With a key pool an
+        authentication failure is retried immediately on another key.
+        """
+
+        if isinstance(exc, APITimeoutError):
+            raise DeadlineExceededError("OpenAI API request timed out") from exc
+        if isinstance(exc, RateLimitError):
+            if attempt >= self._max_retries:
+                raise RuntimeError("OpenAI API rate limit exceeded") from exc
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise DeadlineExceededError(
+                    "Deadline exceeded while backing off from rate limits"
+                ) from exc
+            return True
+        if (
+            isinstance(exc, AuthenticationError)
+            and self._key_pool is not None
+            and attempt < self._max_retries
+        ):
+            return False
+        if isinstance(exc, APIError):
+            # Connection errors wrap the transport's own exception
+            cause = f" ({exc.__cause__})" if exc.__cause__ is not None else ""
+            raise RuntimeError(f"OpenAI API error: {exc}{cause}") from exc
+        raise RuntimeError(f"Unexpected OpenAI client error: {exc}") from exc
 
     @staticmethod
     def _extract_text(response: object) -> Optional[str]:
@@ -116,4 +350,4 @@ class OpenAIAgent:
         return None
 
 
-__all__ = ["OpenAIAgent"]
+__all__ = ["DeadlineExceededError", "Generation", "OpenAIAgent"]
@@ -0,0 +1,46 @@
+"""Fixtures for the tests of the Django app; the src tests run without Django."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def django_setup():
+    """Configure Django against a fresh test database for the whole session."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_app.settings")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+    # A second SQLite alias, so tests can see which database served a read;
+    # under test it mirrors the primary
+    os.environ.setdefault("DB_REPLICA_NAME", "replica.sqlite3")
+
+    import django
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    django.setup()
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    yield
+    teardown_databases(old_config, verbosity=0)
+    teardown_test_environment()
+
+
+@pytest.fixture
+def db(django_setup):
+    """Empty the database after the test.
+
+    Writes are committed rather than rolled back, so rows written by other
+    threads (the write-behind flusher, sync_to_async workers) are visible.
+    """
+    from django.core.cache import cache
+    from django.core.management import call_command
+
+    yield
+    call_command("flush", interactive=False, verbosity=0)
+    cache.clear()
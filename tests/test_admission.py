@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+
+class RecordingAgent:
+    """Agent that must never be reached while the service sheds load."""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, prompt, model, timeout=None):
+        self.calls.append(prompt)
+        raise AssertionError("shed requests must not reach the API")
+
+    async def agenerate(self, prompt, model, timeout=None):
+        self.calls.append(prompt)
+        raise AssertionError("shed requests must not reach the API")
+
+
+@pytest.fixture
+def overloaded(db, monkeypatch):
+    """Saturate a one-slot scheduler without queue space and record agent calls."""
+    from django_app.prompt_agent import scheduling, services
+
+    scheduler = scheduling.FairScheduler(max_concurrency=1, max_queue=0)
+    scheduler.submit(flow="busy")
+    monkeypatch.setattr(scheduling, "_scheduler", scheduler)
+    agent = RecordingAgent()
+    monkeypatch.setattr(services, "OpenAIAgent", lambda *args, **kwargs: agent)
+    return agent
+
+
+def assert_nothing_written():
+    from django_app.prompt_agent.models import PromptResponse, TextBlob
+
+    assert not PromptResponse.objects.exists()
+    assert not TextBlob.objects.exists()
+
+
+def test_form_submission_is_shed_with_retry_after_before_any_write(overloaded):
+    from django.test import Client
+
+    response = Client().post("/", {"prompt": "hello"})
+
+    assert response.status_code == 503
+    assert int(response["Retry-After"]) >= 1
+    assert overloaded.calls == []
+    assert_nothing_written()
+
+
+def test_ajax_submission_is_shed_with_retry_after_before_any_write(overloaded):
+    from django.test import Client
+
+    response = Client().post(
+        "/api/submit/", json.dumps({"prompt": "hello"}), content_type="application/json"
+    )
+
+    assert response.status_code == 503
+    body = response.json()
+    assert body["success"] is False
+    assert response["Retry-After"] == str(body["retry_after"])
+    assert overloaded.calls == []
+    assert_nothing_written()
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import datetime
+from urllib.parse import parse_qsl
+
+import pytest
+
+TZ = datetime.timezone.utc
+
+
+@pytest.fixture
+def model_admin(db):
+    """A PromptResponse admin configured like PROMPT_ADMIN_BIG_TABLE mode."""
+    from django.contrib import admin
+    from django.contrib.admin.options import ShowFacets
+
+    from django_app.prompt_agent.bigtable import (
+        EstimatedCountPaginator,
+        KeysetChangeList,
+        cached_values_filter,
+    )
+    from django_app.prompt_agent.models import PromptResponse
+
+    class BigTableAdmin(admin.ModelAdmin):
+        list_display = ["id", "status", "created_at"]
+        list_filter = [cached_values_filter("status", "status")]
+        date_hierarchy = "created_at"
+        paginator = EstimatedCountPaginator
+        list_per_page = 2
+        show_full_result_count = False
+        show_facets = ShowFacets.NEVER
+
+        def get_changelist(self, request, **kwargs):
+            return KeysetChangeList
+
+    return BigTableAdmin(PromptResponse, admin.AdminSite())
+
+
+@pytest.fixture
+def superuser(db):
+    from django.contrib.auth.models import User
+
+    return User.objects.create_superuser("admin", "admin@example.test", "secret")
+
+
+def create_prompts(*timestamps):
+    from django_app.prompt_agent.models import PromptResponse
+
+    pks = []
+    for timestamp in timestamps:
+        prompt = PromptResponse(prompt=f"prompt at {timestamp}", status="completed")
+        prompt.save()
+        PromptResponse.objects.filter(pk=prompt.pk).update(created_at=timestamp)
+        pks.append(prompt.pk)
+    return pks
+
+
+def changelist(model_admin, user, query=""):
+    from django.test import RequestFactory
+
+    request = RequestFactory().get("/admin/prompt_agent/promptresponse/", dict(parse_qsl(query.lstrip("?"))))
+    request.user = user
+    return model_admin.get_changelist_instance(request)
+
+
+def test_keyset_pages_follow_the_cursor(model_admin, superuser):
+    same = datetime.datetime(2026, 3, 1, 12, tzinfo=TZ)
+    pks = create_prompts(
+        datetime.datetime(2026, 1, 1, 12, tzinfo=TZ),
+        same,
+        same,
+        datetime.datetime(2026, 2, 1, 12, tzinfo=TZ),
+        datetime.datetime(2026, 4, 1, 12, tzinfo=TZ),
+    )
+    expected = [pks[4], pks[2], pks[1], pks[3], pks[0]]
+
+    cl = changelist(model_admin, superuser)
+    assert cl.keyset and cl.first_page_url is None
+    seen = [prompt.pk for prompt in cl.result_list]
+    while cl.next_page_url:
+        cl = changelist(model_admin, superuser, cl.next_page_url)
+        assert "cursor" not in dict(parse_qsl(cl.first_page_url.lstrip("?")))
+        seen += [prompt.pk for prompt in cl.result_list]
+
+    assert seen == expected
+    assert cl.multi_page
+
+
+def test_invalid_cursor_is_rejected(model_admin, superuser):
+    from django.contrib.admin.options import IncorrectLookupParameters
+
+    create_prompts(datetime.datetime(2026, 1, 1, tzinfo=TZ))
+
+    with pytest.raises(IncorrectLookupParameters):
+        changelist(model_admin, superuser, "?cursor=not-a-cursor")
+
+
+def test_paginator_counts_exactly_without_planner_estimates(db):
+    from django.test import override_settings
+
+    from django_app.prompt_agent.bigtable import EstimatedCountPaginator, estimate_count
+    from django_app.prompt_agent.models import PromptResponse
+
+    create_prompts(*[datetime.datetime(2026, 1, day, tzinfo=TZ) for day in range(1, 4)])
+    queryset = PromptResponse.objects.all()
+
+    assert estimate_count(queryset) is None
+    with override_settings(PROMPT_ADMIN_EXACT_COUNT_THRESHOLD=0):
+        assert EstimatedCountPaginator(queryset, 2).count == 3
+
+
+def test_date_hierarchy_drills_down_from_years_to_days(model_admin, superuser):
+    from django_app.prompt_agent.bigtable import index_date_hierarchy
+
+    create_prompts(
+        datetime.datetime(2026, 1, 15, 12, tzinfo=TZ),
+        datetime.datetime(2026, 3, 2, 12, tzinfo=TZ),
+        datetime.datetime(2026, 3, 20, 12, tzinfo=TZ),
+    )
+
+    def level(query=""):
+        return index_date_hierarchy(changelist(model_admin, superuser, query))
+
+    years = level()
+    assert [choice["title"] for choice in years["choices"]] == ["2026"]
+    assert years["back"] is None
+
+    months = level("?created_at__year=2026")
+    assert len(months["choices"]) == 3
+    assert "created_at__month=3" in months["choices"][-1]["link"]
+
+    days = level("?created_at__year=2026&created_at__month=3")
+    # Bounded by the first and last row of the month
+    assert len(days["choices"]) == 19
+    assert "created_at__day=2&" in days["choices"][0]["link"]
+    assert "created_at__day=20" in days["choices"][-1]["link"]
+
+    day = level("?created_at__year=2026&created_at__month=3&created_at__day=20")
+    assert len(day["choices"]) == 1 and "link" not in day["choices"][0]
+    assert "created_at__month=3" in day["back"]["link"]
+
+
+def test_status_filter_choices_are_cached(model_admin, superuser):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    create_prompts(datetime.datetime(2026, 1, 1, tzinfo=TZ))
+    changelist(model_admin, superuser)
+
+    with CaptureQueriesContext(connection) as queries:
+        cl = changelist(model_admin, superuser)
+        choices = list(cl.filter_specs[0].lookup_choices)
+
+    assert choices == [("completed", "Completed (~1)")]
+    assert not any("GROUP BY" in query["sql"] for query in queries.captured_queries)
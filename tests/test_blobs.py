@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture
+def small_blobs(db):
+    from django.test import override_settings
+
+    with override_settings(PROMPT_BLOB_COMPRESS_THRESHOLD=100, PROMPT_BLOB_SEARCH_PREFIX=40):
+        yield
+
+
+def test_identical_texts_share_one_blob(db):
+    from django_app.prompt_agent.models import PromptResponse, TextBlob
+
+    first = PromptResponse(prompt="same question")
+    first.save()
+    second = PromptResponse(prompt="same question")
+    second.response = "same question"
+    second.save()
+
+    assert TextBlob.objects.count() == 1
+    assert first.prompt_blob_id == second.prompt_blob_id == second.response_blob_id
+
+
+def test_long_text_is_compressed_and_round_trips(small_blobs):
+    from django_app.prompt_agent.models import PromptResponse, TextBlob
+
+    text = "The quarterly report is due on Friday. " * 20
+    PromptResponse(prompt=text).save()
+
+    blob = TextBlob.objects.get()
+    assert blob.data is not None
+    assert blob.size == len(text.encode("utf-8"))
+    assert blob.text == text[:40]
+    assert PromptResponse.objects.get().prompt == text
+
+
+def test_admin_search_finds_compressed_prompts_by_their_prefix(small_blobs):
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    from django_app.prompt_agent.models import PromptResponse
+
+    PromptResponse(prompt="Unicorn budget review. " + "filler text " * 50).save()
+    PromptResponse(prompt="Something else entirely").save()
+    client = Client()
+    client.force_login(User.objects.create_superuser("admin", "admin@example.test", "secret"))
+
+    response = client.get("/admin/prompt_agent/promptresponse/", {"q": "unicorn"})
+
+    assert response.status_code == 200
+    assert response.context["cl"].result_count == 1
+
+
+def test_dedup_migration_moves_inline_text_into_blobs(db):
+    import zlib
+
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+    from django.test import override_settings
+
+    before = [("prompt_agent", "0004_textblob")]
+    after = [("prompt_agent", "0005_dedup_prompt_text")]
+    executor = MigrationExecutor(connection)
+    latest = executor.loader.graph.leaf_nodes("prompt_agent")
+    executor.migrate(before)
+    try:
+        old_apps = executor.loader.project_state(before).apps
+        OldPromptResponse = old_apps.get_model("prompt_agent", "PromptResponse")
+        long_text = "All hands meeting moved to Thursday. " * 10
+        OldPromptResponse.objects.create(prompt="shared", response=long_text)
+        OldPromptResponse.objects.create(prompt="shared", response="")
+
+        executor = MigrationExecutor(connection)
+        with override_settings(PROMPT_BLOB_COMPRESS_THRESHOLD=100):
+            executor.migrate(after)
+
+        new_apps = executor.loader.project_state(after).apps
+        PromptResponse = new_apps.get_model("prompt_agent", "PromptResponse")
+        TextBlob = new_apps.get_model("prompt_agent", "TextBlob")
+        first, second = PromptResponse.objects.order_by("pk")
+        assert TextBlob.objects.count() == 2
+        assert first.prompt_blob_id == second.prompt_blob_id
+        assert second.response_blob_id is None
+        compressed = TextBlob.objects.get(pk=first.response_blob_id)
+        assert zlib.decompress(bytes(compressed.data)).decode("utf-8") == long_text
+    finally:
+        executor = MigrationExecutor(connection)
+        executor.migrate(latest)
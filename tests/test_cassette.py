@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("openai")
+
+import httpx
+
+from src.cassette import (
+    AsyncReplayTransport,
+    CassetteMissError,
+    CassetteStore,
+    RecordingTransport,
+    ReplayTransport,
+)
+from src.openai_agent import OpenAIAgent
+
+
+def responses_api(request: httpx.Request) -> httpx.Response:
+    prompt = json.loads(request.content)["input"]
+    body = {"output": [{"content": [{"type": "text", "text": f"echo: {prompt}"}]}]}
+    return httpx.Response(200, json=body)
+
+
+def record(path, *prompts):
+    store = CassetteStore(path)
+    agent = OpenAIAgent(
+        api_key="test", transport=RecordingTransport(store, httpx.MockTransport(responses_api))
+    )
+    return [agent.generate_response(prompt) for prompt in prompts]
+
+
+def test_recorded_responses_replay_without_network(tmp_path):
+    path = tmp_path / "openai.jsonl.gz"
+    assert record(path, "first", "second") == ["echo: first", "echo: second"]
+
+    store = CassetteStore(path)
+    agent = OpenAIAgent(api_key="replay", transport=ReplayTransport(store, latency_scale=0))
+
+    assert len(store) == 2
+    assert agent.generate_response("second") == "echo: second"
+    assert agent.generate_response("first") == "echo: first"
+
+
+def test_replay_scales_recorded_latency(tmp_path):
+    path = tmp_path / "openai.jsonl.gz"
+    record(path, "slow")
+    store = CassetteStore(path)
+    for interaction in store._by_key.values():
+        interaction[0]["headers_at"] = 0.2
+        interaction[0]["chunks"] = [[0.4, chunk] for _, chunk in interaction[0]["chunks"]]
+
+    agent = OpenAIAgent(api_key="replay", transport=ReplayTransport(store, latency_scale=0.25))
+    started = time.monotonic()
+    assert agent.generate_response("slow") == "echo: slow"
+    assert 0.1 <= time.monotonic() - started < 0.4
+
+
+def test_replay_miss_and_any_match(tmp_path):
+    path = tmp_path / "openai.jsonl.gz"
+    record(path, "known")
+    store = CassetteStore(path)
+
+    client = httpx.Client(transport=ReplayTransport(store, latency_scale=0))
+    with pytest.raises(CassetteMissError):
+        client.post("https://api.openai.com/v1/responses", json={"model": "m", "input": "unknown"})
+
+    loose = OpenAIAgent(
+        api_key="replay",
+        async_transport=AsyncReplayTransport(store, latency_scale=0, any_match=True),
+    )
+    assert asyncio.run(loose.agenerate_response("unknown")) == "echo: known"
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import types
+
+import pytest
+
+pytest.importorskip("openai")
+
+import httpx
+from openai import AuthenticationError, RateLimitError
+
+from src.key_pool import KeyPool, NoHealthyKeyError, PooledKey
+from src.openai_agent import OpenAIAgent
+
+
+def status_error(cls, status: int):
+    request = httpx.Request("POST", "https://example.test")
+    return cls("error", response=httpx.Response(status, request=request), body=None)
+
+
+def build_response(text: str):
+    block = types.SimpleNamespace(type="text", text=text)
+    return types.SimpleNamespace(output=[types.SimpleNamespace(content=[block])])
+
+
+class DummyClient:
+    def __init__(self, handler):
+        self.responses = types.SimpleNamespace(create=handler)
+
+
+def test_acquire_prefers_least_loaded_key():
+    pool = KeyPool([PooledKey("a", None), PooledKey("b", None)])
+
+    first = pool.acquire()
+    second = pool.acquire()
+
+    assert {first.name, second.name} == {"a", "b"}
+    pool.release(first)
+    assert pool.acquire() is first
+
+
+def test_repeated_rate_limits_eject_key():
+    pool = KeyPool([PooledKey("a", None)], eject_after=2, eject_seconds=60)
+    key = pool.acquire()
+    pool.release(key, status_error(RateLimitError, 429))
+    key = pool.acquire()
+    pool.release(key, status_error(RateLimitError, 429))
+
+    with pytest.raises(NoHealthyKeyError):
+        pool.acquire()
+    [stats] = pool.utilization()
+    assert stats["healthy"] is False
+    assert stats["rate_limited"] == 2
+
+
+def test_agent_fails_over_to_next_key_on_auth_error():
+    def reject(model: str, input: str):
+        raise status_error(AuthenticationError, 401)
+
+    def accept(model: str, input: str):
+        return build_response("from b")
+
+    pool = KeyPool(
+        [PooledKey("a", DummyClient(reject)), PooledKey("b", DummyClient(accept))],
+        eject_after=1,
+    )
+    agent = OpenAIAgent(key_pool=pool)
+
+    assert agent.generate_response("prompt") == "from b"
+    stats = {entry["name"]: entry for entry in pool.utilization()}
+    assert stats["a"]["auth_failures"] == 1
+    assert stats["a"]["healthy"] is False
+    assert stats["b"]["requests"] == 1
+
+
+def test_pooled_clients_leave_retries_to_the_agent():
+    pool = KeyPool.from_config([{"api_key": "sk-one"}, {"api_key": "sk-two"}])
+
+    for key in pool.keys:
+        assert key.client.max_retries == 0
+        assert key.async_client.max_retries == 0
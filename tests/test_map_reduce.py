@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+import types
+
+from src.map_reduce import amap_reduce, group_partials, split_text
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def test_split_text_prefers_paragraphs_and_respects_budget():
+    paragraphs = [" ".join(f"p{n}w{i}" for i in range(4)) for n in range(6)]
+    document = "\n\n".join(paragraphs)
+
+    chunks = split_text(document, 8, count_words)
+
+    assert chunks == ["\n\n".join(paragraphs[i:i + 2]) for i in range(0, 6, 2)]
+
+
+def test_split_text_breaks_oversized_paragraphs_by_words():
+    document = " ".join(f"w{i}" for i in range(10))
+
+    chunks = split_text(document, 3, count_words)
+
+    assert all(count_words(chunk) <= 3 for chunk in chunks)
+    assert " ".join(chunks).split() == document.split()
+
+
+def test_group_partials_always_halves_the_results():
+    partials = [f"result {i}" for i in range(5)]
+
+    groups = group_partials(partials, 1, count_words)
+
+    assert len(groups) == 2
+    assert [part for group in groups for part in group.split("\n\n---\n\n")] == partials
+
+
+def test_amap_reduce_runs_chunks_concurrently_and_reduces_hierarchically():
+    calls = []
+    running = {"now": 0, "max": 0}
+
+    class FakeAgent:
+        async def agenerate(self, prompt, model, timeout=None):
+            calls.append(prompt)
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            return types.SimpleNamespace(text="summary " * 5, input_tokens=10, output_tokens=1)
+
+    # Paragraphs of 30 words, so every 40 word chunk holds one
+    document = "\n\n".join("word " * 30 for _ in range(8))
+
+    result = asyncio.run(
+        amap_reduce(
+            FakeAgent(), document, "Summarize.", chunk_tokens=40, max_concurrency=3, count=count_words
+        )
+    )
+
+    map_calls = [prompt for prompt in calls if "This is part" in prompt]
+    assert len(map_calls) == 8
+    # 8 chunk results need two reduce calls, whose results need a third
+    assert result.text == "summary " * 5
+    assert result.calls == len(calls) == 11
+    assert result.input_tokens == 10 * len(calls)
+    assert running["max"] == 3
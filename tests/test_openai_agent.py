@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import time
 import types
 
 import pytest
 
 pytest.importorskip("openai")
 
-from openai import APIError, RateLimitError
+import httpx
+from openai import APIError, APITimeoutError, RateLimitError
 
-from src.openai_agent import OpenAIAgent
+from src.openai_agent import DeadlineExceededError, Generation, OpenAIAgent
 
 
 class DummyClient:
@@ -94,3 +98,137 @@ def test_missing_api_key_raises_value_error(monkeypatch):
 
     with pytest.raises(ValueError):
         OpenAIAgent(api_key=None, client=None)
+
+
+def test_generate_response_passes_remaining_deadline():
+    calls = {}
+
+    def handler(model: str, input: str, timeout: float):
+        calls["timeout"] = timeout
+        return build_response("on time")
+
+    agent = OpenAIAgent(client=DummyClient(handler))
+    result = agent.generate_response("prompt", timeout=5.0)
+
+    assert result == "on time"
+    assert 0 < calls["timeout"] <= 5.0
+
+
+def test_generate_response_maps_sdk_timeout_to_deadline_error():
+    def handler(model: str, input: str, timeout: float):
+        raise APITimeoutError(request=httpx.Request("POST", "https://example.test"))
+
+    agent = OpenAIAgent(client=DummyClient(handler))
+
+    with pytest.raises(DeadlineExceededError):
+        agent.generate_response("prompt", timeout=1.0)
+
+
+def test_generate_response_does_not_back_off_past_deadline(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("src.openai_agent.time.sleep", sleeps.append)
+
+    def handler(model: str, input: str, timeout: float):
+        raise RateLimitError(
+            "rate limit",
+            response=httpx.Response(429, request=httpx.Request("POST", "https://example.test")),
+            body=None,
+        )
+
+    agent = OpenAIAgent(client=DummyClient(handler), max_retries=5)
+
+    with pytest.raises(DeadlineExceededError):
+        agent.generate_response("prompt", timeout=0.5)
+    assert sleeps == []
+
+
+def test_generate_reports_token_usage():
+    def handler(model: str, input: str):
+        response = build_response("counted")
+        response.usage = types.SimpleNamespace(input_tokens=12, output_tokens=3)
+        return response
+
+    agent = OpenAIAgent(client=DummyClient(handler))
+
+    assert agent.generate("prompt", model="test-model") == Generation(
+        text="counted", model="test-model", input_tokens=12, output_tokens=3
+    )
+
+
+def test_agenerate_response_falls_back_to_thread_without_async_client():
+    agent = OpenAIAgent(client=DummyClient(lambda model, input: build_response("async")))
+
+    assert asyncio.run(agent.agenerate_response("prompt")) == "async"
+
+
+def test_generate_response_traces_attempts_and_backoff(monkeypatch):
+    monkeypatch.setattr("src.openai_agent.time.sleep", lambda delay: None)
+    spans = []
+
+    class RecordingTracer:
+        @contextlib.contextmanager
+        def span(self, name, **attributes):
+            spans.append((name, attributes))
+            yield
+
+    attempts = {"count": 0}
+
+    def handler(model: str, input: str):
+        attempts["count"] += 1
+        if attempts["count"] == 1:
+            raise RateLimitError(
+                "rate limit",
+                response=httpx.Response(429, request=httpx.Request("POST", "https://example.test")),
+                body=None,
+            )
+        return build_response("traced")
+
+    agent = OpenAIAgent(client=DummyClient(handler), tracer=RecordingTracer())
+
+    assert agent.generate_response("prompt", model="test-model") == "traced"
+    assert spans == [
+        ("openai.attempt", {"attempt": 1, "model": "test-model"}),
+        ("openai.backoff", {"attempt": 1, "delay": 1.0}),
+        ("openai.attempt", {"attempt": 2, "model": "test-model"}),
+    ]
+
+
+class CountingTransport(httpx.MockTransport):
+    """Transport that records every HTTP request the SDK sends."""
+
+    def __init__(self, handler):
+        self.requests = []
+
+        def record(request):
+            self.requests.append(request)
+            return handler(request)
+
+        super().__init__(record)
+
+
+def test_each_agent_attempt_sends_exactly_one_request(monkeypatch):
+    monkeypatch.setattr("src.openai_agent.time.sleep", lambda delay: None)
+    transport = CountingTransport(
+        lambda request: httpx.Response(429, json={"error": {"message": "slow down"}})
+    )
+    agent = OpenAIAgent(api_key="sk-test", max_retries=2, transport=transport)
+
+    with pytest.raises(RuntimeError, match="rate limit"):
+        agent.generate_response("prompt")
+
+    assert len(transport.requests) == 2
+
+
+def test_sdk_timeout_is_not_retried_past_the_deadline():
+    def handler(request):
+        raise httpx.ReadTimeout("upstream too slow", request=request)
+
+    transport = CountingTransport(handler)
+    agent = OpenAIAgent(api_key="sk-test", transport=transport)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        agent.generate_response("prompt", timeout=0.5)
+
+    assert len(transport.requests) == 1
+    assert time.monotonic() - start < 0.5
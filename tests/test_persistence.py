@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture
+def buffer(db):
+    from django_app.prompt_agent.persistence import WriteBehindBuffer
+
+    # Long interval and large batches: the tests decide when to flush
+    buffer = WriteBehindBuffer(batch_size=100, flush_interval=60, max_pending=100)
+    yield buffer
+    buffer.close()
+
+
+def make_prompt(text="hello"):
+    from django_app.prompt_agent.models import PromptResponse
+
+    prompt = PromptResponse(model_used="gpt-4o-mini")
+    prompt.prompt = text
+    return prompt
+
+
+def fail_bulk_create(monkeypatch, times=1):
+    from django_app.prompt_agent.models import PromptResponseManager
+
+    original = PromptResponseManager.bulk_create
+    calls = {"failed": 0}
+
+    def bulk_create(manager, *args, **kwargs):
+        if calls["failed"] < times:
+            calls["failed"] += 1
+            raise RuntimeError("database unavailable")
+        return original(manager, *args, **kwargs)
+
+    monkeypatch.setattr(PromptResponseManager, "bulk_create", bulk_create)
+
+
+def test_update_of_a_queued_insert_is_coalesced_into_it(buffer):
+    from django_app.prompt_agent.models import PromptResponse
+
+    prompt = make_prompt()
+    buffer.add(prompt)
+    prompt.status = "completed"
+    prompt.response = "world"
+    buffer.update(prompt)
+
+    assert buffer.pending == 1
+    assert buffer.flush() is True
+
+    stored = PromptResponse.objects.get(pk=prompt.pk)
+    assert (stored.status, stored.response) == ("completed", "world")
+    assert buffer.stats == {"flushes": 1, "inserted": 1, "updated": 0, "errors": 0}
+
+
+def test_updates_of_flushed_rows_write_only_their_fields(buffer):
+    from django_app.prompt_agent.models import PromptResponse
+
+    prompt = make_prompt()
+    buffer.add(prompt)
+    buffer.flush()
+    prompt.status = "processing"
+    prompt.queue_time = 0.5
+    buffer.update(prompt, ("status", "queue_time"))
+    # Not part of the queued fields, so it must not be written
+    prompt.error_message = "unsaved"
+    buffer.flush()
+
+    stored = PromptResponse.objects.get(pk=prompt.pk)
+    assert (stored.status, stored.queue_time, stored.error_message) == ("processing", 0.5, "")
+    assert buffer.stats["updated"] == 1
+
+
+def test_ensure_saved_flushes_a_queued_insert(buffer):
+    prompt = make_prompt()
+    buffer.add(prompt)
+    assert prompt.pk is None
+
+    buffer.ensure_saved(prompt)
+
+    assert prompt.pk is not None
+    assert buffer.pending == 0
+
+
+def test_failed_flush_requeues_writes_and_retries_them(buffer, monkeypatch):
+    from django_app.prompt_agent.models import PromptResponse, TextBlob
+
+    fail_bulk_create(monkeypatch)
+    prompt = make_prompt("requeued")
+    buffer.add(prompt)
+
+    assert buffer.flush() is False
+    assert prompt.pk is None
+    assert buffer.pending == 1
+    assert buffer.stats["errors"] == 1
+    # The blob insert rolled back with the failed transaction
+    assert not TextBlob.objects.exists()
+
+    assert buffer.flush() is True
+    assert PromptResponse.objects.get(pk=prompt.pk).prompt == "requeued"
+    assert buffer.pending == 0
+
+
+def test_ensure_saved_raises_while_the_insert_cannot_be_written(buffer, monkeypatch):
+    fail_bulk_create(monkeypatch)
+    prompt = make_prompt()
+    buffer.add(prompt)
+
+    with pytest.raises(RuntimeError):
+        buffer.ensure_saved(prompt)
+    assert buffer.pending == 1
+
+
+def test_full_buffer_refuses_new_writes_while_the_database_fails(db, monkeypatch):
+    from django_app.prompt_agent.persistence import WriteBehindBuffer
+
+    buffer = WriteBehindBuffer(batch_size=2, flush_interval=60, max_pending=2)
+    fail_bulk_create(monkeypatch, times=10)
+    queued = [make_prompt(f"prompt {i}") for i in range(2)]
+    for prompt in queued:
+        buffer.add(prompt)
+
+    with pytest.raises(RuntimeError):
+        buffer.add(make_prompt("refused"))
+    assert buffer.pending == 2
+
+    monkeypatch.undo()
+    buffer.close()
+    assert all(prompt.pk is not None for prompt in queued)
+
+
+def test_close_drains_pending_writes(db):
+    from django_app.prompt_agent.models import PromptResponse
+    from django_app.prompt_agent.persistence import WriteBehindBuffer
+
+    buffer = WriteBehindBuffer(batch_size=100, flush_interval=60, max_pending=100)
+    for i in range(3):
+        buffer.add(make_prompt(f"prompt {i}"))
+
+    buffer.close()
+
+    assert PromptResponse.objects.count() == 3
+    with pytest.raises(RuntimeError):
+        buffer.add(make_prompt())
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+
+@pytest.fixture
+def sampler(django_setup, monkeypatch):
+    from django_app.prompt_agent.profiling import StackSampler
+
+    sampler = StackSampler(interval=60)
+    # Samples are taken explicitly; no background thread
+    monkeypatch.setattr(sampler, "_ensure_thread", lambda: None)
+    return sampler
+
+
+def render_view(sampler):
+    sampler._sample()
+
+
+def test_samples_are_attributed_to_the_active_view_label(sampler):
+    with sampler.profile("/prompt/1/", "capture-1") as entry:
+        entry[1] = "prompt_agent:prompt_detail"
+        render_view(sampler)
+
+    (stack, count), = sampler.counts("capture-1").items()
+    frames = stack.split(";")
+    assert count == 1
+    assert frames[0] == "prompt_agent:prompt_detail"
+    # Sampled from its own thread, so the sampler is the innermost frame
+    assert frames[-2:] == [f"{__name__}:render_view", "django_app.prompt_agent.profiling:StackSampler._sample"]
+    assert any(frame.endswith(":test_samples_are_attributed_to_the_active_view_label") for frame in frames)
+    assert sampler.samples == 1
+
+
+def test_samples_go_to_the_most_recent_label_of_a_thread(sampler):
+    with sampler.profile("outer", "capture-1"):
+        with sampler.profile("GET /a b;c", "capture-2"):
+            render_view(sampler)
+        render_view(sampler)
+
+    assert [stack.split(";")[0] for stack in sampler.counts("capture-2")] == ["GET_/a_b:c"]
+    assert [stack.split(";")[0] for stack in sampler.counts("capture-1")] == ["outer"]
+    # Nothing is sampled once the thread left every profile block
+    render_view(sampler)
+    assert sampler.samples == 2
+
+
+def test_dump_and_merge_round_trip_collapsed_stacks(sampler, tmp_path):
+    from django_app.prompt_agent.profiling import format_collapsed, merge_collapsed
+
+    with sampler.profile("view", "capture-1"):
+        for _ in range(3):
+            render_view(sampler)
+    sampler.dump(tmp_path)
+
+    paths = list(tmp_path.glob("capture-1-*.collapsed"))
+    assert len(paths) == 1
+    assert merge_collapsed(paths) == sampler.counts("capture-1")
+
+    # Files of several processes are summed
+    other = tmp_path / "capture-1-other.collapsed"
+    other.write_text(format_collapsed(sampler.counts("capture-1")), encoding="utf-8")
+    merged = merge_collapsed([*paths, other])
+    assert merged == {stack: 2 * count for stack, count in sampler.counts("capture-1").items()}
+
+
+def test_profile_window_reads_the_shared_capture_window(django_setup):
+    from django.core.cache import cache
+
+    from django_app.prompt_agent.profiling import WINDOW_KEY, ProfileWindow
+
+    cache.set(WINDOW_KEY, {"id": "capture-1", "until": time.time() + 60, "rate": 0.5})
+    try:
+        assert ProfileWindow(poll_interval=0).current() == ("capture-1", 0.5)
+        cache.set(WINDOW_KEY, {"id": "capture-1", "until": time.time() - 1, "rate": 0.5})
+        assert ProfileWindow(poll_interval=0).current() is None
+    finally:
+        cache.delete(WINDOW_KEY)
+
+
+def test_capture_profile_merges_worker_files_per_view(django_setup, tmp_path):
+    from io import StringIO
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.test import override_settings
+
+    (tmp_path / "continuous-1.collapsed").write_text(
+        "index;views:index;db:query 3\nhistory;views:history 1\n", encoding="utf-8"
+    )
+    (tmp_path / "continuous-2.collapsed").write_text("index;views:index;db:query 2\n", encoding="utf-8")
+    middleware = [*settings.MIDDLEWARE, "django_app.prompt_agent.middleware.ProfilingMiddleware"]
+    output = tmp_path / "out"
+
+    with override_settings(MIDDLEWARE=middleware, PROMPT_PROFILE_DIR=str(tmp_path)):
+        call_command("capture_profile", "--continuous", "--output", str(output), stdout=StringIO())
+
+    assert (output / "all.collapsed").read_text(encoding="utf-8") == (
+        "history;views:history 1\nindex;views:index;db:query 5\n"
+    )
+    assert (output / "index.collapsed").read_text(encoding="utf-8") == "index;views:index;db:query 5\n"
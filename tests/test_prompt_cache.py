@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import pytest
+
+
+def cache_control(status):
+    from django.test import Client
+
+    from django_app.prompt_agent.models import PromptResponse
+
+    prompt = PromptResponse(prompt="hello", status=status)
+    prompt.response = "world" if status == "completed" else ""
+    prompt.save()
+    response = Client().get(f"/prompt/{prompt.pk}/")
+    assert response.status_code == 200
+    return {part.strip() for part in response["Cache-Control"].split(",")}
+
+
+def test_completed_prompt_may_be_cached(db, monkeypatch):
+    from django.test import override_settings
+
+    from django_app.prompt_agent import views
+
+    monkeypatch.setattr(views, "get_index", lambda: None)
+    with override_settings(PROMPT_DETAIL_MAX_AGE=3600):
+        assert "max-age=3600" in cache_control("completed")
+
+
+def test_related_prompts_shorten_the_cache_lifetime(db, tmp_path):
+    pytest.importorskip("numpy")
+    from django.test import override_settings
+
+    from django_app.prompt_agent import similarity
+
+    with override_settings(
+        PROMPT_DETAIL_MAX_AGE=3600, PROMPT_SIMILARITY_MAX_AGE=60, PROMPT_SIMILARITY_DIR=str(tmp_path)
+    ):
+        similarity._index = None
+        try:
+            assert "max-age=60" in cache_control("completed")
+        finally:
+            similarity._index = None
+
+
+@pytest.mark.parametrize("status", ["pending", "failed", "timeout", "cancelled"])
+def test_other_prompts_must_revalidate(db, status):
+    directives = cache_control(status)
+
+    assert "no-cache" in directives
+    assert not any(directive.startswith("max-age") for directive in directives)
+
+
+def test_chunk_progress_changes_the_etag(db):
+    from django.test import Client
+
+    from django_app.prompt_agent.models import ChunkResult, PromptResponse
+
+    prompt = PromptResponse(prompt="long document", status="processing")
+    prompt.save()
+    chunk = ChunkResult(prompt_response=prompt, stage=0, index=0)
+    chunk.input = "first part"
+    chunk.save()
+    client = Client()
+    etag = client.get(f"/prompt/{prompt.pk}/")["ETag"]
+    assert client.get(f"/prompt/{prompt.pk}/", HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    chunk.output = "summary"
+    chunk.status = "completed"
+    chunk.save()
+
+    response = client.get(f"/prompt/{prompt.pk}/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_matching_validators_return_not_modified(db):
+    from django.test import Client
+
+    from django_app.prompt_agent.models import PromptResponse
+
+    prompt = PromptResponse(prompt="hello", status="completed")
+    prompt.response = "world"
+    prompt.save()
+    client = Client()
+    first = client.get(f"/prompt/{prompt.pk}/")
+
+    by_etag = client.get(f"/prompt/{prompt.pk}/", HTTP_IF_NONE_MATCH=first["ETag"])
+    by_date = client.get(f"/prompt/{prompt.pk}/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+
+    assert by_etag.status_code == by_date.status_code == 304
+    assert by_etag.content == b""
+    prompt.status = "failed"
+    prompt.save()
+    assert client.get(f"/prompt/{prompt.pk}/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 200
+
+
+def render_history():
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        response = Client().get("/history/")
+    assert response.status_code == 200
+    return response.content.decode(), len(queries)
+
+
+def test_cached_listing_renders_without_queries_until_a_prompt_is_saved(db):
+    from django_app.prompt_agent.models import PromptResponse
+
+    PromptResponse(prompt="first listed prompt").save()
+    content, _ = render_history()
+    assert "first listed prompt" in content
+
+    cached, queries = render_history()
+    assert queries == 0
+    assert cached == content
+
+    PromptResponse(prompt="second listed prompt").save()
+    content, queries = render_history()
+    assert queries > 0
+    assert "second listed prompt" in content
+
+
+def test_write_behind_flush_invalidates_cached_listings(db):
+    from django_app.prompt_agent.models import PromptResponse
+    from django_app.prompt_agent.persistence import WriteBehindBuffer
+
+    render_history()
+    buffer = WriteBehindBuffer(batch_size=100, flush_interval=60, max_pending=100)
+    try:
+        prompt = PromptResponse(prompt="buffered prompt")
+        buffer.add(prompt)
+        assert "buffered prompt" not in render_history()[0]
+        assert buffer.flush() is True
+    finally:
+        buffer.close()
+
+    assert "buffered prompt" in render_history()[0]
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture
+def prompt(db):
+    from django_app.prompt_agent.models import PromptResponse
+
+    prompt = PromptResponse(prompt="hello", status="completed")
+    prompt.response = "world"
+    prompt.save()
+    return prompt
+
+
+class QueriesPerAlias:
+    """Record which database aliases ran queries on the app's tables."""
+
+    def __enter__(self):
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+
+        self.captures = {
+            alias: CaptureQueriesContext(connections[alias]) for alias in ("default", "replica")
+        }
+        for capture in self.captures.values():
+            capture.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        for capture in self.captures.values():
+            capture.__exit__(*exc_info)
+
+    def aliases(self):
+        return {
+            alias
+            for alias, capture in self.captures.items()
+            if any("prompt_agent_" in query["sql"] for query in capture.captured_queries)
+        }
+
+
+def count_view(request):
+    from django.http import HttpResponse
+
+    from django_app.prompt_agent.models import PromptResponse
+
+    return HttpResponse(str(PromptResponse.objects.count()))
+
+
+def test_replica_reads_views_read_from_the_replica(prompt):
+    from django.test import Client
+
+    with QueriesPerAlias() as queries:
+        response = Client().get(f"/prompt/{prompt.pk}/")
+
+    assert response.status_code == 200
+    assert queries.aliases() == {"replica"}
+
+
+def test_reads_after_a_write_in_the_same_request_use_the_primary(prompt):
+    from django_app.prompt_agent.models import PromptResponse
+    from django_app.prompt_agent.routing import note_write, route_request, use_replica
+
+    with route_request(), use_replica():
+        with QueriesPerAlias() as before:
+            PromptResponse.objects.count()
+        note_write()
+        with QueriesPerAlias() as after:
+            PromptResponse.objects.count()
+
+    assert before.aliases() == {"replica"}
+    assert after.aliases() == {"default"}
+
+
+def test_pin_cookie_keeps_the_client_on_the_primary(prompt):
+    from django.test import Client
+
+    from django_app.prompt_agent.routing import PIN_COOKIE
+
+    client = Client()
+    response = client.post("/sessions/create/", {"name": "writer", "model": "gpt-4o-mini", "weight": 1})
+    assert response.status_code == 302
+    assert PIN_COOKIE in response.cookies
+
+    with QueriesPerAlias() as queries:
+        client.get(f"/prompt/{prompt.pk}/")
+
+    assert queries.aliases() == {"default"}
+
+
+def test_posts_always_use_the_primary(prompt):
+    from django.test import RequestFactory
+
+    from django_app.prompt_agent.routing import replica_reads, route_request
+
+    view = replica_reads(count_view)
+    factory = RequestFactory()
+
+    with route_request(), QueriesPerAlias() as get_queries:
+        view(factory.get("/"))
+    with route_request(), QueriesPerAlias() as post_queries:
+        view(factory.post("/"))
+
+    assert get_queries.aliases() == {"replica"}
+    assert post_queries.aliases() == {"default"}
+
+
+@pytest.mark.parametrize("path", ["/", "/history/", "/sessions/"])
+def test_cached_listings_are_filled_from_the_primary(prompt, path):
+    from django.test import Client
+
+    with QueriesPerAlias() as queries:
+        Client().get(path)
+
+    assert "replica" not in queries.aliases()
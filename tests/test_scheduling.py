@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import pytest
+
+from django_app.prompt_agent.scheduling import BATCH, INTERACTIVE, FairScheduler, OverloadedError
+
+
+def grant_order(scheduler, tickets):
+    """Release granted tickets one at a time and return the flows in grant order."""
+    order = []
+    pending = list(tickets)
+    while pending:
+        granted = [ticket for ticket in pending if ticket.granted]
+        assert len(granted) == 1
+        order.append(granted[0].flow)
+        pending.remove(granted[0])
+        scheduler.release(granted[0])
+    return order
+
+
+def test_flows_share_capacity_in_proportion_to_their_weight():
+    scheduler = FairScheduler(max_concurrency=1)
+    blocker = scheduler.submit(flow="blocker")
+    tickets = [scheduler.submit(flow="a", weight=2) for _ in range(4)]
+    tickets += [scheduler.submit(flow="b", weight=1) for _ in range(4)]
+
+    scheduler.release(blocker)
+    order = grant_order(scheduler, tickets)
+
+    # Flow b was queued last, yet it is not starved behind all of a
+    assert order[:3] == ["a", "b", "a"]
+    assert order[:6].count("a") == 4
+    assert order[:6].count("b") == 2
+
+
+def test_flow_never_exceeds_its_own_concurrency_cap():
+    scheduler = FairScheduler(max_concurrency=3)
+    first = scheduler.submit(flow="a", max_concurrency=1)
+    second = scheduler.submit(flow="a", max_concurrency=1)
+    other = scheduler.submit(flow="b")
+
+    assert first.granted and other.granted
+    assert not second.granted
+    assert scheduler.in_flight == 2
+
+    scheduler.release(first)
+    assert second.granted
+
+
+def test_interactive_requests_go_before_queued_batch_requests():
+    scheduler = FairScheduler(max_concurrency=1)
+    blocker = scheduler.submit(flow="blocker")
+    batch = scheduler.submit(flow="a", priority=BATCH)
+    interactive = scheduler.submit(flow="b", priority=INTERACTIVE)
+
+    scheduler.release(blocker)
+
+    assert interactive.granted
+    assert not batch.granted
+    scheduler.release(interactive)
+    assert batch.granted
+
+
+def test_releasing_a_waiting_ticket_withdraws_it_from_the_queue():
+    scheduler = FairScheduler(max_concurrency=1)
+    running = scheduler.submit(flow="a")
+    cancelled = scheduler.submit(flow="a")
+    waiting = scheduler.submit(flow="b")
+
+    scheduler.release(cancelled)
+    assert scheduler.queued == 1
+    scheduler.release(running)
+
+    assert waiting.granted
+    assert not cancelled.granted
+    assert scheduler.in_flight == 1
+    # Releasing twice must not free a slot that is not held
+    scheduler.release(running)
+    assert scheduler.in_flight == 1
+
+
+def test_admission_control_sheds_requests_when_the_queue_is_full():
+    scheduler = FairScheduler(max_concurrency=1, max_queue=1)
+    scheduler.submit(flow="a")
+    scheduler.submit(flow="a")
+
+    with pytest.raises(OverloadedError) as excinfo:
+        scheduler.submit(flow="b")
+    assert excinfo.value.retry_after >= 1
+    assert scheduler.queued == 1
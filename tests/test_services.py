@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+
+class RecordingAgent:
+    """Agent whose calls are recorded; ``latencies`` maps prompts to a delay."""
+
+    def __init__(self, latencies=None):
+        self.calls = []
+        self.latencies = latencies or {}
+
+    async def agenerate(self, prompt, model, timeout=None):
+        from src.openai_agent import Generation
+
+        self.calls.append(prompt)
+        await asyncio.sleep(self.latencies.get(model, 0))
+        if model == "broken":
+            raise RuntimeError("OpenAI API error: broken model")
+        return Generation(f"answer from {model}", model, input_tokens=1, output_tokens=1)
+
+
+@pytest.fixture
+def service(db):
+    from django_app.prompt_agent.services import PromptAgentService
+
+    service = PromptAgentService()
+    service.agent = RecordingAgent()
+    return service
+
+
+def test_cancellation_during_the_insert_marks_the_row_cancelled(service):
+    from django_app.prompt_agent.models import PromptResponse
+
+    entered, resume = threading.Event(), threading.Event()
+    insert = service._insert
+
+    def slow_insert(prompt_response):
+        entered.set()
+        resume.wait(5)
+        insert(prompt_response)
+
+    service._insert = slow_insert
+
+    async def disconnect_during_insert():
+        task = asyncio.create_task(service.aprocess_prompt("hello"))
+        while not entered.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        resume.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(disconnect_during_insert())
+
+    prompt = PromptResponse.objects.get()
+    assert prompt.status == "cancelled"
+    assert service.agent.calls == []
+    assert service.scheduler.in_flight == 0
+
+
+def test_compare_fans_out_concurrently_with_one_result_per_session(service):
+    from django_app.prompt_agent.models import AgentSession
+    from django_app.prompt_agent.scheduling import FairScheduler
+
+    latencies = {"fast": 0.1, "medium": 0.2, "slow": 0.3, "broken": 0.1}
+    service.agent = RecordingAgent(latencies)
+    # Four slots and no queue: the fifth session is rejected by admission control
+    service.scheduler = FairScheduler(max_concurrency=4, max_queue=0)
+    sessions = [
+        AgentSession.objects.create(name=model, model=model)
+        for model in ["fast", "medium", "slow", "broken", "rejected"]
+    ]
+
+    comparison = asyncio.run(service.acompare("Compare me", sessions))
+
+    assert max(latencies.values()) <= comparison.wall_time < sum(latencies.values())
+    statuses = {
+        result.session.name: result.status
+        for result in comparison.results.select_related("session")
+    }
+    assert statuses == {
+        "fast": "completed",
+        "medium": "completed",
+        "slow": "completed",
+        "broken": "failed",
+        "rejected": "failed",
+    }
+    assert len(service.agent.calls) == 4
+    assert service.scheduler.in_flight == 0
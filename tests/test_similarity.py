@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def index(db, tmp_path):
+    from django_app.prompt_agent.similarity import SimilarityIndex
+
+    return SimilarityIndex(tmp_path / "index", dim=64)
+
+
+def create_prompt(text, status):
+    from django_app.prompt_agent.models import PromptResponse
+
+    prompt = PromptResponse(prompt=text, status=status)
+    prompt.save()
+    return prompt
+
+
+def indexed_ids(index):
+    return sorted(int(pk) for pk in index._ids[:index.count])
+
+
+def test_prompt_completing_after_newer_ones_is_still_indexed(index):
+    slow = create_prompt("slow prompt about invoices", "processing")
+    fast = create_prompt("fast prompt about deadlines", "completed")
+    assert index.update() == 1
+
+    slow.status = "completed"
+    slow.save()
+
+    assert index.update() == 1
+    assert indexed_ids(index) == [slow.pk, fast.pk]
+
+
+def test_update_skips_prompts_already_in_the_index(index):
+    from django.test import override_settings
+
+    first = create_prompt("first prompt", "completed")
+    second = create_prompt("second prompt", "completed")
+
+    # The overlap window rescans both prompts on every update
+    with override_settings(PROMPT_SIMILARITY_OVERLAP=3600):
+        assert index.update() == 2
+        assert index.update() == 0
+    assert indexed_ids(index) == [first.pk, second.pk]
+
+
+def test_watermark_survives_reopening_the_index(index):
+    from django_app.prompt_agent.similarity import SimilarityIndex
+
+    prompt = create_prompt("persisted prompt", "completed")
+    index.update()
+
+    reopened = SimilarityIndex(index.directory, dim=64)
+    assert reopened.watermark == pytest.approx(prompt.updated_at.timestamp())
+    assert reopened.version == index.version
+
+
+def test_query_during_a_reload_sees_a_consistent_index(django_setup, tmp_path, monkeypatch):
+    import threading
+
+    import numpy as np
+
+    from django_app.prompt_agent.similarity import SimilarityIndex
+
+    writer = SimilarityIndex(tmp_path, dim=64)
+    writer.add([(1, "invoice overdue")])
+    reader = SimilarityIndex(tmp_path, dim=64)
+    writer.add([(pk, f"invoice number {pk}") for pk in range(2, 50)])
+
+    # Stall the reload while it maps the row files
+    entered, resume = threading.Event(), threading.Event()
+    memmap = np.memmap
+
+    def slow_memmap(*args, **kwargs):
+        entered.set()
+        resume.wait(5)
+        return memmap(*args, **kwargs)
+
+    monkeypatch.setattr(np, "memmap", slow_memmap)
+    results, errors = [], []
+
+    def query():
+        try:
+            results.append(reader.query("invoice", k=3))
+        except Exception as exc:  # surfaced by the assertion below
+            errors.append(exc)
+
+    reloading = threading.Thread(target=reader.refresh)
+    reloading.start()
+    assert entered.wait(5)
+    querying = threading.Thread(target=query)
+    querying.start()
+    querying.join(0.1)
+    resume.set()
+    reloading.join(5)
+    querying.join(5)
+
+    assert errors == []
+    assert len(results[0]) == 3
+    assert reader.count == writer.count == 49
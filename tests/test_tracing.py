@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import pytest
+
+from django_app.prompt_agent.tracing import Tracer, current_trace_id, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+def run_trace(tracer, traceparent=None):
+    with tracer.trace("request", traceparent=traceparent) as root:
+        with tracer.span("child") as child:
+            trace_id = current_trace_id()
+    tracer.flush()
+    return root, child, trace_id
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (f"00-{TRACE_ID}-{PARENT_ID}-01", (TRACE_ID, PARENT_ID, True)),
+        (f"00-{TRACE_ID}-{PARENT_ID}-00", (TRACE_ID, PARENT_ID, False)),
+        (f"  00-{TRACE_ID}-{PARENT_ID}-03  ", (TRACE_ID, PARENT_ID, True)),
+        # Future versions may append fields
+        (f"01-{TRACE_ID}-{PARENT_ID}-01-extra", (TRACE_ID, PARENT_ID, True)),
+    ],
+)
+def test_parse_traceparent_accepts_valid_headers(header, expected):
+    assert parse_traceparent(header) == expected
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "",
+        "garbage",
+        f"00-{TRACE_ID}-{PARENT_ID}",
+        f"00-{TRACE_ID[:-1]}-{PARENT_ID}-01",
+        f"00-{TRACE_ID}-{PARENT_ID}0-01",
+        f"00-{'0' * 32}-{PARENT_ID}-01",
+        f"00-{TRACE_ID}-{'0' * 16}-01",
+        f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+        f"00-{'g' * 32}-{PARENT_ID}-01",
+        f"00-0x{TRACE_ID[2:]}-{PARENT_ID}-01",
+        f"00-{TRACE_ID[:-2]}_1-{PARENT_ID}-01",
+        f"00-{TRACE_ID}-{PARENT_ID}-1",
+        f"00-{TRACE_ID}-{PARENT_ID}-zz",
+        f"00-{TRACE_ID}-{PARENT_ID}-01-extra",
+        f"ff-{TRACE_ID}-{PARENT_ID}-01",
+        f"0-{TRACE_ID}-{PARENT_ID}-01",
+    ],
+)
+def test_parse_traceparent_rejects_malformed_headers(header):
+    assert parse_traceparent(header) is None
+
+
+def test_sampled_traceparent_is_continued_and_exported():
+    exporter = CollectingExporter()
+    tracer = Tracer(sample_rate=0.000001, exporters=[exporter])
+
+    root, child, trace_id = run_trace(tracer, f"00-{TRACE_ID}-{PARENT_ID}-01")
+
+    assert trace_id == TRACE_ID
+    assert root.parent_id == PARENT_ID
+    assert child.parent_id == root.span_id
+    assert [[span.name for span in spans] for spans in exporter.traces] == [["child", "request"]]
+
+
+def test_unsampled_traceparent_is_not_recorded_even_at_full_rate():
+    exporter = CollectingExporter()
+    tracer = Tracer(sample_rate=1.0, exporters=[exporter])
+
+    root, child, trace_id = run_trace(tracer, f"00-{TRACE_ID}-{PARENT_ID}-00")
+
+    assert (root, child, trace_id) == (None, None, "")
+    assert exporter.traces == []
+
+
+def test_malformed_traceparent_starts_a_new_trace():
+    exporter = CollectingExporter()
+    tracer = Tracer(sample_rate=1.0, exporters=[exporter])
+
+    root, _, trace_id = run_trace(tracer, f"00-{'0' * 32}-{PARENT_ID}-01")
+
+    assert root.parent_id is None
+    assert len(trace_id) == 32 and trace_id != "0" * 32
+    assert len(exporter.traces) == 1
+
+
+def test_tracer_without_sampling_records_nothing():
+    exporter = CollectingExporter()
+    tracer = Tracer(sample_rate=0.0, exporters=[exporter])
+
+    root, child, trace_id = run_trace(tracer, f"00-{TRACE_ID}-{PARENT_ID}-01")
+
+    assert (root, child, trace_id) == (None, None, "")
+    assert exporter.traces == []
+
+
+def test_sample_rate_must_be_a_probability():
+    with pytest.raises(ValueError):
+        Tracer(sample_rate=1.5)